@@ -1,24 +1,213 @@
 import os
+import atexit
+import copy
+import time
 import uuid
 import base64
-from flask import Flask, request, jsonify, send_file
+import json
+import tempfile
+import threading
+import shutil
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import cv2
 import numpy as np
+import supervision as sv
 from pathlib import Path
-from model.yolo import model
-from utils.enhancement import apply_enhancement
-from utils.tracking import run_tracking
+from model.yolo import model, predict, registry as model_registry, use_pool
+from model.pool import InferencePool, InferencePoolBusy, DEFAULT_SLOT_BYTES
+from utils.enhancement import ENHANCEMENT_KINDS, apply_enhancement
+from utils.tracking import TrackerSession, TrackerSessionManager
+from utils.pipeline import run_pipeline
+from utils.jobs import JobManager, JobQueueFull
+from utils.stride import FrameStride
+from utils.cache import ResultCache, make_cache_key
+from utils.ingest import SpooledUploadRequest, VideoSource, ingest_upload, VIDEO_EXTENSIONS
+from utils.store import ArtifactStore
+from utils.mp4 import faststart
+from utils.detlog import DetectionLog, DetectionLogWriter, sidecar_path
+from utils.metrics import REGISTRY as METRICS, REQUEST_BUCKETS, timed
+from utils.streaming import EventChannel, StreamCancelled, MJPEG_BOUNDARY, sse_event, mjpeg_part, multipart_body
 from utils.region import create_line_zone, create_polygon_zone, box_annotator, label_annotator
+from utils.zones import ZoneEngine
+from utils.lines import LineCounter
+from utils.live import LiveSession, LiveSessionLimit, LiveSessionManager, parse_source
+from utils.segments import TrackStitcher, concat_videos, init_worker as init_segment_worker, \
+    keyframe_indices, plan_segments, preroll_start
 
 app = Flask(__name__)
 CORS(app)
+# Spawned inference/segment workers import this module too (as __mp_main__
+# under `python app.py`, and to unpickle run_segment). They only need the
+# frame processing functions, so the front process's background state below
+# (output index, jobs, live sessions, result cache, worker pools, model
+# preloading, upload sweep) is only created when this is not a worker.
+IN_WORKER_PROCESS = multiprocessing.parent_process() is not None
 OUTPUT_DIR = Path("static/output")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Managed output files: byte budget, TTL and sweep interval (0 = unlimited/off)
+ARTIFACTS = None if IN_WORKER_PROCESS else ArtifactStore(
+    OUTPUT_DIR,
+    max_bytes=int(os.environ.get("OUTPUT_MAX_BYTES", 5 * 1024 ** 3)),
+    ttl=int(os.environ.get("OUTPUT_TTL_SECONDS", 7 * 24 * 3600)),
+    sweep_interval=int(os.environ.get("OUTPUT_SWEEP_INTERVAL", 60))
+)
+# Rewrite finished MP4s with the moov atom first so players can start and
+# seek before the whole file is downloaded
+MP4_FASTSTART = os.environ.get("MP4_FASTSTART", "true").lower() == "true"
+# Cache-Control max-age for /video and /download (outputs never change once written)
+OUTPUT_MAX_AGE = int(os.environ.get("OUTPUT_MAX_AGE", 3600))
+
+# Video uploads are spooled straight into named files here while the body
+# arrives (see SpooledUploadRequest) and decoded from there without a copy
+UPLOAD_TMP_DIR = Path(os.environ.get("UPLOAD_TMP_DIR", Path(tempfile.gettempdir()) / "yolo_uploads"))
+UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_STALE_SECONDS = int(os.environ.get("UPLOAD_STALE_SECONDS", 24 * 3600))
+SpooledUploadRequest.upload_dir = UPLOAD_TMP_DIR
+app.request_class = SpooledUploadRequest
+
+# Multi-process inference: INFERENCE_WORKERS > 0 runs the model in that many
+# worker processes (each with its own model, frames sent via shared memory)
+# instead of in this process. Per worker at most INFERENCE_MAX_INFLIGHT
+# batches are queued; requests wait up to INFERENCE_QUEUE_TIMEOUT seconds
+# for room before failing with 503.
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+INFERENCE_POOL = None
+if INFERENCE_WORKERS > 0 and not IN_WORKER_PROCESS:
+    INFERENCE_POOL = InferencePool(
+        workers=INFERENCE_WORKERS,
+        max_inflight=int(os.environ.get("INFERENCE_MAX_INFLIGHT", 2)),
+        slots=int(os.environ["INFERENCE_SHM_SLOTS"]) if os.environ.get("INFERENCE_SHM_SLOTS") else None,
+        slot_bytes=int(os.environ.get("INFERENCE_SHM_SLOT_BYTES", DEFAULT_SLOT_BYTES)),
+        threads=int(os.environ.get("INFERENCE_WORKER_THREADS", 0)),
+        queue_timeout=float(os.environ.get("INFERENCE_QUEUE_TIMEOUT", 30))
+    )
+    use_pool(INFERENCE_POOL)
+    atexit.register(INFERENCE_POOL.close)
+
+# Model loading: background (load + warm-up right after startup),
+# lazy (on first request) or eager (before the server starts listening);
+# workers always load lazily, when their first segment needs the model
+MODEL_LOAD_MODE = "lazy" if IN_WORKER_PROCESS else os.environ.get("MODEL_LOAD_MODE", "background").lower()
+if INFERENCE_POOL is not None:
+    if MODEL_LOAD_MODE == "eager":
+        INFERENCE_POOL.wait_ready()
+    elif MODEL_LOAD_MODE == "background":
+        INFERENCE_POOL.start()
+elif INFERENCE_WORKERS == 0:
+    if MODEL_LOAD_MODE == "eager":
+        model_registry.load()
+    elif MODEL_LOAD_MODE == "background":
+        model_registry.load_in_background()
+
 # Store polygon zones
 POLYGON_ZONES = {}
 
+# /count roi=true: margin around the zones' bounding box (fraction of its longest side)
+ROI_MARGIN = float(os.environ.get("ROI_MARGIN", 0.1))
+
+# Store counting lines (sv.LineZone, LineZoneAnnotator) from create_line_zone
+LINE_ZONES = {}
+
+# Video processing settings (override via environment)
+VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", 1))
+MAX_VIDEO_BATCH_SIZE = int(os.environ.get("MAX_VIDEO_BATCH_SIZE", 32))
+# Enhancement resolution: full (enhanced frame is also the output frame)
+# or model (enhance a copy at model input size that only feeds the model)
+ENHANCE_RESOLUTION = os.environ.get("ENHANCE_RESOLUTION", "full").lower()
+# Upper bound for stride=<K> and stride=auto keyframe spacing
+MAX_VIDEO_STRIDE = int(os.environ.get("MAX_VIDEO_STRIDE", 8))
+# Batches buffered between decode/inference/encode stages
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 4))
+
+# Segmented video processing (form field segments=auto/<N>): long videos are
+# split into keyframe-aligned segments processed by SEGMENT_WORKERS processes
+# (each with its own model), then concatenated. Segments are at least
+# SEGMENT_MIN_FRAMES long; /track and /count re-track SEGMENT_OVERLAP frames
+# before each boundary to stitch track ids across segments.
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+SEGMENT_MIN_FRAMES = int(os.environ.get("SEGMENT_MIN_FRAMES", 300))
+SEGMENT_OVERLAP = int(os.environ.get("SEGMENT_OVERLAP", 30))
+SEGMENT_EXECUTOR = None
+SEGMENT_EXECUTOR_LOCK = threading.Lock()
+
+# Background video jobs (form field async=true)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 16))
+JOBS = None if IN_WORKER_PROCESS else JobManager(workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE)
+
+# Streaming responses (form field stream=sse/mjpeg): events buffered per
+# client before the pipeline waits, and MJPEG frame quality
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", 32))
+STREAM_JPEG_QUALITY = int(os.environ.get("STREAM_JPEG_QUALITY", 80))
+
+# Live stream sessions (/live/start): concurrent sessions, seconds a finished
+# session's status is kept, reconnect pause for dropped streams, and the
+# folder local video files may be played from (empty = no file sources)
+LIVE_SESSIONS = None if IN_WORKER_PROCESS else LiveSessionManager(
+    max_sessions=int(os.environ.get("LIVE_MAX_SESSIONS", 4)),
+    keep=int(os.environ.get("LIVE_SESSION_KEEP", 300))
+)
+LIVE_RECONNECT_DELAY = float(os.environ.get("LIVE_RECONNECT_DELAY", 2.0))
+LIVE_SOURCE_DIR = os.environ.get("LIVE_SOURCE_DIR", "dummyData")
+if LIVE_SESSIONS is not None:
+    atexit.register(LIVE_SESSIONS.stop_all)
+# Live zone/line state forgets tracks unseen for LIVE_TRACK_EVICT_FRAMES
+# processed frames (totals are kept), and zone/line stats are recomputed at
+# most every LIVE_STATS_INTERVAL seconds
+LIVE_TRACK_EVICT_FRAMES = int(os.environ.get("LIVE_TRACK_EVICT_FRAMES", 300))
+LIVE_STATS_INTERVAL = float(os.environ.get("LIVE_STATS_INTERVAL", 1.0))
+
+# Batch image endpoint: decode threads, default and maximum model batch and
+# upload limits
+BATCH_DECODE_WORKERS = int(os.environ.get("BATCH_DECODE_WORKERS", min(8, os.cpu_count() or 1)))
+BATCH_IMAGE_SIZE = int(os.environ.get("BATCH_IMAGE_SIZE", 8))
+MAX_BATCH_IMAGE_SIZE = int(os.environ.get("MAX_BATCH_IMAGE_SIZE", 32))
+BATCH_MAX_IMAGES = int(os.environ.get("BATCH_MAX_IMAGES", 1000))
+BATCH_MAX_IMAGE_BYTES = int(os.environ.get("BATCH_MAX_IMAGE_BYTES", 50 * 1024 * 1024))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+# Image result cache (set RESULT_CACHE_MAX_BYTES=0 to disable,
+# RESULT_CACHE_DIR to spill evicted entries to disk)
+RESULT_CACHE = None if IN_WORKER_PROCESS else ResultCache(
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.environ.get("RESULT_CACHE_DIR") or None,
+    disk_max_bytes=int(os.environ.get("RESULT_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+)
+
+# Per-request/stream tracker state on top of the shared model
+TRACKER_SESSION_TTL = int(os.environ.get("TRACKER_SESSION_TTL", 300))
+TRACKER_SESSIONS = TrackerSessionManager(ttl=TRACKER_SESSION_TTL)
+
+# Per-frame detection log written next to every output video
+# (<video>.detections.npz), queried via /detections/<video filename>
+DETECTION_LOG = os.environ.get("DETECTION_LOG", "true").lower() == "true"
+DETECTION_LOG_CHUNK_ROWS = int(os.environ.get("DETECTION_LOG_CHUNK_ROWS", 4096))
+# Upper bound on rows returned by one /detections/<filename>/query call
+DETECTION_QUERY_LIMIT = int(os.environ.get("DETECTION_QUERY_LIMIT", 10000))
+
+# Prometheus metrics on /metrics (stage timings come from utils.metrics.timed)
+METRICS.enabled = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+HTTP_REQUESTS = METRICS.counter(
+    "http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status")
+)
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    "http_request_duration_seconds", "Time until the response is returned (streams: until it starts)",
+    ("endpoint",), buckets=REQUEST_BUCKETS
+)
+HTTP_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Requests currently being handled")
+HTTP_REQUEST_BYTES = METRICS.counter("http_request_bytes_total", "Request body bytes received", ("endpoint",))
+HTTP_RESPONSE_BYTES = METRICS.counter(
+    "http_response_bytes_total", "Response body bytes with a known length", ("endpoint",)
+)
+FRAMES_PROCESSED = METRICS.counter("yolo_video_frames_total", "Video frames processed", ("kind",))
+# Sampled from JOBS, TRACKER_SESSIONS, RESULT_CACHE, ARTIFACTS and the model on each scrape
+STATE_GAUGE = METRICS.gauge("yolo_state", "Queue depths, cache and store sizes at scrape time", ("name",))
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -35,80 +224,345 @@ def read_image_from_request(field_name="file"):
         return None, "invalid image format"
     return img, None
 
-def image_to_base64(image):
+def decode_image(data):
+    """Decode image bytes, None if not a valid image"""
+    with timed("decode_image"):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def iter_batch_uploads(files):
+    """
+    Yield (filename, bytes, error) for uploaded images and images inside zips
+
+    Bytes are read lazily, as the consumer advances, so a large zip is never
+    held in memory at once.
+    """
+    for f in files:
+        if f.filename.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(f.stream)
+            except zipfile.BadZipFile:
+                yield f.filename, None, "invalid zip file"
+                continue
+            with archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if info.file_size > BATCH_MAX_IMAGE_BYTES:
+                        yield info.filename, None, "image too large"
+                        continue
+                    yield info.filename, archive.read(info), None
+        else:
+            yield f.filename, f.read(), None
+
+def model_identity():
+    """
+    Model settings that change results (weights, backend, INT8, input size)
+
+    Part of every cache key, so entries computed by other weights or another
+    backend (including ones reloaded from RESULT_CACHE_DIR) are never served.
+    Pool workers load the same registry settings, so this holds in pool mode.
+    """
+    status = model_registry.status()
+    identity = {key: status[key] for key in ("path", "backend", "int8", "imgsz")}
+    try:
+        stat = model_registry.path.stat()
+        identity["weights"] = [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        pass
+    return identity
+
+def image_cache_key(kind, **params):
+    """Cache key for an uploaded image, its parameters and the model, None if caching is off"""
+    if not RESULT_CACHE.enabled or "file" not in request.files:
+        return None
+    f = request.files["file"]
+    data = f.read()
+    f.seek(0)
+    return make_cache_key(data, kind=kind, model=model_identity(), **params)
+
+def cached_response(payload, hit):
+    """JSON response with an X-Cache header"""
+    response = jsonify(payload)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
+# Image endpoint output: format -> (extension, mimetype)
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "jpg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+    "png": (".png", "image/png")
+}
+OUTPUT_MODES = ("json", "detections_only", "binary", "image")
+
+def encode_image(image, image_format="jpeg", quality=None):
+    """
+    Encode an OpenCV image, returns (bytes, mimetype)
+
+    quality (1-100) applies to JPEG/WebP; for PNG it maps to the zlib level
+    (100 = fastest/largest). None keeps OpenCV's defaults.
+    """
+    ext, mimetype = IMAGE_FORMATS[image_format]
+    params = []
+    if quality is not None:
+        if ext == ".jpg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif ext == ".webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+        else:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, (100 - quality) // 11))]
+    with timed("encode_image"):
+        _, buffer = cv2.imencode(ext, image, params)
+    return buffer.tobytes(), mimetype
+
+def image_to_base64(image, image_format="jpeg", quality=None):
     """Convert OpenCV image to base64 string"""
-    _, buffer = cv2.imencode('.jpg', image)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    return f"data:image/jpeg;base64,{img_base64}"
+    body, mimetype = encode_image(image, image_format, quality)
+    with timed("base64"):
+        img_base64 = base64.b64encode(body).decode('utf-8')
+    return f"data:{mimetype};base64,{img_base64}"
+
+def get_output_options():
+    """
+    Output mode of image endpoints from the request form, returns (options, error)
+
+    - output: json (default; annotated image as base64 data URL in the JSON),
+      detections_only (no annotation or image encoding at all),
+      binary (multipart/mixed: JSON part + image part) or
+      image (raw image body; summary in X-Detections/X-Count headers)
+    - image_format: jpeg/webp/png (optional, default: jpeg)
+    - quality: 1-100 (optional, default: OpenCV default)
+    """
+    mode = request.form.get("output", "json").lower()
+    image_format = request.form.get("image_format", "jpeg").lower()
+    if mode not in OUTPUT_MODES:
+        return None, f"output must be one of {', '.join(OUTPUT_MODES)}"
+    if image_format not in IMAGE_FORMATS:
+        return None, "image_format must be jpeg, webp or png"
+    quality = request.form.get("quality")
+    if quality is not None:
+        try:
+            quality = max(1, min(100, int(quality)))
+        except ValueError:
+            return None, "quality must be an integer 1-100"
+    return {"mode": mode, "image_format": image_format, "quality": quality}, None
+
+def image_response(payload, annotated, output, cache_key=None, detections=None):
+    """
+    Build an image endpoint response in the requested output mode
+
+    payload is the JSON result without the image. detections (list of
+    dicts) is added for the machine-oriented modes. JSON modes are stored in
+    the result cache under cache_key.
+    """
+    mode = output["mode"]
+    if mode != "json" and detections is not None:
+        payload.setdefault("detections", detections)
+    if mode in ("json", "detections_only"):
+        if mode == "json":
+            payload["image"] = image_to_base64(annotated, output["image_format"], output["quality"])
+        if cache_key:
+            RESULT_CACHE.put(cache_key, payload)
+        return cached_response(payload, hit=False)
+    
+    body, mimetype = encode_image(annotated, output["image_format"], output["quality"])
+    if mode == "image":
+        response = Response(body, mimetype=mimetype)
+        response.headers["X-Detections"] = str(len(payload.get("detections", [])))
+        if "count" in payload:
+            response.headers["X-Count"] = str(payload["count"])
+        return response
+    boundary = uuid.uuid4().hex
+    return Response(
+        multipart_body([("application/json", json.dumps(payload).encode("utf-8")), (mimetype, body)], boundary),
+        mimetype=f"multipart/mixed; boundary={boundary}"
+    )
 
 def is_video_file(file):
     """Check if uploaded file is a video"""
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
     filename = file.filename.lower()
-    return any(filename.endswith(ext) for ext in video_extensions)
+    return filename.endswith(VIDEO_EXTENSIONS)
 
-def create_default_polygon(image_shape):
-    """Create a default polygon covering the center 80% of the image"""
+def default_polygon(image_shape):
+    """
+    Points of a default polygon covering the center 80% of the image; not
+    stored in POLYGON_ZONES
+    """
     h, w = image_shape[:2]
     margin_x = int(w * 0.1)
     margin_y = int(h * 0.1)
-    
-    points = [
+    return [
         [margin_x, margin_y],
         [w - margin_x, margin_y],
         [w - margin_x, h - margin_y],
         [margin_x, h - margin_y]
     ]
-    
+
+def create_default_polygon(image_shape):
+    """Create a default polygon covering the center 80% of the image"""
+    points = default_polygon(image_shape)
     points_array = np.array(points, dtype=np.int32)
     poly, annot = create_polygon_zone(points_array)
     pid = uuid.uuid4().hex
     POLYGON_ZONES[pid] = (poly, annot)
     return pid, points
 
-def process_frame_detect(frame, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0):
-    """Process single frame with detection only"""
-    proc = frame.copy()
-    
-    # Apply enhancement if requested
+def default_line(image_shape):
+    """
+    Default horizontal counting line across the middle of the image, as
+    (start, end); used for one request only, not stored in LINE_ZONES
+    """
+    h, w = image_shape[:2]
+    return (0, h // 2), (w, h // 2)
+
+def line_points(line_id):
+    """(start, end) of a stored counting line"""
+    vector = LINE_ZONES[line_id][0].vector
+    return (vector.start.x, vector.start.y), (vector.end.x, vector.end.y)
+
+def parse_lines(line_ids="", lines_json=None):
+    """
+    Counting lines from comma separated stored line ids plus an inline JSON
+    list of [[x1, y1], [x2, y2]]; returns dict line_id -> (start, end)
+
+    Raises KeyError for unknown line ids and ValueError for malformed JSON.
+    """
+    lines = {}
+    ids = [lid.strip() for lid in (line_ids or "").split(",") if lid.strip()]
+    unknown = [lid for lid in ids if lid not in LINE_ZONES]
+    if unknown:
+        raise KeyError(f"line_id not found: {', '.join(unknown)}")
+    for lid in ids:
+        lines[lid] = line_points(lid)
+    if lines_json:
+        try:
+            for i, (start, end) in enumerate(json.loads(lines_json)):
+                lines[f"line{i}"] = ((int(start[0]), int(start[1])), (int(end[0]), int(end[1])))
+        except (ValueError, TypeError, IndexError, KeyError):
+            raise ValueError("lines must be a JSON list of [[x1, y1], [x2, y2]]")
+    return lines
+
+def get_batch_size():
+    """Read the video inference batch size from the request form"""
+    try:
+        batch_size = int(request.form.get("batch_size", VIDEO_BATCH_SIZE))
+    except ValueError:
+        batch_size = VIDEO_BATCH_SIZE
+    return max(1, min(batch_size, MAX_VIDEO_BATCH_SIZE))
+
+def get_stride():
+    """
+    Read the video keyframe stride from the request form
+
+    Returns a FrameStride for stride=<K> (K > 1) or stride=auto, None when
+    every frame goes through the model.
+    """
+    value = request.form.get("stride", "1").strip().lower()
+    if value == "auto":
+        return FrameStride(stride=2, adaptive=True, max_stride=MAX_VIDEO_STRIDE)
+    try:
+        stride = int(value)
+    except ValueError:
+        stride = 1
+    if stride <= 1:
+        return None
+    return FrameStride(stride=stride, max_stride=MAX_VIDEO_STRIDE)
+
+def describe_stride(stride):
+    """Summarise keyframe usage for the video response"""
+    if stride is None:
+        return {"mode": "every_frame"}
+    return {
+        "mode": "adaptive" if stride.adaptive else "fixed",
+        "stride": stride.stride,
+        "keyframes": stride.keyframes
+    }
+
+def get_enhancement_kind(enhance, params=None):
+    """
+    enhancement_kind from the request (default CLAHE), returns (kind, err)
+
+    Unknown kinds are rejected when enhancement is requested, so a response
+    never reports enhancement_applied for an enhancement that did not run.
+    """
+    params = request.form if params is None else params
+    kind = str(params.get("enhancement_kind", "CLAHE"))
+    if enhance and kind.upper() not in ENHANCEMENT_KINDS:
+        return None, f"enhancement_kind must be one of: {', '.join(ENHANCEMENT_KINDS)}"
+    return kind, None
+
+def prepare_frame(frame, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0):
+    """
+    Apply enhancement if requested
+
+    Enhancement always returns a new array (unknown kinds are rejected by
+    get_enhancement_kind); without it the frame itself is returned (no
+    copy), so annotation draws straight onto the decoded frame.
+    """
     if enhance:
-        proc = apply_enhancement(proc, enhancement_kind, brightness=brightness, contrast=contrast)
-    
-    # Run detection
-    results = model(proc)[0]
-    annotated = results.plot()
-    
-    # Extract detections
+        return apply_enhancement(frame, enhancement_kind, brightness=brightness, contrast=contrast)
+    return frame
+
+def get_model_res():
+    """True when the request asks for enhancement at model input resolution"""
+    return request.form.get("enhance_resolution", ENHANCE_RESOLUTION).lower() == "model"
+
+def prepare_batch(frames, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0,
+                  model_res=False):
+    """
+    Prepare annotation canvases and model inputs for a batch of frames
+
+    With model_res the enhancement runs on a copy downscaled to the size
+    predict() runs the model at (model_registry.imgsz, so the predictor
+    only pads it) that only feeds the model, and the original frames are
+    annotated. Returns (canvases, inputs, scales) where scales[i] maps model
+    input i's coordinates back to frame i's; frames may differ in size
+    (batch image uploads).
+    """
+    if not (enhance and model_res):
+        procs = [prepare_frame(f, enhance, enhancement_kind, brightness, contrast) for f in frames]
+        return procs, procs, [1.0] * len(frames)
+    inputs = [
+        apply_enhancement(f, enhancement_kind, max_side=model_registry.imgsz, brightness=brightness, contrast=contrast)
+        for f in frames
+    ]
+    return frames, inputs, [f.shape[1] / i.shape[1] for f, i in zip(frames, inputs)]
+
+def input_scales(inputs, scales):
+    """scales from prepare_batch keyed by model input, for the keyframe subsets FrameStride passes to infer"""
+    by_input = {id(i): s for i, s in zip(inputs, scales)}
+    return lambda keyframes: [by_input[id(k)] for k in keyframes]
+
+def scale_detections(detections, scale, offset=(0, 0)):
+    """
+    Map sv.Detections from model input coordinates to frame coordinates
+
+    offset is the (x, y) of the model input's crop inside the frame.
+    """
+    if (scale == 1.0 and offset == (0, 0)) or len(detections) == 0:
+        return detections
+    detections = copy.copy(detections)
+    detections.xyxy = detections.xyxy * scale + np.array([*offset, *offset], dtype=np.float32)
+    return detections
+
+def detections_to_list(detections):
+    """Convert sv.Detections into the same list of detection dicts, plus tracker_id if tracked"""
     detections_list = []
-    if results.boxes is not None and len(results.boxes) > 0:
-        for box, cls, conf in zip(results.boxes.xyxy.tolist(), 
-                                   results.boxes.cls.tolist(), 
-                                   results.boxes.conf.tolist()):
-            detections_list.append({
-                "box": box,
-                "class_id": int(cls),
-                "confidence": float(conf),
-                "label": model.names[int(cls)]
-            })
-    
-    return annotated, detections_list
+    tracker_ids = detections.tracker_id if detections.tracker_id is not None else [None] * len(detections)
+    for box, cid, conf, tid in zip(detections.xyxy, detections.class_id, detections.confidence, tracker_ids):
+        detection = {
+            "box": box.tolist(),
+            "class_id": int(cid),
+            "confidence": float(conf),
+            "label": model.names[int(cid)]
+        }
+        if tid is not None:
+            detection["tracker_id"] = int(tid)
+        detections_list.append(detection)
+    return detections_list
 
-def process_frame_track(frame, enhance=False, enhancement_kind="CLAHE", 
-                       brightness=0, contrast=0, tracker_cfg="bytetrack.yaml"):
-    """Process single frame with tracking"""
-    proc = frame.copy()
-    
-    # Apply enhancement if requested
-    if enhance:
-        proc = apply_enhancement(proc, enhancement_kind, brightness=brightness, contrast=contrast)
-    
-    # Run tracking
-    detections = run_tracking(model, proc, tracker_cfg=tracker_cfg)
-    
-    # Annotate with boxes
-    annotated = box_annotator.annotate(scene=proc.copy(), detections=detections)
-    
-    # Create labels with tracker IDs
+def build_labels(detections):
+    """Create labels with tracker IDs for sv.Detections"""
     labels = []
     tracker_ids = detections.tracker_id if detections.tracker_id is not None else [None] * len(detections)
     for cid, conf, tid in zip(detections.class_id, detections.confidence, tracker_ids):
@@ -116,22 +570,127 @@ def process_frame_track(frame, enhance=False, enhancement_kind="CLAHE",
             labels.append(f"#{tid} {model.names[cid]} {conf:0.2f}")
         else:
             labels.append(f"{model.names[cid]} {conf:0.2f}")
+    return labels
+
+def annotate_detections(scene, detections):
+    """
+    Draw boxes and tracker labels in place on scene, returns (annotated, labels)
+
+    This is the single annotation layer for every endpoint; zone and line
+    overlays draw onto the same buffer afterwards. Callers pass a frame
+    they own (decoded or enhanced), never a shared/cached image.
+    """
+    with timed("annotate"):
+        labels = build_labels(detections)
+        annotated = box_annotator.annotate(scene=scene, detections=detections)
+        annotated = label_annotator.annotate(scene=annotated, detections=detections, labels=labels)
+    return annotated, labels
+
+def detect_frames(frames, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0,
+                  start_idx=0, stride=None, model_res=False, annotate=True):
+    """
+    Run detection on a batch of frames with a single model call
+
+    With a FrameStride only keyframes go through the model; frames in
+    between reuse the last keyframe boxes. With annotate=False no annotated
+    frame is drawn (None is returned in its place). Without enhancement the
+    boxes are drawn in place on the given frames.
+    """
+    with timed("enhance"):
+        canvases, inputs, scales = prepare_batch(
+            frames, enhance, enhancement_kind, brightness, contrast, model_res
+        )
+    scales_of = input_scales(inputs, scales)
     
-    # Annotate with labels
-    annotated = label_annotator.annotate(scene=annotated, detections=detections, labels=labels)
+    def infer(keyframes):
+        with timed("inference"):
+            batch_results = predict(keyframes)
+        return [
+            scale_detections(sv.Detections.from_ultralytics(r), scale)
+            for r, scale in zip(batch_results, scales_of(keyframes))
+        ]
     
-    return annotated, detections, labels
+    if stride is None:
+        detections_list = infer(inputs)
+    else:
+        detections_list = stride.run(inputs, start_idx, infer)
+    return [
+        (annotate_detections(canvas, detections)[0] if annotate else None,
+         detections_to_list(detections))
+        for canvas, detections in zip(canvases, detections_list)
+    ]
 
-def process_video(input_path, output_path, process_func):
-    """Generic video processing function"""
-    cap = cv2.VideoCapture(str(input_path))
-    if not cap.isOpened():
-        return None, "Failed to open video"
+def track_frames(frames, session, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0,
+                 start_idx=0, stride=None, model_res=False, annotate=True, roi=None):
+    """
+    Run detection on a batch of frames with a single model call, then feed
+    the results to the session's tracker in frame order
+
+    With a FrameStride only keyframes go through the model and tracker;
+    frames in between get boxes extrapolated from the tracked motion.
+    With annotate=False the annotated frame is None and labels are empty,
+    otherwise boxes are drawn in place on the given frames (or the enhanced
+    copies). With roi=(x0, y0, x1, y1) only that crop is enhanced and fed to the
+    model (at full model resolution); boxes are mapped back to the frame.
+    """
+    offset = (0, 0)
+    with timed("enhance"):
+        if roi is None:
+            canvases, inputs, scales = prepare_batch(
+                frames, enhance, enhancement_kind, brightness, contrast, model_res
+            )
+        else:
+            x0, y0, x1, y1 = roi
+            offset = (x0, y0)
+            crops, inputs, scales = prepare_batch(
+                [f[y0:y1, x0:x1] for f in frames], enhance, enhancement_kind, brightness, contrast,
+                model_res
+            )
+            canvases = frames
+            if enhance and not model_res:
+                # Output shows the enhanced ROI, the rest of the frame as decoded
+                for frame, crop in zip(frames, crops):
+                    frame[y0:y1, x0:x1] = crop
     
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    scales_of = input_scales(inputs, scales)
     
+    def infer(keyframes):
+        with timed("inference"):
+            batch_results = predict(keyframes, verbose=False)
+        detections_list = []
+        for results, scale in zip(batch_results, scales_of(keyframes)):
+            with timed("tracking"):
+                detections_list.append(scale_detections(session.update(results), scale, offset))
+        return detections_list
+    
+    if stride is None:
+        detections_list = infer(inputs)
+    else:
+        detections_list = stride.run(inputs, start_idx, infer)
+    
+    outputs = []
+    for canvas, detections in zip(canvases, detections_list):
+        annotated, labels = annotate_detections(canvas, detections) if annotate else (None, [])
+        outputs.append((annotated, detections, labels))
+    return outputs
+
+def process_frame_detect(frame, enhance=False, enhancement_kind="CLAHE", brightness=0, contrast=0,
+                         model_res=False, annotate=True):
+    """Process single frame with detection only"""
+    return detect_frames(
+        [frame], enhance, enhancement_kind, brightness, contrast, model_res=model_res, annotate=annotate
+    )[0]
+
+def process_frame_track(frame, session, enhance=False, enhancement_kind="CLAHE", 
+                       brightness=0, contrast=0, model_res=False, annotate=True, roi=None):
+    """Process single frame with tracking"""
+    return track_frames(
+        [frame], session, enhance, enhancement_kind, brightness, contrast, model_res=model_res,
+        annotate=annotate, roi=roi
+    )[0]
+
+def open_video_writer(output_path, fps, w, h):
+    """cv2.VideoWriter with the first codec that works (browser-friendly H.264 first)"""
     # Try different codecs for compatibility
     codecs_to_try = ["avc1", "H264", "X264", "mp4v"]
     writer = None
@@ -148,32 +707,606 @@ def process_video(input_path, output_path, process_func):
     if writer is None or not writer.isOpened():
         fourcc = cv2.VideoWriter_fourcc(*"mp4v")
         writer = cv2.VideoWriter(str(output_path), fourcc, fps, (w, h))
+    return writer
+
+def finalize_video(output_path):
+    """Move the MP4 index to the front so browsers can start playback early"""
+    if MP4_FASTSTART and str(output_path).lower().endswith(".mp4"):
+        try:
+            with timed("faststart"):
+                faststart(output_path)
+        except Exception as e:
+            # The original (moov-last) file is still playable
+            print(f"faststart failed for {output_path}: {e}")
+
+def process_video(source, output_path, process_batch, batch_size=1, progress=None,
+                  on_frame=None):
+    """
+    Generic video processing function
+
+    source is a VideoSource (already opened and probed) or a path.
+    process_batch(frames, start_idx) receives up to batch_size decoded frames
+    and returns a list of (processed_frame, frame_results) in the same order.
+    progress(frames_done, frames_total) is called as batches are written and
+    on_frame(frame_idx, processed_frame, frame_results) for every frame.
+    """
+    if not isinstance(source, VideoSource):
+        source = VideoSource(source)
+        try:
+            return process_video(source, output_path, process_batch, batch_size, progress, on_frame)
+        finally:
+            source.release()
     
-    frame_count = 0
-    results = {}
+    if not source.opened:
+        return None, "Failed to open video"
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Process frame using provided function
-        processed_frame, frame_results = process_func(frame, frame_count)
-        writer.write(processed_frame)
-        
-        # Update results
-        if frame_results:
-            for key, value in frame_results.items():
-                results[key] = value
-        
-        frame_count += 1
+    cap = source.cap
+    total_frames = source.frame_count
+    writer = open_video_writer(output_path, source.fps, source.width, source.height)
+    
+    start_time = time.perf_counter()
+    
+    # Decode, inference and encode run as overlapping pipeline stages
+    try:
+        frame_count, results = run_pipeline(
+            cap, writer, process_batch, batch_size, PIPELINE_QUEUE_SIZE,
+            progress=(lambda done: progress(done, total_frames)) if progress else None,
+            on_frame=on_frame
+        )
+    finally:
+        writer.release()
     
-    cap.release()
-    writer.release()
+    finalize_video(output_path)
+    elapsed = time.perf_counter() - start_time
     
     results["frames_processed"] = frame_count
+    results["batch_size"] = batch_size
+    results["processing_time"] = round(elapsed, 3)
+    results["fps"] = round(frame_count / elapsed, 2) if elapsed > 0 else 0.0
+    return results, None
+
+def get_segments():
+    """Segment count from form field segments: auto (SEGMENT_WORKERS), <N>, or 0 (sequential)"""
+    value = request.form.get("segments", "").strip().lower()
+    if value in ("auto", "true"):
+        return SEGMENT_WORKERS
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return 0
+
+def use_segments(source, segments):
+    """
+    True when a video request should run segment-parallel
+
+    Needs at least two SEGMENT_MIN_FRAMES segments and a known frame count;
+    stream=mjpeg needs every annotated frame in this process, so it always
+    runs sequentially.
+    """
+    if segments < 2 or request.form.get("stream", "").lower() == "mjpeg":
+        return False
+    return source.opened and source.frame_count >= 2 * SEGMENT_MIN_FRAMES
+
+def get_segment_executor():
+    """Process pool for segment workers, started on first use"""
+    global SEGMENT_EXECUTOR
+    with SEGMENT_EXECUTOR_LOCK:
+        if SEGMENT_EXECUTOR is None:
+            threads = max(1, (os.cpu_count() or 1) // max(1, SEGMENT_WORKERS))
+            SEGMENT_EXECUTOR = ProcessPoolExecutor(
+                max_workers=max(1, SEGMENT_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_segment_worker, initargs=(threads,)
+            )
+            atexit.register(SEGMENT_EXECUTOR.shutdown, wait=False, cancel_futures=True)
+        return SEGMENT_EXECUTOR
+
+def segment_options(enhance, enhancement_kind, brightness, contrast, model_res, batch_size,
+                    stride=None, **extra):
+    """Picklable processing options for run_segment"""
+    return dict(
+        extra, enhance=enhance, enhancement_kind=enhancement_kind, brightness=brightness,
+        contrast=contrast, model_res=model_res, batch_size=batch_size,
+        stride=(stride.stride, stride.adaptive) if stride is not None else None
+    )
+
+def read_segment(path, start, end=None, batch_size=1):
+    """Decode frames [start, end) of a video (end=None: until EOF), yields (start_idx, frames)"""
+    source = VideoSource(path)
+    try:
+        if start:
+            source.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        idx = start
+        while end is None or idx < end:
+            count = batch_size if end is None else min(batch_size, end - idx)
+            frames = []
+            for _ in range(count):
+                ret, frame = source.cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                return
+            yield idx, frames
+            idx += len(frames)
+    finally:
+        source.release()
+
+def detections_to_arrays(detections):
+    """sv.Detections -> dict of numpy arrays (picklable, see TrackStitcher)"""
+    n = len(detections)
+    return {
+        "xyxy": np.asarray(detections.xyxy, dtype=np.float32).reshape(n, 4),
+        "class_id": np.asarray(detections.class_id, dtype=np.int64).reshape(n),
+        "confidence": np.asarray(detections.confidence, dtype=np.float32).reshape(n),
+        "tracker_id": np.asarray(
+            detections.tracker_id if detections.tracker_id is not None else [-1] * n, dtype=np.int64
+        ).reshape(n)
+    }
+
+def arrays_to_detections(arrays):
+    """Inverse of detections_to_arrays"""
+    return sv.Detections(
+        xyxy=arrays["xyxy"], class_id=arrays["class_id"],
+        confidence=arrays["confidence"], tracker_id=arrays["tracker_id"]
+    )
+
+def run_segment(task):
+    """
+    Process one video segment in a segment worker process
+
+    op "detect": detect, annotate and encode frames [start, end) to
+    task["output"]; returns the per-frame detection lists.
+    op "track": track frames [begin, end) with a fresh tracker, without
+    drawing; returns per-frame detection arrays for TrackStitcher.
+    op "render": draw the stitched task["frames"] (and zone counts) onto
+    frames [start, end) and encode them to task["output"].
+    Every result also has "elapsed", the seconds this worker spent on it.
+    """
+    started = time.perf_counter()
+    opts = task["options"]
+    stride = None
+    if opts["stride"] is not None:
+        k, adaptive = opts["stride"]
+        stride = FrameStride(stride=k, adaptive=adaptive, max_stride=MAX_VIDEO_STRIDE)
+    enhancement = (opts["enhance"], opts["enhancement_kind"], opts["brightness"], opts["contrast"])
+
+    if task["op"] == "track":
+        session = TrackerSession(opts["tracker"])
+        frames_out = []
+        for idx, frames in read_segment(task["video"], task["begin"], task["end"], opts["batch_size"]):
+            for _, detections, _ in track_frames(
+                frames, session, *enhancement, idx, stride, opts["model_res"],
+                annotate=False, roi=opts.get("roi")
+            ):
+                frames_out.append(detections_to_arrays(detections))
+        return {"frames": frames_out, "keyframes": stride.keyframes if stride else 0,
+                "elapsed": time.perf_counter() - started}
+
+    writer = open_video_writer(task["output"], task["fps"], task["width"], task["height"])
+    try:
+        if task["op"] == "detect":
+            detections_out = []
+            for idx, frames in read_segment(task["video"], task["start"], task["end"], opts["batch_size"]):
+                for annotated, detections in detect_frames(frames, *enhancement, idx, stride, opts["model_res"]):
+                    writer.write(annotated)
+                    detections_out.append(detections)
+            return {"detections": detections_out, "keyframes": stride.keyframes if stride else 0,
+                    "elapsed": time.perf_counter() - started}
+
+        # render: same canvas as track_frames draws on (enhanced frame or ROI)
+        zones = None
+        if task.get("zones"):
+            spec = task["zones"]
+            zones = ZoneEngine(dict(zip(spec["ids"], spec["polygons"])), (task["width"], task["height"]))
+        roi = opts.get("roi")
+        stitched = task["frames"]
+        i = 0
+        for _, frames in read_segment(task["video"], task["start"], task["end"], opts["batch_size"]):
+            for frame in frames:
+                if i >= len(stitched):
+                    break
+                canvas = frame
+                if opts["enhance"] and not opts["model_res"]:
+                    if roi is None:
+                        canvas = prepare_frame(frame, *enhancement)
+                    else:
+                        x0, y0, x1, y1 = roi
+                        frame[y0:y1, x0:x1] = prepare_frame(frame[y0:y1, x0:x1], *enhancement)
+                annotated, _ = annotate_detections(canvas, arrays_to_detections(stitched[i]))
+                if zones is not None:
+                    zones.current_counts = np.asarray(task["zone_counts"][i], dtype=np.int64)
+                    annotated = zones.annotate(annotated)
+                writer.write(annotated)
+                i += 1
+        return {"frames": i, "elapsed": time.perf_counter() - started}
+    finally:
+        writer.release()
+
+def process_video_segmented(source, output_path, options, segments, on_detections=None,
+                            zone_spec=None, stride=None, progress=None, on_frame=None):
+    """
+    Segment-parallel counterpart of process_video for long videos
+
+    The video is split into keyframe-aligned segments processed by the
+    segment workers, and the encoded segments are concatenated in order.
+    Without on_detections every segment is detected and encoded in one pass.
+    With on_detections (track/count) workers first track each segment from
+    SEGMENT_OVERLAP frames before its start; track ids are stitched across
+    boundaries here, in frame order, and on_detections(detections, frame_idx)
+    returns (frame_results, zone_counts) before the workers draw and encode
+    the stitched result. Keyframes run by the workers are added to stride.
+    Returns (results, err) like process_video.
+
+    Track/count decode (and enhance) every frame twice, once to track and
+    once to render, because a segment's final ids are only known after all
+    earlier segments are stitched. Keeping the decoded or annotated frames
+    in the worker until then would cost about width*height*3 bytes per
+    frame per segment, and drawing the local ids and fixing them up later
+    is not possible once the frames are encoded. The render pass runs no
+    inference, so on CPU it costs a small part of the track pass, and
+    segment k's render is submitted as soon as it is stitched, overlapping
+    the tracking of later segments. The worker time of each pass is in
+    results["segments"]["busy_s"].
+    """
+    if not source.opened:
+        return None, "Failed to open video"
+
+    start_time = time.perf_counter()
+    total_frames = source.frame_count
+    keyframes = keyframe_indices(source.path, source.fps)
+    plan = plan_segments(total_frames, segments, SEGMENT_MIN_FRAMES, keyframes)
+    # The last segment reads to EOF in case the container's frame count is short
+    ends = [end for _, end in plan[:-1]] + [None]
+    executor = get_segment_executor()
+    work_dir = Path(tempfile.mkdtemp(prefix="segments_", dir=UPLOAD_TMP_DIR))
+    parts = [work_dir / f"part_{i:04d}{Path(output_path).suffix}" for i in range(len(plan))]
+    base = {
+        "video": str(source.path), "fps": source.fps, "width": source.width,
+        "height": source.height, "options": options
+    }
+    results = {}
+    frame_count = 0
+    futures = []
+    # Worker seconds per op, summed over segments
+    busy = dict.fromkeys(("detect",) if on_detections is None else ("track", "render"), 0.0)
+
+    def emit(frame_results):
+        nonlocal frame_count
+        results.update(frame_results)
+        if on_frame is not None:
+            on_frame(frame_count, None, frame_results)
+        frame_count += 1
+
+    try:
+        if on_detections is None:
+            futures = [
+                executor.submit(run_segment, dict(base, op="detect", start=start, end=end, output=str(part)))
+                for (start, _), end, part in zip(plan, ends, parts)
+            ]
+            for future in futures:
+                segment = future.result()
+                busy["detect"] += segment["elapsed"]
+                if stride is not None:
+                    stride.keyframes += segment["keyframes"]
+                for detections in segment["detections"]:
+                    emit({"detections_last_frame": len(detections), "detections": detections})
+                if progress:
+                    progress(frame_count, total_frames)
+        else:
+            begins = [preroll_start(start, SEGMENT_OVERLAP, keyframes) if i else 0
+                      for i, (start, _) in enumerate(plan)]
+            futures = [
+                executor.submit(run_segment, dict(base, op="track", begin=begin, end=end))
+                for begin, end in zip(begins, ends)
+            ]
+            stitcher = TrackStitcher()
+            renders = []
+            for future, begin, (start, _), end, part in zip(futures, begins, plan, ends, parts):
+                segment = future.result()
+                busy["track"] += segment["elapsed"]
+                if stride is not None:
+                    stride.keyframes += segment["keyframes"]
+                with timed("stitch"):
+                    stitched = stitcher.add(segment["frames"], start - begin)
+                zone_counts = []
+                for offset, arrays in enumerate(stitched):
+                    frame_results, counts = on_detections(arrays_to_detections(arrays), start + offset)
+                    zone_counts.append(counts)
+                    emit(frame_results)
+                renders.append(executor.submit(run_segment, dict(
+                    base, op="render", start=start, end=end, output=str(part), frames=stitched,
+                    zones=zone_spec, zone_counts=zone_counts if zone_spec else None
+                )))
+                if progress:
+                    progress(frame_count, total_frames)
+            futures += renders
+            for future in renders:
+                busy["render"] += future.result()["elapsed"]
+
+        with timed("concat"):
+            concat = concat_videos(
+                parts, output_path,
+                lambda: open_video_writer(output_path, source.fps, source.width, source.height)
+            )
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    finalize_video(output_path)
+    elapsed = time.perf_counter() - start_time
+
+    results["frames_processed"] = frame_count
+    results["batch_size"] = options["batch_size"]
+    results["processing_time"] = round(elapsed, 3)
+    results["fps"] = round(frame_count / elapsed, 2) if elapsed > 0 else 0.0
+    results["segments"] = {
+        "count": len(plan),
+        "workers": SEGMENT_WORKERS,
+        "keyframe_aligned": keyframes is not None,
+        "concat": concat,
+        "busy_s": {op: round(seconds, 3) for op, seconds in busy.items()}
+    }
     return results, None
 
+def get_tracker_session(tracker_cfg):
+    """
+    Resolve the tracker session for an image request
+
+    With form field session_id the caller continues an existing stream
+    session, otherwise a one-off session is created for this request.
+    Returns (session, error).
+    """
+    session_id = request.form.get("session_id")
+    if session_id:
+        session = TRACKER_SESSIONS.get(session_id)
+        if session is None:
+            return None, "session_id not found"
+        return session, None
+    return TRACKER_SESSIONS.create(tracker_cfg), None
+
+def release_tracker_session(session):
+    """Release one-off sessions; stream sessions stay until DELETE /sessions/<id>"""
+    if request.form.get("session_id") != session.id:
+        TRACKER_SESSIONS.release(session.id)
+
+def open_upload_video(file):
+    """
+    Open an uploaded video as a VideoSource without copying it
+
+    The source is released at request teardown unless a video job claims
+    it with claim_upload, so the spooled file is removed even on errors.
+    """
+    source = VideoSource(ingest_upload(file, UPLOAD_TMP_DIR), owned=True)
+    if "video_sources" not in g:
+        g.video_sources = []
+    g.video_sources.append(source)
+    return source
+
+def claim_upload(source):
+    """Hand an uploaded VideoSource over to a video job, which releases it"""
+    sources = g.get("video_sources", [])
+    if source in sources:
+        sources.remove(source)
+
+def metrics_endpoint():
+    """Route pattern as metrics label, so filenames and ids don't explode cardinality"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.before_request
+def start_request_metrics():
+    if not METRICS.enabled:
+        return
+    g.metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    if request.content_length:
+        HTTP_REQUEST_BYTES.inc(request.content_length, endpoint=metrics_endpoint())
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get("metrics_start")
+    if start is not None:
+        endpoint = metrics_endpoint()
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        if response.content_length:
+            HTTP_RESPONSE_BYTES.inc(response.content_length, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc=None):
+    if g.pop("metrics_start", None) is not None:
+        HTTP_IN_FLIGHT.dec()
+
+@app.teardown_request
+def release_unclaimed_uploads(exc=None):
+    """Release uploaded videos that no job took ownership of"""
+    for source in g.pop("video_sources", []):
+        source.release()
+
+@app.errorhandler(InferencePoolBusy)
+def inference_pool_busy(e):
+    """Every inference worker already has its queue full: shed load instead of piling up"""
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+def sweep_stale_uploads():
+    """Remove spooled uploads left behind by a crashed process"""
+    cutoff = time.time() - UPLOAD_STALE_SECONDS
+    for path in UPLOAD_TMP_DIR.glob("*"):
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+    # Legacy upload copies from before uploads were spooled
+    for path in OUTPUT_DIR.glob("tmp_in_*"):
+        remove_file(path)
+
+def remove_file(path):
+    """Delete a temporary file, ignoring errors"""
+    try:
+        path.unlink()
+    except:
+        pass
+
+def run_video_request(kind, source, output_path, process_batch, batch_size, build_response,
+                      session=None, runner=None):
+    """
+    Process an uploaded video inline, as a background job or as a stream
+
+    build_response(results) turns the process_video results into the
+    endpoint's JSON payload. With form field async=true the video is queued
+    on JOBS and the job id is returned immediately; the payload is then
+    available from /jobs/<job_id>. With stream=sse/mjpeg per-frame results
+    are streamed while processing runs. The tracker session, if any, is
+    released once the video is done.
+
+    Every frame's "detections" are also appended to a columnar log next to
+    the output video (see DETECTION_LOG), linked as detections_url.
+    runner(progress, on_frame), if given, replaces process_video (see
+    process_video_segmented).
+    """
+    claim_upload(source)
+    job_id = uuid.uuid4().hex
+    log_path = sidecar_path(output_path)
+    
+    def release():
+        source.release()
+        if session is not None:
+            TRACKER_SESSIONS.release(session.id)
+    
+    def run_job(progress=None, on_frame=None):
+        log = None
+        if DETECTION_LOG and source.opened:
+            log = DetectionLogWriter(
+                log_path, fps=source.fps, names=model.names,
+                chunk_rows=DETECTION_LOG_CHUNK_ROWS, kind=kind, job_id=job_id,
+                video=Path(output_path).name, width=source.width, height=source.height
+            )
+            stream_frame = on_frame
+            
+            def on_frame(frame_idx, processed_frame, frame_results):
+                log.append(frame_idx, (frame_results or {}).get("detections") or [])
+                if stream_frame is not None:
+                    stream_frame(frame_idx, processed_frame, frame_results)
+        
+        try:
+            if runner is not None:
+                results, err = runner(progress, on_frame)
+            else:
+                results, err = process_video(
+                    source, output_path, process_batch, batch_size, progress, on_frame
+                )
+        except Exception:
+            if log is not None:
+                log.abort()
+            raise
+        finally:
+            # Cleanup
+            release()
+        if err:
+            if log is not None:
+                log.abort()
+            return None, err
+        ARTIFACTS.register(output_path, kind=kind, job_id=job_id)
+        FRAMES_PROCESSED.inc(results.get("frames_processed", 0), kind=kind)
+        payload = build_response(results)
+        if "segments" in results:
+            payload["segments"] = results["segments"]
+        if log is not None:
+            log.close()
+            ARTIFACTS.register(log_path, kind=kind, job_id=job_id)
+            payload["detections_url"] = f"/detections/{Path(output_path).name}"
+        return payload, None
+    
+    stream_mode = request.form.get("stream", "").lower()
+    if stream_mode in ("sse", "mjpeg"):
+        return stream_video_response(run_job, stream_mode)
+    
+    if request.form.get("async", "false").lower() == "true":
+        try:
+            job = JOBS.submit(kind, run_job, job_id=job_id)
+        except JobQueueFull as e:
+            release()
+            return jsonify({"error": str(e)}), 503
+        return jsonify({
+            "type": "job",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}"
+        }), 202
+    
+    payload, err = run_job()
+    if err:
+        return jsonify({"error": err}), 500
+    return jsonify(payload)
+
+def stream_video_response(run_job, mode):
+    """
+    Run a video job in a thread and stream its per-frame results
+
+    sse: text/event-stream with one "frame" event per frame (frame index,
+    detections, counts) and a final "done" event carrying the usual
+    response payload (or "error").
+    mjpeg: multipart/x-mixed-replace of annotated JPEG frames, ending with
+    an application/json part holding the final payload.
+    """
+    channel = EventChannel(maxsize=STREAM_QUEUE_SIZE)
+    
+    def on_frame(frame_idx, processed_frame, frame_results):
+        if mode == "mjpeg":
+            _, buffer = cv2.imencode(
+                ".jpg", processed_frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_JPEG_QUALITY]
+            )
+            channel.send("frame", buffer.tobytes())
+        else:
+            channel.send("frame", dict(frame_results or {}, frame=frame_idx))
+    
+    def worker():
+        try:
+            payload, err = run_job(on_frame=on_frame)
+            if err:
+                channel.send("error", {"error": err})
+            else:
+                channel.send("done", payload)
+        except StreamCancelled:
+            pass
+        except Exception as e:
+            try:
+                channel.send("error", {"error": str(e)})
+            except StreamCancelled:
+                pass
+    
+    threading.Thread(target=worker, name="video-stream", daemon=True).start()
+    
+    def generate():
+        try:
+            while True:
+                event, data = channel.receive()
+                if mode == "mjpeg":
+                    if event == "frame":
+                        yield mjpeg_part(data)
+                    else:
+                        yield mjpeg_part(json.dumps(data).encode("utf-8"), "application/json")
+                else:
+                    yield sse_event(event, data)
+                if event != "frame":
+                    break
+        finally:
+            # Client finished or disconnected: stop the pipeline
+            channel.close()
+    
+    if mode == "mjpeg":
+        mimetype = f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+    else:
+        mimetype = "text/event-stream"
+    return Response(generate(), mimetype=mimetype, headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 # ============================================================================
 # ENDPOINT 1: DETECT
 # Supports: Photo & Video
@@ -187,68 +1320,220 @@ def detect():
     Form params:
     - file: image or video file
     - enhance: true/false (optional, default: false)
-    - enhancement_kind: CLAHE/histogram/gamma (optional, default: CLAHE)
+    - enhancement_kind: CLAHE/HE/BC/CS/gamma (optional, default: CLAHE)
+    - enhance_resolution: full/model (optional, default: full) - model enhances only the model input
     - brightness: int (optional, default: 0)
     - contrast: int (optional, default: 0)
+    - batch_size: int (optional, video only, default: VIDEO_BATCH_SIZE)
+    - stride: int or auto (optional, video only, default: 1) - run the model every Kth frame
+    - async: true/false (optional, video only, default: false) - queue as job
+    - stream: sse/mjpeg (optional, video only) - stream per-frame results while processing
+    - segments: auto or int (optional, video only, default: 0) - process long videos as parallel
+      segments (auto: SEGMENT_WORKERS); not combined with stream=mjpeg
+    - output: json/detections_only/binary/image (optional, image only, default: json)
+    - image_format: jpeg/webp/png, quality: 1-100 (optional, image only) - for json/binary/image
     """
     if "file" not in request.files:
         return jsonify({"error": "file not found"}), 400
     
     file = request.files["file"]
     enhance = request.form.get("enhance", "false").lower() == "true"
-    enhancement_kind = request.form.get("enhancement_kind", "CLAHE")
+    enhancement_kind, err = get_enhancement_kind(enhance)
+    if err:
+        return jsonify({"error": err}), 400
     brightness = int(request.form.get("brightness", 0))
     contrast = int(request.form.get("contrast", 0))
+    model_res = get_model_res()
+    batch_size = get_batch_size()
+    stride = get_stride()
     
     # Check if video or image
     if is_video_file(file):
         # Process video
-        tmp_in_path = OUTPUT_DIR / f"tmp_in_{uuid.uuid4().hex}.mp4"
-        file.save(str(tmp_in_path))
+        source = open_upload_video(file)
         
         out_path = OUTPUT_DIR / f"detect_{uuid.uuid4().hex}.mp4"
         
-        def process_func(frame, frame_idx):
-            annotated, detections = process_frame_detect(
-                frame, enhance, enhancement_kind, brightness, contrast
+        def process_batch(frames, start_idx):
+            outputs = detect_frames(
+                frames, enhance, enhancement_kind, brightness, contrast, start_idx, stride, model_res
             )
-            return annotated, {"detections_last_frame": len(detections)}
-        
-        results, err = process_video(tmp_in_path, out_path, process_func)
+            return [
+                (annotated, {"detections_last_frame": len(detections), "detections": detections})
+                for annotated, detections in outputs
+            ]
         
-        # Cleanup
-        try:
-            tmp_in_path.unlink()
-        except:
-            pass
+        def build_response(results):
+            return {
+                "type": "video",
+                "video_url": f"/video/{out_path.name}",
+                "frames_processed": results.get("frames_processed", 0),
+                "batch_size": results.get("batch_size", batch_size),
+                "processing_time": results.get("processing_time", 0.0),
+                "fps": results.get("fps", 0.0),
+                "stride": describe_stride(stride),
+                "enhancement_applied": enhance
+            }
         
-        if err:
-            return jsonify({"error": err}), 500
+        segments = get_segments()
+        if use_segments(source, segments):
+            options = segment_options(enhance, enhancement_kind, brightness, contrast, model_res,
+                                      batch_size, stride)
+            
+            def runner(progress, on_frame):
+                return process_video_segmented(
+                    source, out_path, options, segments, stride=stride, progress=progress,
+                    on_frame=on_frame
+                )
+        else:
+            runner = None
         
-        return jsonify({
-            "type": "video",
-            "video_url": f"/video/{out_path.name}",
-            "frames_processed": results.get("frames_processed", 0),
-            "enhancement_applied": enhance
-        })
+        return run_video_request("detect", source, out_path, process_batch, batch_size, build_response,
+                                 runner=runner)
     
     else:
         # Process image
+        output, err = get_output_options()
+        if err:
+            return jsonify({"error": err}), 400
+        cache_key = None
+        if output["mode"] in ("json", "detections_only"):
+            cache_key = image_cache_key(
+                "detect", enhance=enhance, enhancement_kind=enhancement_kind,
+                brightness=brightness, contrast=contrast, model_res=model_res, **output
+            )
+        if cache_key:
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                return cached_response(cached, hit=True)
+        
         img, err = read_image_from_request("file")
         if err:
             return jsonify({"error": err}), 400
         
         annotated, detections = process_frame_detect(
-            img, enhance, enhancement_kind, brightness, contrast
+            img, enhance, enhancement_kind, brightness, contrast, model_res,
+            annotate=output["mode"] != "detections_only"
         )
         
-        return jsonify({
+        response = {
             "type": "image",
-            "image": image_to_base64(annotated),
             "detections": detections,
             "total_detections": len(detections),
             "enhancement_applied": enhance
-        })
+        }
+        return image_response(response, annotated, output, cache_key)
+
+@app.route("/detect/batch", methods=["POST"])
+def detect_batch():
+    """
+    Detect objects in many images in one request
+    Form params:
+    - files: image files and/or zip archives of images (repeat the field)
+    - enhance, enhancement_kind, enhance_resolution, brightness, contrast: as /detect
+    - batch_size: int (optional, default: BATCH_IMAGE_SIZE, max: MAX_BATCH_IMAGE_SIZE) - images
+      per model call
+    - annotate: true/false (optional, default: false) - include annotated images
+    - image_format: jpeg/webp/png, quality: 1-100 (optional) - for annotated images
+    Response: application/x-ndjson, one line per image as each batch finishes,
+    then a final {"type": "summary"} line.
+    """
+    files = request.files.getlist("files") or request.files.getlist("file")
+    if not files:
+        return jsonify({"error": "files not found"}), 400
+    enhance = request.form.get("enhance", "false").lower() == "true"
+    enhancement_kind, err = get_enhancement_kind(enhance)
+    if err:
+        return jsonify({"error": err}), 400
+    brightness = int(request.form.get("brightness", 0))
+    contrast = int(request.form.get("contrast", 0))
+    model_res = get_model_res()
+    annotate = request.form.get("annotate", "false").lower() == "true"
+    output, err = get_output_options()
+    if err:
+        return jsonify({"error": err}), 400
+    try:
+        batch_size = int(request.form.get("batch_size", BATCH_IMAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "batch_size must be an integer"}), 400
+    batch_size = max(1, min(batch_size, MAX_BATCH_IMAGE_SIZE))
+    
+    def next_chunk(uploads, pool):
+        """Read the next batch_size uploads and start decoding them in the pool"""
+        chunk = []
+        for filename, data, error in uploads:
+            future = pool.submit(decode_image, data) if data is not None else None
+            chunk.append((filename, future, error))
+            if len(chunk) == batch_size:
+                break
+        return chunk
+    
+    def generate():
+        start_time = time.perf_counter()
+        total = failed = 0
+        truncated = False
+        uploads = iter_batch_uploads(files)
+        with ThreadPoolExecutor(max_workers=BATCH_DECODE_WORKERS) as pool:
+            # Decoding of the next batch overlaps inference on the current one
+            pending = next_chunk(uploads, pool)
+            while pending and total < BATCH_MAX_IMAGES:
+                chunk, pending = pending, next_chunk(uploads, pool)
+                if len(chunk) > BATCH_MAX_IMAGES - total:
+                    chunk = chunk[:BATCH_MAX_IMAGES - total]
+                    truncated = True
+                
+                lines = [None] * len(chunk)
+                frames, slots = [], []
+                for i, (filename, future, error) in enumerate(chunk):
+                    img = future.result() if future is not None else None
+                    if img is None:
+                        lines[i] = {"index": total + i, "filename": filename,
+                                    "error": error or "invalid image format"}
+                    else:
+                        frames.append(img)
+                        slots.append(i)
+                
+                if frames:
+                    outputs = detect_frames(
+                        frames, enhance, enhancement_kind, brightness, contrast,
+                        model_res=model_res, annotate=annotate
+                    )
+                    for i, (annotated, detections) in zip(slots, outputs):
+                        line = {
+                            "index": total + i,
+                            "filename": chunk[i][0],
+                            "detections": detections,
+                            "total_detections": len(detections)
+                        }
+                        if annotate:
+                            line["image"] = image_to_base64(annotated, output["image_format"], output["quality"])
+                        lines[i] = line
+                
+                failed += sum(1 for line in lines if "error" in line)
+                total += len(chunk)
+                yield "".join(json.dumps(line) + "\n" for line in lines)
+            
+            truncated = truncated or bool(pending)
+            for _, future, _ in pending:
+                if future is not None:
+                    future.cancel()
+        
+        elapsed = time.perf_counter() - start_time
+        yield json.dumps({
+            "type": "summary",
+            "images": total,
+            "failed": failed,
+            "truncated": truncated,
+            "batch_size": batch_size,
+            "enhancement_applied": enhance,
+            "processing_time": round(elapsed, 3),
+            "fps": round((total - failed) / elapsed, 2) if elapsed > 0 else 0.0
+        }) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 # ============================================================================
 # ENDPOINT 2: TRACK
@@ -263,71 +1548,136 @@ def track():
     Form params:
     - file: image or video file
     - enhance: true/false (optional, default: false)
-    - enhancement_kind: CLAHE/histogram/gamma (optional, default: CLAHE)
+    - enhancement_kind: CLAHE/HE/BC/CS/gamma (optional, default: CLAHE)
+    - enhance_resolution: full/model (optional, default: full) - model enhances only the model input
     - brightness: int (optional, default: 0)
     - contrast: int (optional, default: 0)
     - tracker: bytetrack.yaml/botsort.yaml (optional, default: bytetrack.yaml)
+    - session_id: optional, image only - continue a tracker session from /sessions
+    - batch_size: int (optional, video only, default: VIDEO_BATCH_SIZE)
+    - stride: int or auto (optional, video only, default: 1) - run the model every Kth frame
+    - async: true/false (optional, video only, default: false) - queue as job
+    - stream: sse/mjpeg (optional, video only) - stream per-frame results while processing
+    - segments: auto or int (optional, video only, default: 0) - process long videos as parallel
+      segments (auto: SEGMENT_WORKERS); not combined with stream=mjpeg
+    - output: json/detections_only/binary/image (optional, image only, default: json)
+    - image_format: jpeg/webp/png, quality: 1-100 (optional, image only) - for json/binary/image
     """
     if "file" not in request.files:
         return jsonify({"error": "file not found"}), 400
     
     file = request.files["file"]
     enhance = request.form.get("enhance", "false").lower() == "true"
-    enhancement_kind = request.form.get("enhancement_kind", "CLAHE")
+    enhancement_kind, err = get_enhancement_kind(enhance)
+    if err:
+        return jsonify({"error": err}), 400
     brightness = int(request.form.get("brightness", 0))
     contrast = int(request.form.get("contrast", 0))
     tracker_cfg = request.form.get("tracker", "bytetrack.yaml")
+    model_res = get_model_res()
+    batch_size = get_batch_size()
+    stride = get_stride()
     
     # Check if video or image
     if is_video_file(file):
         # Process video
-        tmp_in_path = OUTPUT_DIR / f"tmp_in_{uuid.uuid4().hex}.mp4"
-        file.save(str(tmp_in_path))
+        source = open_upload_video(file)
         
         out_path = OUTPUT_DIR / f"track_{uuid.uuid4().hex}.mp4"
         
-        def process_func(frame, frame_idx):
-            annotated, detections, labels = process_frame_track(
-                frame, enhance, enhancement_kind, brightness, contrast, tracker_cfg
-            )
-            return annotated, {"detections_last_frame": len(detections)}
+        session = TRACKER_SESSIONS.create(tracker_cfg)
         
-        results, err = process_video(tmp_in_path, out_path, process_func)
+        def process_batch(frames, start_idx):
+            outputs = track_frames(
+                frames, session, enhance, enhancement_kind, brightness, contrast, start_idx, stride,
+                model_res
+            )
+            return [
+                (annotated, {
+                    "detections_last_frame": len(detections),
+                    "detections": detections_to_list(detections)
+                })
+                for annotated, detections, labels in outputs
+            ]
         
-        # Cleanup
-        try:
-            tmp_in_path.unlink()
-        except:
-            pass
+        def build_response(results):
+            return {
+                "type": "video",
+                "video_url": f"/video/{out_path.name}",
+                "frames_processed": results.get("frames_processed", 0),
+                "batch_size": results.get("batch_size", batch_size),
+                "fps": results.get("fps", 0.0),
+                "stride": describe_stride(stride),
+                "enhancement_applied": enhance,
+                "tracker": tracker_cfg
+            }
         
-        if err:
-            return jsonify({"error": err}), 500
+        segments = get_segments()
+        if use_segments(source, segments):
+            options = segment_options(enhance, enhancement_kind, brightness, contrast, model_res,
+                                      batch_size, stride, tracker=tracker_cfg)
+            
+            def on_detections(detections, frame_idx):
+                return {
+                    "detections_last_frame": len(detections),
+                    "detections": detections_to_list(detections)
+                }, None
+            
+            def runner(progress, on_frame):
+                return process_video_segmented(
+                    source, out_path, options, segments, on_detections, stride=stride,
+                    progress=progress, on_frame=on_frame
+                )
+        else:
+            runner = None
         
-        return jsonify({
-            "type": "video",
-            "video_url": f"/video/{out_path.name}",
-            "frames_processed": results.get("frames_processed", 0),
-            "enhancement_applied": enhance,
-            "tracker": tracker_cfg
-        })
+        return run_video_request("track", source, out_path, process_batch, batch_size, build_response,
+                                 session=session, runner=runner)
     
     else:
-        # Process image
+        # Process image; results of stream sessions depend on earlier frames
+        output, err = get_output_options()
+        if err:
+            return jsonify({"error": err}), 400
+        cache_key = None
+        if not request.form.get("session_id") and output["mode"] in ("json", "detections_only"):
+            cache_key = image_cache_key(
+                "track", enhance=enhance, enhancement_kind=enhancement_kind,
+                brightness=brightness, contrast=contrast, tracker=tracker_cfg,
+                model_res=model_res, **output
+            )
+        if cache_key:
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                return cached_response(cached, hit=True)
+        
         img, err = read_image_from_request("file")
         if err:
             return jsonify({"error": err}), 400
         
-        annotated, detections, labels = process_frame_track(
-            img, enhance, enhancement_kind, brightness, contrast, tracker_cfg
-        )
+        session, err = get_tracker_session(tracker_cfg)
+        if err:
+            return jsonify({"error": err}), 404
         
-        return jsonify({
+        try:
+            annotated, detections, labels = process_frame_track(
+                img, session, enhance, enhancement_kind, brightness, contrast, model_res,
+                annotate=output["mode"] != "detections_only"
+            )
+        finally:
+            release_tracker_session(session)
+        
+        response = {
             "type": "image",
-            "image": image_to_base64(annotated),
             "num_detections": len(detections),
             "enhancement_applied": enhance,
-            "tracker": tracker_cfg
-        })
+            "tracker": session.tracker_cfg
+        }
+        if request.form.get("session_id"):
+            response["session_id"] = session.id
+        return image_response(
+            response, annotated, output, cache_key, detections=detections_to_list(detections)
+        )
 
 # ============================================================================
 # ENDPOINT 3: COUNT with REGION
@@ -342,11 +1692,25 @@ def count():
     Form params:
     - file: image or video file
     - enhance: true/false (optional, default: false)
-    - enhancement_kind: CLAHE/histogram/gamma (optional, default: CLAHE)
+    - enhancement_kind: CLAHE/HE/BC/CS/gamma (optional, default: CLAHE)
+    - enhance_resolution: full/model (optional, default: full) - model enhances only the model input
     - brightness: int (optional, default: 0)
     - contrast: int (optional, default: 0)
     - tracker: bytetrack.yaml/botsort.yaml (optional, default: bytetrack.yaml)
     - polygon_id: optional - if provided, use existing polygon; if not, auto-generate
+    - polygon_ids: optional - comma separated polygon ids counted together in one pass
+      (per-zone count, unique tracks and dwell time in "zones")
+    - roi: true/false (optional, default: false) - run detection/tracking only on the zones'
+      bounding box (+ roi_margin, fraction of its longest side, default: ROI_MARGIN)
+    - session_id: optional, image only - continue a tracker session from /sessions
+    - batch_size: int (optional, video only, default: VIDEO_BATCH_SIZE)
+    - stride: int or auto (optional, video only, default: 1) - run the model every Kth frame
+    - async: true/false (optional, video only, default: false) - queue as job
+    - stream: sse/mjpeg (optional, video only) - stream per-frame results while processing
+    - segments: auto or int (optional, video only, default: 0) - process long videos as parallel
+      segments (auto: SEGMENT_WORKERS); not combined with stream=mjpeg
+    - output: json/detections_only/binary/image (optional, image only, default: json)
+    - image_format: jpeg/webp/png, quality: 1-100 (optional, image only) - for json/binary/image
     """
     if "file" not in request.files:
         return jsonify({"error": "file not found"}), 400
@@ -354,171 +1718,283 @@ def count():
     file = request.files["file"]
     polygon_id = request.form.get("polygon_id", None)
     enhance = request.form.get("enhance", "false").lower() == "true"
-    enhancement_kind = request.form.get("enhancement_kind", "CLAHE")
+    enhancement_kind, err = get_enhancement_kind(enhance)
+    if err:
+        return jsonify({"error": err}), 400
     brightness = int(request.form.get("brightness", 0))
     contrast = int(request.form.get("contrast", 0))
     tracker_cfg = request.form.get("tracker", "bytetrack.yaml")
+    model_res = get_model_res()
+    batch_size = get_batch_size()
+    stride = get_stride()
     
-    # Get polygon zone - either use existing or create a new one
+    # Zones to count: polygon_ids (several, one pass) or polygon_id; without
+    # either a default polygon is generated from the frame size
+    polygon_ids = [pid.strip() for pid in request.form.get("polygon_ids", "").split(",") if pid.strip()]
+    unknown = [pid for pid in polygon_ids if pid not in POLYGON_ZONES]
+    if unknown:
+        return jsonify({"error": f"polygon_id not found: {', '.join(unknown)}"}), 404
+    if not polygon_ids and polygon_id and polygon_id in POLYGON_ZONES:
+        polygon_ids = [polygon_id]
     polygon_points = None
     auto_generated = False
     
-    if polygon_id and polygon_id in POLYGON_ZONES:
-        # Use existing polygon
-        poly_zone, poly_annot = POLYGON_ZONES[polygon_id]
+    # Videos are opened and probed once; the same capture is processed below
+    source = open_upload_video(file) if is_video_file(file) else None
+    img = None
+    if source is not None:
+        if not source.opened:
+            return jsonify({"error": "Failed to read video"}), 400
+        frame_shape = source.shape
     else:
-        # Need to create a new polygon, but we need image dimensions first
-        # Read the first frame to get dimensions
-        if is_video_file(file):
-            # Save temporarily to get dimensions
-            tmp_in_path = OUTPUT_DIR / f"tmp_in_{uuid.uuid4().hex}.mp4"
-            file.save(str(tmp_in_path))
-            
-            cap = cv2.VideoCapture(str(tmp_in_path))
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
-                try:
-                    tmp_in_path.unlink()
-                except:
-                    pass
-                return jsonify({"error": "Failed to read video"}), 400
-            
-            # Create default polygon based on video dimensions
-            polygon_id, polygon_points = create_default_polygon(frame.shape)
-            poly_zone, poly_annot = POLYGON_ZONES[polygon_id]
-            auto_generated = True
-        else:
-            # Read image to get dimensions
-            img, err = read_image_from_request("file")
-            if err:
-                return jsonify({"error": err}), 400
-            
-            # Create default polygon based on image dimensions
-            polygon_id, polygon_points = create_default_polygon(img.shape)
-            poly_zone, poly_annot = POLYGON_ZONES[polygon_id]
-            auto_generated = True
+        img, err = read_image_from_request("file")
+        if err:
+            return jsonify({"error": err}), 400
+        frame_shape = img.shape
+    
+    if not polygon_ids:
+        # Create default polygon based on frame dimensions
+        polygon_id, polygon_points = create_default_polygon(frame_shape)
+        polygon_ids = [polygon_id]
+        auto_generated = True
+    polygon_id = polygon_ids[0]
+    
+    zones = ZoneEngine(
+        {pid: POLYGON_ZONES[pid][0].polygon for pid in polygon_ids},
+        (frame_shape[1], frame_shape[0]),
+        fps=source.fps if source is not None else 0.0
+    )
+    
+    # ROI mode: detect and track only inside the zones' bounding box
+    roi = None
+    if request.form.get("roi", "false").lower() == "true":
+        try:
+            roi_margin = float(request.form.get("roi_margin", ROI_MARGIN))
+        except ValueError:
+            return jsonify({"error": "roi_margin must be a number"}), 400
+        roi = zones.roi(margin=roi_margin)
+    
+    def count_zones(annotated, detections, frame_idx=None):
+        """All zones in one lookup; returns (annotated, count, detections list)"""
+        with timed("zone"):
+            inside = zones.update(detections, frame_idx)
+            if annotated is not None:
+                annotated = zones.annotate(annotated)
+        detections_list = detections_to_list(detections)
+        for detection, row in zip(detections_list, inside):
+            detection["in_zone"] = bool(row.any())
+            if len(polygon_ids) > 1:
+                detection["zones"] = [pid for pid, hit in zip(polygon_ids, row) if hit]
+        return annotated, int(inside.any(axis=1).sum()), detections_list
+    
+    def add_zone_fields(response):
+        response["polygon_id"] = polygon_id
+        response["polygon_ids"] = polygon_ids
+        response["zones"] = zones.stats()
+        response["roi"] = list(roi) if roi is not None else None
+        response["auto_generated_polygon"] = auto_generated
+        if auto_generated and polygon_points:
+            response["polygon_points"] = polygon_points
+        return response
     
     # Check if video or image
-    if is_video_file(file):
+    if source is not None:
         # Process video
-        if not auto_generated:  # If we didn't already save the video
-            tmp_in_path = OUTPUT_DIR / f"tmp_in_{uuid.uuid4().hex}.mp4"
-            file.save(str(tmp_in_path))
-        
         out_path = OUTPUT_DIR / f"count_{uuid.uuid4().hex}.mp4"
         
-        def process_func(frame, frame_idx):
-            # Apply enhancement
-            proc = frame.copy()
-            if enhance:
-                proc = apply_enhancement(proc, enhancement_kind, brightness, contrast)
-            
-            # Track objects
-            detections = run_tracking(model, proc, tracker_cfg=tracker_cfg)
-            
-            # Trigger counting in polygon
-            poly_zone.trigger(detections=detections)
-            
-            # Annotate
-            annotated = box_annotator.annotate(scene=proc, detections=detections)
-            
-            # Labels
-            labels = []
-            tracker_ids = detections.tracker_id if detections.tracker_id is not None else [None] * len(detections)
-            for cid, conf, tid in zip(detections.class_id, detections.confidence, tracker_ids):
-                if tid is not None:
-                    labels.append(f"#{tid} {model.names[cid]} {conf:0.2f}")
-                else:
-                    labels.append(f"{model.names[cid]} {conf:0.2f}")
+        session = TRACKER_SESSIONS.create(tracker_cfg)
+        
+        def process_batch(frames, start_idx):
+            outputs = []
+            tracked = track_frames(
+                frames, session, enhance, enhancement_kind, brightness, contrast, start_idx, stride,
+                model_res, roi=roi
+            )
+            for offset, (annotated, detections, labels) in enumerate(tracked):
+                annotated, frame_count, detections_list = count_zones(
+                    annotated, detections, start_idx + offset
+                )
+                outputs.append((annotated, {
+                    "count": frame_count,
+                    "detections": detections_list
+                }))
+            return outputs
+        
+        def build_response(results):
+            return add_zone_fields({
+                "type": "video",
+                "video_url": f"/video/{out_path.name}",
+                "frames_processed": results.get("frames_processed", 0),
+                "batch_size": results.get("batch_size", batch_size),
+                "fps": results.get("fps", 0.0),
+                "stride": describe_stride(stride),
+                "enhancement_applied": enhance,
+                "tracker": tracker_cfg,
+                "count": results.get("count", 0)
+            })
+        
+        segments = get_segments()
+        if use_segments(source, segments):
+            options = segment_options(enhance, enhancement_kind, brightness, contrast, model_res,
+                                      batch_size, stride, tracker=tracker_cfg, roi=roi)
             
-            annotated = label_annotator.annotate(scene=annotated, detections=detections, labels=labels)
+            def on_detections(detections, frame_idx):
+                _, frame_count, detections_list = count_zones(None, detections, frame_idx)
+                return {"count": frame_count, "detections": detections_list}, zones.current_counts.tolist()
             
-            # Annotate polygon zone
-            annotated = poly_annot.annotate(scene=annotated)
-
-            # Return count
-            return annotated, {
-                "count": int(poly_zone.current_count)
-            }
+            def runner(progress, on_frame):
+                return process_video_segmented(
+                    source, out_path, options, segments, on_detections,
+                    zone_spec={"ids": zones.ids, "polygons": zones.polygons}, stride=stride,
+                    progress=progress, on_frame=on_frame
+                )
+        else:
+            runner = None
         
-        results, err = process_video(tmp_in_path, out_path, process_func)
+        return run_video_request("count", source, out_path, process_batch, batch_size, build_response,
+                                 session=session, runner=runner)
+    
+    else:
+        output, err = get_output_options()
+        if err:
+            return jsonify({"error": err}), 400
         
-        # Cleanup
+        # Enhance, track and annotate objects
+        session, err = get_tracker_session(tracker_cfg)
+        if err:
+            return jsonify({"error": err}), 404
         try:
-            tmp_in_path.unlink()
-        except:
-            pass
+            annotated, detections, labels = process_frame_track(
+                img, session, enhance, enhancement_kind, brightness, contrast, model_res,
+                annotate=output["mode"] != "detections_only", roi=roi
+            )
+        finally:
+            release_tracker_session(session)
         
-        if err:
-            return jsonify({"error": err}), 500
+        annotated, frame_count, detections_list = count_zones(annotated, detections)
         
+        response = add_zone_fields({
+            "type": "image",
+            "enhancement_applied": enhance,
+            "tracker": tracker_cfg,
+            "count": frame_count
+        })
+        return image_response(response, annotated, output, detections=detections_list)
+
+# ============================================================================
+# ENDPOINT 4: LINE COUNT
+# Supports: Video
+# Features: Tracking + Line crossing (in/out per line and class) + Enhancement
+# ============================================================================
+
+@app.route("/count/line", methods=["POST"])
+def count_line():
+    """
+    Count objects crossing one or more lines
+    Form params:
+    - file: video file
+    - line_ids: comma separated line ids from /line/create (optional)
+    - lines: JSON list of [[x1, y1], [x2, y2]] lines for this request only (optional);
+      without line_ids or lines a horizontal line across the middle is generated
+    - enhance, enhancement_kind, enhance_resolution, brightness, contrast: as /count
+    - tracker: bytetrack.yaml/botsort.yaml (optional, default: bytetrack.yaml)
+    - batch_size, stride, async, stream: as /count
+    "in" is a crossing onto the right-hand side of start -> end as seen on screen
+    (for a left-to-right line: moving down), "out" the opposite.
+    """
+    if "file" not in request.files:
+        return jsonify({"error": "file not found"}), 400
+    
+    file = request.files["file"]
+    if not is_video_file(file):
+        return jsonify({"error": "line counting needs a video"}), 400
+    enhance = request.form.get("enhance", "false").lower() == "true"
+    enhancement_kind, err = get_enhancement_kind(enhance)
+    if err:
+        return jsonify({"error": err}), 400
+    brightness = int(request.form.get("brightness", 0))
+    contrast = int(request.form.get("contrast", 0))
+    tracker_cfg = request.form.get("tracker", "bytetrack.yaml")
+    model_res = get_model_res()
+    batch_size = get_batch_size()
+    stride = get_stride()
+    
+    try:
+        lines = parse_lines(request.form.get("line_ids", ""), request.form.get("lines"))
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    source = open_upload_video(file)
+    if not source.opened:
+        return jsonify({"error": "Failed to read video"}), 400
+    
+    auto_generated = False
+    line_points_out = None
+    if not lines:
+        lines["default"] = default_line(source.shape)
+        line_points_out = [list(p) for p in lines["default"]]
+        auto_generated = True
+    try:
+        counter = LineCounter(lines)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    out_path = OUTPUT_DIR / f"line_{uuid.uuid4().hex}.mp4"
+    session = TRACKER_SESSIONS.create(tracker_cfg)
+    
+    def process_batch(frames, start_idx):
+        outputs = []
+        tracked = track_frames(
+            frames, session, enhance, enhancement_kind, brightness, contrast, start_idx, stride,
+            model_res
+        )
+        for annotated, detections, labels in tracked:
+            # All lines x all tracked detections in one vectorized check
+            with timed("lines"):
+                events = counter.update(detections)
+                annotated = counter.annotate(annotated)
+            crossings = []
+            if events.any():
+                det_idx, line_idx = np.nonzero(events)
+                for d, li in zip(det_idx.tolist(), line_idx.tolist()):
+                    crossings.append({
+                        "line_id": counter.ids[li],
+                        "tracker_id": int(detections.tracker_id[d]),
+                        "class_id": int(detections.class_id[d]),
+                        "direction": "in" if events[d, li] > 0 else "out"
+                    })
+            outputs.append((annotated, {
+                "line_counts": {
+                    lid: {"in": int(n_in), "out": int(n_out)}
+                    for lid, n_in, n_out in zip(counter.ids, counter.in_counts, counter.out_counts)
+                },
+                "crossings": crossings,
+                "detections": detections_to_list(detections)
+            }))
+        return outputs
+    
+    def build_response(results):
         response = {
             "type": "video",
             "video_url": f"/video/{out_path.name}",
             "frames_processed": results.get("frames_processed", 0),
+            "batch_size": results.get("batch_size", batch_size),
+            "fps": results.get("fps", 0.0),
+            "stride": describe_stride(stride),
             "enhancement_applied": enhance,
-            "polygon_id": polygon_id,
             "tracker": tracker_cfg,
-            "count": results.get("count", 0),
-            "auto_generated_polygon": auto_generated
+            "line_ids": counter.ids,
+            "lines": counter.stats(model.names),
+            "auto_generated_line": auto_generated
         }
-        
-        if auto_generated and polygon_points:
-            response["polygon_points"] = polygon_points
-        
-        return jsonify(response)
+        if auto_generated:
+            response["line_points"] = line_points_out
+        return response
     
-    else:
-        # Process image
-        if not auto_generated:  # If we didn't already read the image
-            img, err = read_image_from_request("file")
-            if err:
-                return jsonify({"error": err}), 400
-        
-        # Apply enhancement
-        proc = img.copy()
-        if enhance:
-            proc = apply_enhancement(proc, enhancement_kind, brightness, contrast)
-        
-        # Track objects
-        detections = run_tracking(model, proc, tracker_cfg=tracker_cfg)
-        
-        # Trigger counting in polygon
-        poly_zone.trigger(detections=detections)
-        
-        # Annotate
-        annotated = box_annotator.annotate(scene=proc, detections=detections)
-        
-        # Labels
-        labels = []
-        tracker_ids = detections.tracker_id if detections.tracker_id is not None else [None] * len(detections)
-        for cid, conf, tid in zip(detections.class_id, detections.confidence, tracker_ids):
-            if tid is not None:
-                labels.append(f"#{tid} {model.names[cid]} {conf:0.2f}")
-            else:
-                labels.append(f"{model.names[cid]} {conf:0.2f}")
-        
-        annotated = label_annotator.annotate(scene=annotated, detections=detections, labels=labels)
-        
-        # Annotate polygon zone
-        annotated = poly_annot.annotate(scene=annotated)
-        
-        response = {
-            "type": "image",
-            "image": image_to_base64(annotated),
-            "enhancement_applied": enhance,
-            "polygon_id": polygon_id,
-            "tracker": tracker_cfg,
-            "count": int(poly_zone.current_count),
-            "auto_generated_polygon": auto_generated
-        }
-        
-        if auto_generated and polygon_points:
-            response["polygon_points"] = polygon_points
-        
-        return jsonify(response)
+    return run_video_request("line", source, out_path, process_batch, batch_size, build_response,
+                             session=session)
 
 # ============================================================================
 # POLYGON MANAGEMENT
@@ -565,19 +2041,335 @@ def delete_polygon(polygon_id):
         return jsonify({"message": "Polygon deleted successfully"})
     return jsonify({"error": "polygon_id not found"}), 404
 
+# ============================================================================
+# LINE MANAGEMENT
+# ============================================================================
+
+@app.route("/line/create", methods=["POST"])
+def create_line():
+    """
+    Create a counting line for /count/line
+    JSON body:
+    - points: [[x1, y1], [x2, y2]] (start, end)
+    Example: {"points": [[0, 360], [1280, 360]]}
+    """
+    data = request.get_json(force=True)
+    points = data.get("points")
+    if not isinstance(points, list) or len(points) != 2:
+        return jsonify({"error": "points must be [[x1, y1], [x2, y2]]"}), 400
+    
+    try:
+        start, end = (sv.Point(int(p[0]), int(p[1])) for p in points)
+        if (start.x, start.y) == (end.x, end.y):
+            return jsonify({"error": "line start and end must differ"}), 400
+        lid = uuid.uuid4().hex
+        LINE_ZONES[lid] = create_line_zone(start, end)
+        return jsonify({
+            "line_id": lid,
+            "message": "Line created successfully"
+        })
+    except Exception as e:
+        return jsonify({"error": f"Failed to create line: {str(e)}"}), 400
+
+@app.route("/line/list", methods=["GET"])
+def list_lines():
+    """List all created counting lines"""
+    return jsonify({
+        "lines": {lid: [list(p) for p in line_points(lid)] for lid in LINE_ZONES},
+        "total": len(LINE_ZONES)
+    })
+
+@app.route("/line/delete/<line_id>", methods=["DELETE"])
+def delete_line(line_id):
+    """Delete a counting line"""
+    if line_id in LINE_ZONES:
+        del LINE_ZONES[line_id]
+        return jsonify({"message": "Line deleted successfully"})
+    return jsonify({"error": "line_id not found"}), 404
+
+# ============================================================================
+# LIVE STREAMS
+# Supports: RTSP/HTTP streams, camera devices, local video files
+# Features: Continuous tracking / zone counting / line counting
+# ============================================================================
+
+def param_bool(params, name, default=False):
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    return str(value).lower() == "true"
+
+def get_live_session(session_id):
+    session = LIVE_SESSIONS.get(session_id)
+    if session is None:
+        return None, (jsonify({"error": "live session not found"}), 404)
+    return session, None
+
+@app.route("/live/start", methods=["POST"])
+def start_live():
+    """
+    Start tracking/counting continuously on a live source
+    JSON body or form params:
+    - source: rtsp://... (or http, rtmp, udp, ...) URL, camera index (0, 1, ...)
+      or a video file inside LIVE_SOURCE_DIR (a local stand-in for a camera)
+    - mode: track/count/line (optional, default: track)
+    - polygon_ids: comma separated polygon ids (count mode; default polygon when empty)
+    - line_ids, lines: as /count/line (line mode; default line when empty)
+    - tracker, enhance, enhancement_kind, enhance_resolution, brightness, contrast: as /track
+    - loop: true/false (file only, default: true) - start over at the end of the file
+    - realtime: true/false (default: true for files) - read files at their own fps
+    - fps: float (optional) - reading rate for realtime files instead of the file's fps
+    - preview: true/false (default: true) - annotate frames for /live/<id>/mjpeg
+    When processing is slower than the source, stale frames are dropped and
+    only the latest one is processed, so latency stays bounded.
+    """
+    params = request.get_json(silent=True) or request.form
+    mode = str(params.get("mode", "track")).lower()
+    if mode not in ("track", "count", "line"):
+        return jsonify({"error": "mode must be track, count or line"}), 400
+    try:
+        source, kind = parse_source(params.get("source"), LIVE_SOURCE_DIR or None)
+        fps = float(params["fps"]) if params.get("fps") else None
+        brightness = int(params.get("brightness", 0))
+        contrast = int(params.get("contrast", 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    enhance = param_bool(params, "enhance")
+    enhancement_kind, err = get_enhancement_kind(enhance, params)
+    if err:
+        return jsonify({"error": err}), 400
+    model_res = str(params.get("enhance_resolution", ENHANCE_RESOLUTION)).lower() == "model"
+    tracker_cfg = params.get("tracker", "bytetrack.yaml")
+    preview = param_bool(params, "preview", True)
+    
+    polygon_ids = [pid.strip() for pid in str(params.get("polygon_ids", "")).split(",") if pid.strip()]
+    unknown = [pid for pid in polygon_ids if pid not in POLYGON_ZONES]
+    if mode == "count" and unknown:
+        return jsonify({"error": f"polygon_id not found: {', '.join(unknown)}"}), 404
+    lines = {}
+    if mode == "line":
+        try:
+            lines = parse_lines(params.get("line_ids", ""), params.get("lines"))
+        except KeyError as e:
+            return jsonify({"error": e.args[0]}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    try:
+        live = LiveSession(
+            source, kind, None, loop=param_bool(params, "loop", True), realtime=param_bool(params, "realtime", None),
+            fps=fps, reconnect_delay=LIVE_RECONNECT_DELAY,
+            mode=mode, tracker=tracker_cfg, enhancement_applied=enhance, preview=preview
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    zones = counter = None
+    if mode == "count":
+        if polygon_ids:
+            polygons = {pid: POLYGON_ZONES[pid][0].polygon for pid in polygon_ids}
+        else:
+            # Like the default line, the default zone lives only in this session
+            polygon_ids = ["default"]
+            polygons = {"default": np.array(default_polygon(live.shape), dtype=np.int32)}
+        zones = ZoneEngine(
+            polygons, (live.width, live.height), fps=live.source_fps, evict_after=LIVE_TRACK_EVICT_FRAMES
+        )
+        live.meta["polygon_ids"] = polygon_ids
+    elif mode == "line":
+        if not lines:
+            lines["default"] = default_line(live.shape)
+        try:
+            counter = LineCounter(lines, evict_after=LIVE_TRACK_EVICT_FRAMES)
+        except ValueError as e:
+            live.stop()
+            return jsonify({"error": str(e)}), 400
+        live.meta["line_ids"] = counter.ids
+    
+    session = TRACKER_SESSIONS.create(tracker_cfg)
+    published = {"at": 0.0}
+    
+    def process(frame, frame_idx):
+        try:
+            annotated, detections, labels = process_frame_track(
+                frame, session, enhance, enhancement_kind, brightness, contrast, model_res, annotate=preview
+            )
+        except InferencePoolBusy:
+            # Shed this frame like any other stale one; the next read takes its place
+            return None
+        detections_list = detections_to_list(detections)
+        result = {"count": len(detections_list), "detections": detections_list}
+        if zones is not None:
+            with timed("zone"):
+                inside = zones.update(detections, frame_idx)
+                if annotated is not None:
+                    zones.annotate(annotated)
+            for detection, row in zip(detections_list, inside):
+                detection["in_zone"] = bool(row.any())
+            result["count"] = int(inside.any(axis=1).sum())
+        if counter is not None:
+            with timed("lines"):
+                counter.update(detections)
+                if annotated is not None:
+                    counter.annotate(annotated)
+        # Aggregate stats are throttled; in between the last ones are repeated
+        now = time.monotonic()
+        if now - published["at"] >= LIVE_STATS_INTERVAL:
+            published["at"] = now
+            if zones is not None:
+                published["zones"] = zones.stats()
+            if counter is not None:
+                published["lines"] = counter.stats(model.names)
+        for key in ("zones", "lines"):
+            if key in published:
+                result[key] = published[key]
+        return annotated, result
+    
+    def on_close():
+        TRACKER_SESSIONS.release(session.id)
+        FRAMES_PROCESSED.inc(live.frames_processed, kind="live")
+    
+    live.process = process
+    live.on_close = on_close
+    try:
+        LIVE_SESSIONS.add(live)
+    except LiveSessionLimit as e:
+        live.stop()
+        return jsonify({"error": str(e)}), 503
+    
+    return jsonify(dict(
+        live.status(),
+        status_url=f"/live/{live.id}",
+        events_url=f"/live/{live.id}/events",
+        mjpeg_url=f"/live/{live.id}/mjpeg" if preview else None,
+        stop_url=f"/live/{live.id}/stop"
+    )), 201
+
+@app.route("/live", methods=["GET"])
+def list_live():
+    """Status of every live session (running, or finished within LIVE_SESSION_KEEP seconds)"""
+    sessions = [session.status() for session in LIVE_SESSIONS.list()]
+    return jsonify({"sessions": sessions, "total": len(sessions)})
+
+@app.route("/live/<session_id>", methods=["GET"])
+def live_status(session_id):
+    """
+    Live session status: state, frames read/processed/dropped, effective fps,
+    latency and the latest counts and detections
+    """
+    session, err = get_live_session(session_id)
+    if err:
+        return err
+    return jsonify(session.status())
+
+@app.route("/live/<session_id>/stop", methods=["POST"])
+def stop_live(session_id):
+    """Stop a live session and return its final status"""
+    session = LIVE_SESSIONS.stop(session_id)
+    if session is None:
+        return jsonify({"error": "live session not found"}), 404
+    return jsonify(session.status())
+
+@app.route("/live/<session_id>/events", methods=["GET"])
+def live_events(session_id):
+    """
+    Server-Sent Events: a "frame" event per processed frame with the latest
+    counts and detections plus effective_fps/frames_dropped, and a final "end"
+    event with the session status. A slow client skips to the newest result.
+    """
+    session, err = get_live_session(session_id)
+    if err:
+        return err
+    
+    def generate():
+        version = 0
+        while True:
+            new_version, latest, _ = session.wait_update(version, timeout=15)
+            if new_version != version:
+                version = new_version
+                if latest is None:
+                    continue
+                status = session.status()
+                yield sse_event("frame", dict(
+                    latest, effective_fps=status["effective_fps"], frames_dropped=status["frames_dropped"],
+                    latency_ms=status["latency_ms"]
+                ))
+            elif session.closed:
+                yield sse_event("end", session.status())
+                return
+            else:
+                # Keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+    
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route("/live/<session_id>/mjpeg", methods=["GET"])
+def live_mjpeg(session_id):
+    """MJPEG preview of the latest annotated frame (multipart/x-mixed-replace)"""
+    session, err = get_live_session(session_id)
+    if err:
+        return err
+    if not session.meta.get("preview", True):
+        return jsonify({"error": "live session was started with preview=false"}), 409
+    
+    def generate():
+        version = 0
+        while True:
+            new_version, _, frame = session.wait_update(version, timeout=15)
+            if new_version != version:
+                version = new_version
+                if frame is None:
+                    continue
+                with timed("encode_image"):
+                    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_JPEG_QUALITY])
+                yield mjpeg_part(buffer.tobytes())
+            elif session.closed:
+                return
+    
+    return Response(generate(), mimetype=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 # ============================================================================
 # FILE MANAGEMENT
 # ============================================================================
 
+def artifact_etag(artifact):
+    """Strong ETag from the index entry (outputs are immutable once registered)"""
+    return f"{artifact.name}-{artifact.size:x}-{int(artifact.created_at * 1000):x}"
+
+def send_artifact(filename, **kwargs):
+    """
+    send_file for an indexed output, 404 if unknown or gone from disk
+
+    Responses are conditional: Range/If-Range give 206 partial content,
+    If-None-Match/If-Modified-Since give 304, with Accept-Ranges and ETag
+    always set so players can seek without re-downloading the file.
+    """
+    artifact = ARTIFACTS.get(filename)
+    if artifact is None:
+        return jsonify({"error": "file not found"}), 404
+    kwargs.setdefault("conditional", True)
+    kwargs.setdefault("etag", artifact_etag(artifact))
+    kwargs.setdefault("last_modified", artifact.created_at)
+    kwargs.setdefault("max_age", OUTPUT_MAX_AGE)
+    try:
+        response = send_file(str(artifact.path), **kwargs)
+        response.headers["Accept-Ranges"] = "bytes"
+        return response
+    except FileNotFoundError:
+        ARTIFACTS.forget(filename)
+        return jsonify({"error": "file not found"}), 404
+
 @app.route("/video/<filename>", methods=["GET"])
 def serve_video(filename):
-    """Serve processed video files"""
-    file_path = OUTPUT_DIR / filename
-    if not file_path.exists() or not file_path.is_file():
-        return jsonify({"error": "file not found"}), 404
-    
-    return send_file(
-        str(file_path),
+    """Serve processed video files (byte ranges and conditional requests)"""
+    return send_artifact(
+        filename,
         mimetype='video/mp4',
         as_attachment=False,
         download_name=filename
@@ -585,37 +2377,290 @@ def serve_video(filename):
 
 @app.route("/outputs", methods=["GET"])
 def list_outputs():
-    """List all output files"""
-    files = [str(p.name) for p in OUTPUT_DIR.glob("*") if p.is_file()]
-    return jsonify({"files": files, "total": len(files)})
+    """
+    List output files from the artifact index, newest first
+    Query params:
+    - page: int (optional, default: 1)
+    - per_page: int (optional, default: 50, max: 500)
+    - kind: detect/track/count/line (optional)
+    """
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = max(1, min(int(request.args.get("per_page", 50)), 500))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    kind = request.args.get("kind")
+    
+    items, total = ARTIFACTS.list(page, per_page, kind)
+    return jsonify({
+        "files": [a.name for a in items],
+        "items": [a.to_dict() for a in items],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "store": ARTIFACTS.stats()
+    })
 
 @app.route("/download/<filename>", methods=["GET"])
 def download_file(filename):
     """Download a specific output file"""
-    file_path = OUTPUT_DIR / filename
-    if not file_path.exists() or not file_path.is_file():
-        return jsonify({"error": "file not found"}), 404
+    return send_artifact(filename, as_attachment=True)
+
+# ============================================================================
+# DETECTION LOGS
+# ============================================================================
+
+def open_detection_log(filename):
+    """Resolve the detection log for an output video, returns (log, error response)"""
+    artifact = ARTIFACTS.get(sidecar_path(filename).name)
+    if artifact is None:
+        return None, (jsonify({"error": "detection log not found"}), 404)
+    try:
+        return DetectionLog(artifact.path), None
+    except FileNotFoundError:
+        ARTIFACTS.forget(artifact.name)
+        return None, (jsonify({"error": "detection log not found"}), 404)
+
+def parse_log_filters(log):
+    """
+    Frame range and class filter from query params, returns (filters, error)
+
+    start/end are seconds and frame_start/frame_end frame indices (end
+    exclusive); classes is a comma list of class ids or names.
+    """
+    try:
+        frame_start = request.args.get("frame_start", type=int)
+        frame_end = request.args.get("frame_end", type=int)
+        if "start" in request.args:
+            frame_start = log.time_to_frame(float(request.args["start"]))
+        if "end" in request.args:
+            frame_end = log.time_to_frame(float(request.args["end"]))
+    except ValueError:
+        return None, "start/end must be numbers"
+    
+    classes = None
+    if request.args.get("classes"):
+        name_to_id = {name: cid for cid, name in log.names.items()}
+        classes = []
+        for item in request.args["classes"].split(","):
+            item = item.strip()
+            if item.isdigit():
+                classes.append(int(item))
+            elif item in name_to_id:
+                classes.append(name_to_id[item])
+            else:
+                return None, f"unknown class: {item}"
+    return {"frame_start": frame_start, "frame_end": frame_end, "classes": classes}, None
+
+@app.route("/detections/<filename>", methods=["GET"])
+def download_detections(filename):
+    """Raw per-frame detection log (.npz, columnar) of an output video"""
+    return send_artifact(sidecar_path(filename).name, mimetype="application/octet-stream")
+
+@app.route("/detections/<filename>/query", methods=["GET"])
+def query_detections(filename):
+    """
+    Query the per-frame detection log of an output video
+    Query params:
+    - start/end: time range in seconds, or frame_start/frame_end (optional)
+    - classes: comma separated class ids or names (optional)
+    - track_id: comma separated tracker ids (optional)
+    - limit: max rows (optional, default/max: DETECTION_QUERY_LIMIT)
+    """
+    log, error_response = open_detection_log(filename)
+    if error_response:
+        return error_response
+    filters, err = parse_log_filters(log)
+    if err:
+        return jsonify({"error": err}), 400
+    try:
+        track_ids = [int(t) for t in request.args["track_id"].split(",")] if request.args.get("track_id") else None
+    except ValueError:
+        return jsonify({"error": "track_id must be integers"}), 400
+    limit = min(request.args.get("limit", DETECTION_QUERY_LIMIT, type=int), DETECTION_QUERY_LIMIT)
     
-    return send_file(str(file_path), as_attachment=True)
+    columns, truncated = log.query(track_ids=track_ids, limit=max(limit, 0), **filters)
+    return jsonify({
+        "video": filename,
+        "fps": log.fps,
+        "frame_count": log.meta.get("frame_count", 0),
+        "detections": log.to_rows(columns),
+        "returned": len(columns["frame"]),
+        "truncated": truncated
+    })
+
+@app.route("/detections/<filename>/tracks", methods=["GET"])
+def detection_tracks(filename):
+    """
+    Per-track summaries (first/last frame, duration, detections, mean
+    confidence, class, frames in zone) from the detection log
+    Query params: start/end or frame_start/frame_end, classes (optional)
+    """
+    log, error_response = open_detection_log(filename)
+    if error_response:
+        return error_response
+    filters, err = parse_log_filters(log)
+    if err:
+        return jsonify({"error": err}), 400
+    tracks = log.tracks(**filters)
+    return jsonify({
+        "video": filename,
+        "fps": log.fps,
+        "frame_count": log.meta.get("frame_count", 0),
+        "class_counts": log.meta.get("class_counts", {}),
+        "tracks": tracks,
+        "total": len(tracks)
+    })
+
+# ============================================================================
+# TRACKER SESSIONS
+# ============================================================================
+
+@app.route("/sessions", methods=["POST"])
+def create_session():
+    """
+    Create a tracker session so a stream of image requests keeps track IDs
+    JSON body or form:
+    - tracker: bytetrack.yaml/botsort.yaml (optional, default: bytetrack.yaml)
+    """
+    data = request.get_json(silent=True) or request.form
+    tracker_cfg = data.get("tracker", "bytetrack.yaml")
+    try:
+        session = TRACKER_SESSIONS.create(tracker_cfg)
+    except Exception as e:
+        return jsonify({"error": f"Failed to create session: {str(e)}"}), 400
+    return jsonify(session.to_dict())
+
+@app.route("/sessions", methods=["GET"])
+def list_sessions():
+    """List active tracker sessions"""
+    sessions = [s.to_dict() for s in TRACKER_SESSIONS.list()]
+    return jsonify({"sessions": sessions, "total": len(sessions)})
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    """Release a tracker session"""
+    if TRACKER_SESSIONS.release(session_id):
+        return jsonify({"message": "Session released successfully"})
+    return jsonify({"error": "session_id not found"}), 404
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Image result cache hit/miss counters and size"""
+    return jsonify(RESULT_CACHE.stats())
+
+@app.route("/cache", methods=["DELETE"])
+def clear_cache():
+    """Drop all cached image results"""
+    RESULT_CACHE.clear()
+    return jsonify({"message": "Cache cleared successfully"})
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Report progress and, once done, the result payload of a video job"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "job_id not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    """List known video jobs and worker pool usage"""
+    jobs = [job.to_dict() for job in JOBS.list()]
+    return jsonify({"jobs": jobs, "total": len(jobs), "pool": JOBS.stats()})
 
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
 
+def model_status():
+    """Load state of the in-process model, or of the worker pool with INFERENCE_WORKERS > 0"""
+    if INFERENCE_POOL is not None:
+        return INFERENCE_POOL.status()
+    return model_registry.status()
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text format: stage and request histograms, counters, queue depths"""
+    if not METRICS.enabled:
+        return jsonify({"error": "metrics disabled"}), 404
+    jobs = JOBS.stats()
+    cache = RESULT_CACHE.stats()
+    store = ARTIFACTS.stats()
+    for name, value in (
+        ("jobs_queued", jobs["queued"]),
+        ("jobs_running", jobs["running"]),
+        ("job_workers", jobs["workers"]),
+        ("tracker_sessions", len(TRACKER_SESSIONS.list())),
+        ("result_cache_bytes", cache["bytes"]),
+        ("result_cache_entries", cache["entries"]),
+        ("result_cache_hits", cache["hits"]),
+        ("result_cache_misses", cache["misses"]),
+        ("output_files", store["files"]),
+        ("output_bytes", store["bytes"]),
+        ("live_sessions", sum(s.running for s in LIVE_SESSIONS.list())),
+        ("model_ready", int(model_status()["ready"]))
+    ):
+        STATE_GAUGE.set(value, name=name)
+    if INFERENCE_POOL is not None:
+        pool = INFERENCE_POOL.status()
+        for name in ("inflight", "shm_slots_free", "shared_frames", "pickled_frames", "rejected"):
+            STATE_GAUGE.set(pool[name], name=f"inference_pool_{name}")
+        STATE_GAUGE.set(sum(w["state"] == "ready" for w in pool["workers"]), name="inference_workers_ready")
+    return Response(METRICS.render(), content_type=METRICS.content_type)
+
 @app.route("/health", methods=["GET"])
 def health_check():
-    """API health check"""
+    """API health check, including model load and warm-up state"""
     return jsonify({
         "status": "ok",
+        "model": model_status(),
         "endpoints": {
             "detect": "/detect",
+            "detect_batch": "/detect/batch",
             "track": "/track",
             "count": "/count",
+            "count_line": "/count/line",
             "polygon_create": "/polygon/create",
             "polygon_list": "/polygon/list",
-            "polygon_delete": "/polygon/delete/<id>"
+            "polygon_delete": "/polygon/delete/<id>",
+            "line_create": "/line/create",
+            "line_list": "/line/list",
+            "line_delete": "/line/delete/<id>",
+            "live_start": "/live/start",
+            "live_list": "/live",
+            "live_status": "/live/<id>",
+            "live_stop": "/live/<id>/stop",
+            "live_events": "/live/<id>/events",
+            "live_mjpeg": "/live/<id>/mjpeg",
+            "sessions": "/sessions",
+            "cache_stats": "/cache/stats",
+            "jobs": "/jobs",
+            "detections": "/detections/<video filename>",
+            "detections_query": "/detections/<video filename>/query",
+            "detections_tracks": "/detections/<video filename>/tracks",
+            "job_status": "/jobs/<id>",
+            "ready": "/ready",
+            "metrics": "/metrics"
         }
     })
 
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    status = model_status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+if not IN_WORKER_PROCESS:
+    sweep_stale_uploads()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,97 @@
+# model/export.py
+import json
+from pathlib import Path
+
+# Backend CPU yang bisa dipilih lewat YOLO_BACKEND
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Ultralytics export format per backend
+EXPORT_FORMATS = {"onnx": "onnx", "openvino": "openvino"}
+
+def backend_key(backend, int8=False, imgsz=640):
+    """Kunci manifest: export dengan ukuran input lain tidak dipakai ulang"""
+    return f"{backend}-int8-{imgsz}" if int8 else f"{backend}-{imgsz}"
+
+def _manifest_path(weights):
+    return Path(weights).parent / "exports.json"
+
+def _read_manifest(weights):
+    path = _manifest_path(weights)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def exported_path(weights, backend, int8=False, imgsz=640):
+    """
+    Lokasi artefak hasil export untuk backend, atau None bila belum ada
+
+    Nama file/direktori berbeda antar versi ultralytics, jadi path yang
+    dikembalikan export() dicatat di exports.json di samping bobot.
+    """
+    if backend == "torch":
+        return Path(weights)
+    entry = _read_manifest(weights).get(backend_key(backend, int8, imgsz))
+    if entry and Path(entry).exists():
+        return Path(entry)
+    return None
+
+def export_model(weights, backend, int8=False, imgsz=640, data=None):
+    """
+    Export bobot .pt ke format ONNX Runtime / OpenVINO (opsional INT8)
+
+    Args:
+        weights: path best.pt
+        backend: "onnx" atau "openvino"
+        int8: kuantisasi INT8 (dikalibrasi dengan `data`, default dataset
+            bawaan ultralytics)
+        imgsz: ukuran input model
+        data: yaml dataset untuk kalibrasi INT8
+
+    Returns:
+        Path: artefak hasil export
+    """
+    if backend not in EXPORT_FORMATS:
+        raise ValueError(f"backend must be one of {', '.join(EXPORT_FORMATS)}")
+    from ultralytics import YOLO
+    
+    kwargs = {"format": EXPORT_FORMATS[backend], "imgsz": imgsz, "dynamic": True}
+    if int8:
+        kwargs["int8"] = True
+        if data:
+            kwargs["data"] = data
+    print(f"[yolo] export {weights} ke {backend_key(backend, int8, imgsz)} ...")
+    artifact = Path(YOLO(str(weights)).export(**kwargs))
+    
+    manifest = _read_manifest(weights)
+    manifest[backend_key(backend, int8, imgsz)] = str(artifact)
+    _manifest_path(weights).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return artifact
+
+def resolve_model_path(weights, backend="torch", int8=False, imgsz=640, auto_export=True, data=None):
+    """Path model untuk backend, export dulu bila belum ada dan auto_export"""
+    if backend not in BACKENDS:
+        raise ValueError(f"YOLO_BACKEND must be one of {', '.join(BACKENDS)}")
+    path = exported_path(weights, backend, int8, imgsz)
+    if path is None:
+        if not auto_export:
+            raise FileNotFoundError(
+                f"no {backend_key(backend, int8, imgsz)} export of {weights}; "
+                f"run python -m model.export {backend} --imgsz {imgsz}"
+            )
+        path = export_model(weights, backend, int8=int8, imgsz=imgsz, data=data)
+    return path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export best.pt for CPU inference backends")
+    parser.add_argument("backend", choices=list(EXPORT_FORMATS))
+    parser.add_argument("--weights", default=str(Path(__file__).parent / "best.pt"))
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--data", default=None, help="dataset yaml for INT8 calibration")
+    args = parser.parse_args()
+    print(export_model(args.weights, args.backend, int8=args.int8, imgsz=args.imgsz, data=args.data))
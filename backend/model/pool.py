@@ -0,0 +1,438 @@
+# model/pool.py
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Default shared memory slot: one 1080p BGR frame; larger frames are pickled
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3
+
+class InferencePoolBusy(Exception):
+    """Raised when every worker already has its maximum number of batches in flight"""
+
+class FrameSlots:
+    """
+    Blok shared memory berukuran tetap untuk mengirim frame ke worker
+
+    Front process menyalin frame ke slot kosong dan hanya mengirim
+    (nama slot, shape, dtype) lewat queue; worker membaca frame sebagai view
+    numpy tanpa copy. Slot dikembalikan setelah worker selesai dengan batch.
+    """
+
+    def __init__(self, count, slot_bytes):
+        self.slot_bytes = int(slot_bytes)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=self.slot_bytes) for _ in range(count)]
+        self._free = list(range(count))
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return [block.name for block in self.blocks]
+
+    def put(self, frame):
+        """Salin frame ke slot kosong, returns index slot atau None (penuh / terlalu besar)"""
+        if frame.nbytes > self.slot_bytes:
+            return None
+        with self._lock:
+            if not self._free:
+                return None
+            idx = self._free.pop()
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.blocks[idx].buf)[...] = frame
+        return idx
+
+    def release(self, indices):
+        with self._lock:
+            self._free.extend(indices)
+
+    @property
+    def free(self):
+        with self._lock:
+            return len(self._free)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+def _worker_main(index, task_q, result_q, slot_names, threads):
+    """Loop worker: muat model sendiri, lalu jalankan batch dari task_q sampai menerima None"""
+    if threads:
+        # Before torch is imported, so its thread pools pick it up
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    from model.yolo import registry
+
+    blocks = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        if threads:
+            import cv2
+            import torch
+            cv2.setNumThreads(threads)
+            torch.set_num_threads(threads)
+        registry.load()
+        if not registry.ready:
+            result_q.put(("failed", index, registry.error))
+            return
+        model = registry.get()
+        result_q.put(("ready", index, dict(model.names), os.getpid()))
+
+        while True:
+            task = task_q.get()
+            if task is None:
+                break
+            task_id, specs, kwargs = task
+            frames = [
+                np.ndarray(spec[1], dtype=spec[2], buffer=blocks[spec[0]].buf) if spec[0] is not None else spec[3]
+                for spec in specs
+            ]
+            try:
+                kwargs.setdefault("imgsz", registry.imgsz)
+                results = model(frames, **kwargs)
+                # Only the boxes go back; the front process still has the frames
+                payload = [r.boxes.data.cpu().numpy() for r in results]
+                result_q.put(("done", index, task_id, payload, None))
+            except Exception as e:
+                result_q.put(("done", index, task_id, None, f"{type(e).__name__}: {e}"))
+            # Drop views into shared memory before the slots are reused or closed
+            del frames
+            results = None
+    finally:
+        for block in blocks:
+            block.close()
+
+class _Worker:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.task_q = None
+        self.state = "not_started"
+        self.pid = None
+        self.error = None
+        self.inflight = 0
+        self.tasks = 0
+        self.restarts = 0
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "state": self.state,
+            "inflight": self.inflight,
+            "tasks": self.tasks,
+            "restarts": self.restarts,
+            "error": self.error
+        }
+
+class InferencePool:
+    """
+    Pool proses worker inference, masing-masing dengan model sendiri
+
+    Front process (Flask) tidak memuat model: predict() membagi batch ke
+    worker yang paling sedikit pekerjaannya, frame dikirim lewat FrameSlots
+    (shared memory) dan yang kembali hanya array box (n, 6) per frame, yang
+    dirakit lagi menjadi ultralytics Results di atas frame asli. Hasilnya
+    bisa dipakai persis seperti hasil model in-process (tracker, supervision).
+
+    Backpressure: setiap worker menerima paling banyak max_inflight batch;
+    bila semua penuh, predict() menunggu sampai queue_timeout detik lalu
+    melempar InferencePoolBusy. Worker yang mati diganti otomatis dan batch
+    yang sedang dikerjakannya gagal dengan RuntimeError.
+
+    Args:
+        workers: jumlah proses worker
+        max_inflight: batch yang boleh antre per worker
+        slots: jumlah slot shared memory (frame yang bisa sedang dikirim)
+        slot_bytes: ukuran per slot; frame lebih besar dikirim lewat pickle
+        threads: thread torch/OpenCV per worker (0 = cpu_count // workers)
+        queue_timeout: detik menunggu kapasitas sebelum InferencePoolBusy
+    """
+
+    def __init__(self, workers=2, max_inflight=2, slots=None, slot_bytes=DEFAULT_SLOT_BYTES,
+                 threads=0, queue_timeout=30.0):
+        self.workers = [_Worker(i) for i in range(max(1, int(workers)))]
+        self.max_inflight = max(1, int(max_inflight))
+        self.slot_count = slots if slots is not None else len(self.workers) * self.max_inflight * 4
+        self.slot_bytes = int(slot_bytes)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // len(self.workers))
+        self.queue_timeout = queue_timeout
+        self._names = None
+        self.error = None
+        self.started_at = None
+        self.shared_frames = 0
+        self.pickled_frames = 0
+        self.rejected = 0
+        self._ctx = mp.get_context("spawn")
+        self._slots = None
+        self._result_q = None
+        self._permits = threading.BoundedSemaphore(len(self.workers) * self.max_inflight)
+        self._pending = {}
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._collector = None
+        self._closing = False
+
+    # ------------------------------------------------------------------
+    # lifecycle
+
+    def start(self):
+        """Start worker pertama; sisanya menyusul setelah model pertama siap"""
+        with self._lock:
+            if self._collector is not None:
+                return
+            self.started_at = time.time()
+            self._slots = FrameSlots(self.slot_count, self.slot_bytes)
+            self._result_q = self._ctx.Queue()
+            # One worker first, so a missing ONNX/OpenVINO export is created once
+            self._spawn(self.workers[0])
+            self._collector = threading.Thread(target=self._collect, name="inference-collector", daemon=True)
+            self._collector.start()
+
+    def _spawn(self, worker):
+        worker.task_q = self._ctx.Queue()
+        worker.state = "loading"
+        worker.error = None
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, worker.task_q, self._result_q, self._slots.names, self.threads),
+            name=f"inference-worker-{worker.index}",
+            daemon=True
+        )
+        worker.process.start()
+        worker.pid = worker.process.pid
+
+    def wait_ready(self, timeout=None):
+        """Tunggu sampai minimal satu worker siap; False bila gagal / timeout"""
+        self.start()
+        with self._ready:
+            self._ready.wait_for(lambda: self.ready or self.state == "failed", timeout)
+            return self.ready
+
+    def close(self, timeout=5.0):
+        with self._lock:
+            if self._closing or self._collector is None:
+                return
+            self._closing = True
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.task_q.put(None)
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self._collector.join(timeout)
+        self._fail_pending(lambda entry: True, RuntimeError("inference pool closed"))
+        self._slots.close()
+
+    # ------------------------------------------------------------------
+    # state
+
+    @property
+    def ready(self):
+        return any(w.state == "ready" for w in self.workers)
+
+    @property
+    def state(self):
+        states = {w.state for w in self.workers}
+        if "ready" in states:
+            return "ready"
+        if "failed" in states and states <= {"failed", "not_started"}:
+            return "failed"
+        if states == {"not_started"}:
+            return "not_loaded"
+        return "loading"
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "ready": self.ready,
+                "mode": "pool",
+                "workers": [w.to_dict() for w in self.workers],
+                "max_inflight": self.max_inflight,
+                "threads_per_worker": self.threads,
+                "inflight": sum(w.inflight for w in self.workers),
+                "shm_slots": self.slot_count,
+                "shm_slots_free": self._slots.free if self._slots else self.slot_count,
+                "shm_slot_bytes": self.slot_bytes,
+                "shared_frames": self.shared_frames,
+                "pickled_frames": self.pickled_frames,
+                "rejected": self.rejected,
+                "error": self.error
+            }
+
+    # ------------------------------------------------------------------
+    # inference
+
+    @property
+    def names(self):
+        """class_id -> nama class dari model worker (menunggu model siap)"""
+        self._wait_for_model()
+        return self._names
+
+    def __call__(self, source, **kwargs):
+        return self.predict(source, **kwargs)
+
+    def predict(self, source, **kwargs):
+        """
+        Jalankan model pada satu frame atau list frame, returns list Results
+
+        Batch dibagi rata ke worker yang siap, jadi satu request dengan
+        batch besar pun memakai beberapa core.
+        """
+        frames = list(source) if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        self._wait_for_model()
+        n_chunks = min(len(frames), sum(w.state == "ready" for w in self.workers))
+        bounds = np.linspace(0, len(frames), n_chunks + 1).astype(int)
+        futures = [
+            self.submit(frames[start:end], **kwargs) for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        boxes = [b for future in futures for b in future.result()]
+        return self._to_results(frames, boxes)
+
+    def _wait_for_model(self):
+        if self.ready:
+            return
+        # Lazy start, like ModelRegistry.get() loading on first use
+        if not self.wait_ready():
+            raise RuntimeError(f"model failed to load: {self.error}")
+
+    def submit(self, frames, **kwargs):
+        """Kirim satu batch ke worker paling senggang, returns Future list box (n, 6)"""
+        if not self._permits.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise InferencePoolBusy(
+                f"all {len(self.workers)} inference workers are busy, retry later"
+            )
+        future = Future()
+        specs, slots = [], []
+        try:
+            for frame in frames:
+                frame = np.ascontiguousarray(frame)
+                idx = self._slots.put(frame)
+                if idx is None:
+                    specs.append((None, frame.shape, frame.dtype.str, frame))
+                else:
+                    slots.append(idx)
+                    specs.append((idx, frame.shape, frame.dtype.str, None))
+            with self._lock:
+                ready = [w for w in self.workers if w.state == "ready"]
+                if not ready:
+                    raise RuntimeError("no inference worker is ready")
+                worker = min(ready, key=lambda w: w.inflight)
+                task_id = next(self._task_ids)
+                worker.inflight += 1
+                worker.tasks += 1
+                self.shared_frames += len(slots)
+                self.pickled_frames += len(frames) - len(slots)
+                self._pending[task_id] = (worker, future, slots)
+            worker.task_q.put((task_id, specs, kwargs))
+        except Exception:
+            self._slots.release(slots)
+            self._permits.release()
+            raise
+        return future
+
+    def _to_results(self, frames, boxes):
+        import torch
+        from ultralytics.engine.results import Results
+        return [
+            Results(orig_img=frame, path="", names=self._names, boxes=torch.as_tensor(data))
+            for frame, data in zip(frames, boxes)
+        ]
+
+    # ------------------------------------------------------------------
+    # collector thread
+
+    def _finish(self, task_id):
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+            if entry is None:
+                return None
+            worker, future, slots = entry
+            worker.inflight -= 1
+        self._slots.release(slots)
+        self._permits.release()
+        return future
+
+    def _fail_pending(self, match, error):
+        with self._lock:
+            task_ids = [tid for tid, entry in self._pending.items() if match(entry)]
+        for task_id in task_ids:
+            future = self._finish(task_id)
+            if future is not None:
+                future.set_exception(error)
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while not self._closing:
+            if time.monotonic() - last_check >= 0.5:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                message = self._result_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            kind, index = message[0], message[1]
+            worker = self.workers[index]
+            if kind == "done":
+                _, _, task_id, payload, error = message
+                future = self._finish(task_id)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(payload)
+            elif kind == "ready":
+                with self._ready:
+                    self._names = message[2]
+                    worker.state = "ready"
+                    worker.pid = message[3]
+                    self.error = None
+                    self._ready.notify_all()
+                    waiting = [w for w in self.workers if w.state == "not_started"]
+                for other in waiting:
+                    self._spawn(other)
+            elif kind == "failed":
+                with self._ready:
+                    worker.state = "failed"
+                    worker.error = self.error = message[2]
+                    self._ready.notify_all()
+
+    def _check_workers(self):
+        """Ganti worker yang mati; batch yang sedang dikerjakannya digagalkan"""
+        for worker in self.workers:
+            if worker.process is None or worker.state == "failed" or worker.process.is_alive():
+                continue
+            if self._closing:
+                return
+            exitcode = worker.process.exitcode
+            if worker.state == "loading":
+                # Died while loading the model: restarting would just crash again
+                with self._ready:
+                    worker.state = "failed"
+                    worker.error = self.error = f"worker exited with code {exitcode} while loading"
+                    self._ready.notify_all()
+                continue
+            with self._lock:
+                worker.state = "restarting"
+                worker.restarts += 1
+            self._fail_pending(
+                lambda entry: entry[0] is worker,
+                RuntimeError(f"inference worker {worker.index} exited with code {exitcode}")
+            )
+            print(f"[pool] worker {worker.index} keluar (exit code {exitcode}), memulai ulang ...")
+            self._spawn(worker)
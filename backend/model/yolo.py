@@ -1,10 +1,171 @@
 # models/yolo.py
-from ultralytics import YOLO
+import os
+import threading
+import time
 from pathlib import Path
 
+import numpy as np
+
+from model.export import resolve_model_path
+
 # Use relative path to make it flexible
-MODEL_PATH = Path(__file__).parent / "best.pt"
+MODEL_PATH = Path(os.environ.get("YOLO_MODEL_PATH", Path(__file__).parent / "best.pt"))
+
+# Model input size (pixels), rounded up to a multiple of the model stride
+# like ultralytics' check_imgsz does, so frames downscaled to IMGSZ
+# (enhance_resolution=model) are not resized again by the predictor
+MODEL_STRIDE = 32
+IMGSZ = -(-int(os.environ.get("YOLO_IMGSZ", 640)) // MODEL_STRIDE) * MODEL_STRIDE
+
+# Warm-up inference input size (pixels) and number of runs, 0 disables
+WARMUP_SIZE = int(os.environ.get("YOLO_WARMUP_SIZE", IMGSZ))
+WARMUP_RUNS = int(os.environ.get("YOLO_WARMUP_RUNS", 1))
+
+# Inference backend: torch (best.pt), onnx (ONNX Runtime) or openvino,
+# optionally INT8-quantized; missing exports are created on first load
+BACKEND = os.environ.get("YOLO_BACKEND", "torch").lower()
+INT8 = os.environ.get("YOLO_INT8", "false").lower() == "true"
+AUTO_EXPORT = os.environ.get("YOLO_AUTO_EXPORT", "true").lower() == "true"
+
+class ModelRegistry:
+    """
+    Memuat model YOLO saat pertama dipakai (atau di background thread),
+    lalu menjalankan inference warm-up dengan ukuran input tetap
+
+    Import torch/ultralytics juga ditunda sampai load, sehingga proses
+    bisa langsung melayani /health.
+    """
+
+    def __init__(self, path, warmup_size=640, warmup_runs=1, backend="torch", int8=False,
+                 auto_export=True, imgsz=640):
+        self.path = Path(path)
+        self.imgsz = imgsz
+        self.warmup_size = warmup_size
+        self.warmup_runs = warmup_runs
+        self.backend = backend
+        self.int8 = int8
+        self.auto_export = auto_export
+        self.model_file = None
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def get(self):
+        """Model yang sudah dimuat; memuat (dan menunggu) bila belum"""
+        if self._model is None:
+            self.load()
+        if self._model is None:
+            raise RuntimeError(f"model failed to load: {self.error}")
+        return self._model
+
+    def load(self):
+        with self._lock:
+            if self._model is not None:
+                return
+            try:
+                self.state = "loading"
+                start = time.perf_counter()
+                from ultralytics import YOLO
+                self.model_file = resolve_model_path(
+                    self.path, self.backend, int8=self.int8, imgsz=self.imgsz,
+                    auto_export=self.auto_export
+                )
+                print(f"[yolo] memuat model ({self.backend}) dari {self.model_file} ...")
+                model = YOLO(str(self.model_file), task="detect")
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                
+                self.state = "warming_up"
+                start = time.perf_counter()
+                dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+                for _ in range(self.warmup_runs):
+                    model(dummy, imgsz=self.imgsz, verbose=False)
+                self.warmup_seconds = round(time.perf_counter() - start, 3)
+                
+                self._model = model
+                self.error = None
+                self.state = "ready"
+                print("[yolo] model siap.")
+            except Exception as e:
+                self.error = str(e)
+                self.state = "failed"
+                print(f"[yolo] gagal memuat model: {e}")
+
+    def load_in_background(self):
+        """Mulai load + warm-up tanpa memblokir pemanggil"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.load, name="yolo-load", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def status(self):
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "path": str(self.path),
+            "backend": self.backend,
+            "int8": self.int8,
+            "imgsz": self.imgsz,
+            "model_file": str(self.model_file) if self.model_file else None,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_size": self.warmup_size,
+            "warmup_runs": self.warmup_runs,
+            "error": self.error
+        }
+
+# Multi-process inference (model.pool.InferencePool) set by use_pool();
+# when set, `model` and predict() go to the worker processes instead
+_pool = None
+
+def use_pool(pool):
+    """Arahkan `model` dan predict() ke InferencePool (None = model in-process)"""
+    global _pool
+    _pool = pool
+
+class _LazyModel:
+    """Proxy `model` yang meneruskan atribut dan pemanggilan ke registry (atau pool)"""
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def _target(self):
+        return _pool if _pool is not None else self._registry.get()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._target()(*args, **kwargs)
+
+registry = ModelRegistry(
+    MODEL_PATH, warmup_size=WARMUP_SIZE, warmup_runs=WARMUP_RUNS,
+    backend=BACKEND, int8=INT8, auto_export=AUTO_EXPORT, imgsz=IMGSZ
+)
+model = _LazyModel(registry)
+
+# Predictor ultralytics tidak thread-safe: panggilan ke model bersama
+# diserialkan, sedangkan state tracker disimpan per TrackerSession
+inference_lock = threading.Lock()
+
+def predict(source, **kwargs):
+    """
+    Jalankan model bersama dengan aman dari banyak thread
 
-print(f"[yolo] memuat model dari {MODEL_PATH} ...")
-model = YOLO(str(MODEL_PATH))
-print("[yolo] model siap.")
+    Input model memakai YOLO_IMGSZ (ukuran export dan downscale
+    enhance_resolution=model) kecuali pemanggil memberi imgsz sendiri.
+    """
+    kwargs.setdefault("imgsz", registry.imgsz)
+    if _pool is not None:
+        # Each worker process runs one batch at a time, no lock needed here
+        return _pool.predict(source, **kwargs)
+    model = registry.get()
+    with inference_lock:
+        return model(source, **kwargs)
@@ -0,0 +1,682 @@
+"""
+Benchmark CPU offline untuk hot path backend (detect, track, enhancement,
+polygon counting dan process_video end-to-end)
+
+Usage (dari folder backend):
+    python scripts/benchmark.py --json bench.json
+    python scripts/benchmark.py --only enhance detect --resolutions 640x480 1280x720
+    python scripts/benchmark.py --json new.json --compare bench.json --tolerance 0.1
+    python scripts/benchmark.py --only alloc
+    python scripts/benchmark.py --only pool --workers 1 2 4 8
+    python scripts/benchmark.py --only segments --segments 2 4 --batch-sizes 4
+
+Input: gambar dan video di dummyData, ditambah frame sintetis (gambar
+sampel di-resize ke tiap resolusi) supaya hasil bisa dibandingkan antar
+commit. Setiap benchmark melaporkan fps, latensi mean/p50/p95/p99 per
+frame, peak RSS dan (untuk detect/track/count/process_video) rincian waktu
+per tahap. Dengan --compare, benchmark yang fps-nya turun lebih dari
+--tolerance dibanding file JSON lama dilaporkan dan exit code menjadi 1.
+
+Benchmark alloc mengukur memori yang dialokasikan per frame (tracemalloc,
+puncak di atas baseline) untuk path lama (copy frame + results.plot() /
+copy canvas, cap.read() tanpa buffer) dibanding path sekarang (anotasi in
+place, buffer decode didaur ulang).
+
+Benchmark pool mengukur throughput detect lewat InferencePool untuk tiap
+jumlah worker di --workers (2 client thread per worker), beserta speedup
+terhadap jumlah worker terkecil.
+
+Benchmark segments membandingkan track video utuh secara sekuensial
+(process_video) dengan segment-parallel (process_video_segmented) untuk
+tiap jumlah segmen di --segments, beserta waktu worker pass track dan
+render (decode dua kali).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+# Paths given on the command line are relative to where the script was started
+START_DIR = Path.cwd()
+
+# Benchmarks load the model themselves and must not start background threads
+os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+os.environ.setdefault("OUTPUT_SWEEP_INTERVAL", "0")
+os.chdir(BACKEND_DIR)
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+import supervision as sv  # noqa: E402
+
+from model.yolo import predict, registry  # noqa: E402
+from model.pool import InferencePool  # noqa: E402
+from utils.enhancement import apply_enhancement  # noqa: E402
+from utils.zones import ZoneEngine  # noqa: E402
+from utils.tracking import TrackerSession  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+ENHANCEMENT_KINDS = ("CLAHE", "HE", "BC", "CS", "GAMMA")
+BENCHMARKS = ("enhance", "detect", "track", "count", "video", "alloc", "pool", "segments")
+# Benchmarks that go through app.py's frame/video functions. Importing app
+# indexes OUTPUT_DIR and starts its job/live managers, so enhance and pool
+# (utils/model only) run without it.
+APP_BENCHMARKS = ("detect", "track", "count", "video", "alloc", "segments")
+backend = None
+
+def peak_rss_mb():
+    """Peak RSS proses ini dalam MB, None bila tidak tersedia"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_resolution(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+def load_media(folder):
+    """(images, videos) dari folder sampel, diurutkan supaya deterministik"""
+    images, videos = [], []
+    for path in sorted(Path(folder).iterdir()):
+        suffix = path.suffix.lower()
+        if suffix in IMAGE_EXTENSIONS:
+            img = cv2.imdecode(np.fromfile(str(path), np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append((path.name, img))
+        elif suffix in VIDEO_EXTENSIONS:
+            videos.append(path)
+    return images, videos
+
+def synthetic_frames(images, resolution, count):
+    """Gambar sampel di-resize ke resolution (w, h), diulang sampai count frame"""
+    frames = []
+    for i in range(count):
+        _, img = images[i % len(images)]
+        frames.append(cv2.resize(img, resolution, interpolation=cv2.INTER_LINEAR))
+    return frames
+
+def read_frames(path, count):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def summarize(latencies_ms, stages=None):
+    """fps dan persentil latensi per frame, plus rata-rata ms per tahap"""
+    lat = np.asarray(latencies_ms, dtype=np.float64)
+    report = {
+        "frames": int(lat.size),
+        "fps": round(1000.0 / lat.mean(), 2) if lat.size and lat.mean() > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(float(lat.mean()), 3),
+            "p50": round(float(np.percentile(lat, 50)), 3),
+            "p95": round(float(np.percentile(lat, 95)), 3),
+            "p99": round(float(np.percentile(lat, 99)), 3),
+            "max": round(float(lat.max()), 3)
+        }
+    }
+    if stages:
+        report["stages_ms"] = {name: round(float(np.mean(values)), 3) for name, values in stages.items()}
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+def time_frames(frames, fn, warmup, repeat, fresh=False):
+    """
+    Latensi fn(frame) dalam ms untuk setiap frame, repeat kali
+
+    fresh=True memberi fn salinan frame (dibuat di luar waktu yang diukur),
+    untuk fungsi yang menggambar in place di frame input.
+    """
+    for frame in frames[:warmup]:
+        fn(frame.copy() if fresh else frame)
+    latencies = []
+    for _ in range(repeat):
+        for frame in frames:
+            if fresh:
+                frame = frame.copy()
+            start = time.perf_counter()
+            fn(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+class StageTimer:
+    """Kumpulkan durasi per tahap: with timer("inference"): ... (aman antar thread)"""
+
+    def __init__(self):
+        self.stages = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name].append((time.perf_counter() - start) * 1000)
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_enhance(inputs, args):
+    reports = {}
+    for label, frames in inputs.items():
+        for kind in ENHANCEMENT_KINDS:
+            latencies = time_frames(
+                frames, lambda f: apply_enhancement(f, kind, brightness=20, contrast=20),
+                args.warmup, args.repeat
+            )
+            reports[f"enhance/{kind}@{label}"] = summarize(latencies)
+    return reports
+
+def detect_once(frame, timer, enhance):
+    with timer("prepare"):
+        proc = backend.prepare_frame(frame, enhance, "CLAHE")
+    with timer("inference"):
+        result = predict(proc, verbose=False)[0]
+    with timer("postprocess"):
+        detections = sv.Detections.from_ultralytics(result)
+    with timer("annotate"):
+        backend.annotate_detections(proc, detections)
+    return detections
+
+def bench_detect(inputs, args):
+    reports = {}
+    for label, frames in inputs.items():
+        # process_frame_detect as the endpoint calls it
+        latencies = time_frames(
+            frames, lambda f: backend.process_frame_detect(f, args.enhance), args.warmup, args.repeat,
+            fresh=True
+        )
+        # Same work split into stages
+        timer = StageTimer()
+        for _ in range(args.repeat):
+            for frame in frames:
+                detect_once(frame.copy(), timer, args.enhance)
+        reports[f"detect@{label}"] = summarize(latencies, timer.stages)
+    return reports
+
+def strip_zones(shape, n):
+    """n side-by-side zones over the central 80% of the frame, like the default polygon"""
+    h, w = shape[:2]
+    x0, x1, y0, y1 = int(w * 0.1), int(w * 0.9), int(h * 0.1), int(h * 0.9)
+    edges = np.linspace(x0, x1, n + 1).astype(int)
+    return {f"zone{i}": [[edges[i], y0], [edges[i + 1], y0], [edges[i + 1], y1], [edges[i], y1]]
+            for i in range(n)}
+
+def bench_track(sequences, args, count=False):
+    reports = {}
+    for label, frames in sequences.items():
+        latencies = []
+        timer = StageTimer()
+        for run in range(args.repeat + 1):
+            session = TrackerSession(args.tracker)
+            zones = None
+            if count:
+                h, w = frames[0].shape[:2]
+                zones = ZoneEngine(strip_zones(frames[0].shape, args.zones), (w, h))
+            for idx, frame in enumerate(frames):
+                frame = frame.copy()
+                start = time.perf_counter()
+                with timer("prepare"):
+                    proc = backend.prepare_frame(frame, args.enhance, "CLAHE")
+                with timer("inference"):
+                    result = predict(proc, verbose=False)[0]
+                with timer("tracker"):
+                    detections = session.update(result)
+                with timer("annotate"):
+                    annotated, _ = backend.annotate_detections(proc, detections)
+                if count:
+                    with timer("zone"):
+                        zones.update(detections, idx)
+                        zones.annotate(annotated)
+                if run > 0:  # first pass is warm-up
+                    latencies.append((time.perf_counter() - start) * 1000)
+        timer.stages = {name: values[len(values) // (args.repeat + 1):] for name, values in timer.stages.items()}
+        name = f"count[{args.zones} zones]" if count else "track"
+        reports[f"{name}@{label}"] = summarize(latencies, timer.stages)
+        # process_frame_track as the endpoint calls it, one session per sequence
+        session = TrackerSession(args.tracker)
+        reports[f"{name}@{label}"]["process_frame_track_fps"] = summarize(
+            time_frames(frames, lambda f: backend.process_frame_track(f, session, args.enhance), 0, 1,
+                        fresh=True)
+        )["fps"]
+    return reports
+
+class TimedCapture:
+    """Bungkus cv2.VideoCapture untuk mengukur waktu decode"""
+
+    def __init__(self, cap, timer, limit):
+        self.cap = cap
+        self.timer = timer
+        self.limit = limit
+        self.frames = 0
+
+    def read(self, image=None):
+        if self.limit and self.frames >= self.limit:
+            return False, None
+        with self.timer("decode"):
+            ret, frame = self.cap.read() if image is None else self.cap.read(image)
+        self.frames += ret
+        return ret, frame
+
+def bench_video(videos, args):
+    reports = {}
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_"))
+    for path in videos:
+        for batch_size in args.batch_sizes:
+            timer = StageTimer()
+
+            def process_batch(frames, start_idx):
+                with timer("inference"):
+                    outputs = backend.detect_frames(frames, args.enhance, "CLAHE", start_idx=start_idx)
+                return [(annotated, {"detections": detections}) for annotated, detections in outputs]
+
+            source = backend.VideoSource(path)
+            source.cap = TimedCapture(source.cap, timer, args.video_frames)
+            output_path = out_dir / f"bench_{path.stem}_{batch_size}.mp4"
+            try:
+                start = time.perf_counter()
+                results, err = backend.process_video(source, output_path, process_batch, batch_size)
+                elapsed = time.perf_counter() - start
+            finally:
+                source.cap = source.cap.cap
+                source.release()
+                output_path.unlink(missing_ok=True)
+            if err:
+                print(f"[skip] {path.name}: {err}")
+                continue
+            frames = results["frames_processed"]
+            report = {
+                "frames": frames,
+                "batch_size": batch_size,
+                "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+                "wall_time_s": round(elapsed, 3),
+                # Stages overlap (separate threads), so these are busy times
+                "stages_ms_total": {name: round(float(np.sum(v)), 1) for name, v in timer.stages.items()},
+                "stages_ms_per_frame": {
+                    name: round(float(np.sum(v)) / max(frames, 1), 3) for name, v in timer.stages.items()
+                },
+                "peak_rss_mb": peak_rss_mb()
+            }
+            reports[f"process_video/detect[{path.name}]@batch{batch_size}"] = report
+    out_dir.rmdir()
+    return reports
+
+def bench_segments(videos, args):
+    reports = {}
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_"))
+    batch_size = args.batch_sizes[0]
+    options = backend.segment_options(args.enhance, "CLAHE", 0, 0, False, batch_size, tracker=args.tracker)
+    warm = False
+    for path in videos:
+        output_path = out_dir / f"bench_{path.stem}.mp4"
+        source = backend.VideoSource(path)
+        try:
+            if source.frame_count < 2 * backend.SEGMENT_MIN_FRAMES:
+                print(f"[skip] {path.name}: shorter than 2 x SEGMENT_MIN_FRAMES")
+                continue
+            session = TrackerSession(args.tracker)
+
+            def process_batch(frames, start_idx):
+                outputs = backend.track_frames(frames, session, args.enhance, "CLAHE", start_idx=start_idx)
+                return [(annotated, {"detections": len(detections)}) for annotated, detections, _ in outputs]
+
+            start = time.perf_counter()
+            results, err = backend.process_video(source, output_path, process_batch, batch_size)
+            sequential = time.perf_counter() - start
+        finally:
+            source.release()
+            output_path.unlink(missing_ok=True)
+        if err:
+            print(f"[skip] {path.name}: {err}")
+            continue
+        frames = results["frames_processed"]
+        reports[f"segments/track[{path.name}]@sequential"] = {
+            "frames": frames,
+            "fps": round(frames / sequential, 2) if sequential > 0 else 0.0,
+            "wall_time_s": round(sequential, 3)
+        }
+
+        for segments in args.segments:
+            def run():
+                source = backend.VideoSource(path)
+                try:
+                    return backend.process_video_segmented(
+                        source, output_path, options, segments,
+                        lambda detections, frame_idx: ({"detections": len(detections)}, None)
+                    )
+                finally:
+                    source.release()
+                    output_path.unlink(missing_ok=True)
+
+            if not warm:
+                # First run spawns the segment workers and loads the model in each
+                run()
+                warm = True
+            start = time.perf_counter()
+            results, err = run()
+            elapsed = time.perf_counter() - start
+            if err:
+                print(f"[skip] {path.name}: {err}")
+                continue
+            info = results["segments"]
+            reports[f"segments/track[{path.name}]@{segments}"] = {
+                "frames": results["frames_processed"],
+                "fps": round(results["frames_processed"] / elapsed, 2) if elapsed > 0 else 0.0,
+                "wall_time_s": round(elapsed, 3),
+                "speedup": round(sequential / elapsed, 2) if elapsed > 0 else None,
+                "segments": info["count"],
+                "workers": info["workers"],
+                # Worker seconds; render is the cost of decoding every frame twice
+                "busy_s": info["busy_s"],
+                "render_share": round(info["busy_s"]["render"] / max(sum(info["busy_s"].values()), 1e-9), 3)
+            }
+    out_dir.rmdir()
+    return reports
+
+def traced_peak_mb(frames, fn, warmup):
+    """Rata-rata puncak alokasi per panggilan fn(frame) di atas baseline, dalam MB"""
+    for frame in frames[:warmup]:
+        fn(frame.copy())
+    peaks = []
+    tracemalloc.start()
+    try:
+        for frame in frames:
+            frame = frame.copy()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(frame)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - base) / (1024 * 1024))
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks)) if peaks else 0.0
+
+def savings(legacy_mb, current_mb):
+    return {
+        "legacy_peak_mb": round(legacy_mb, 3),
+        "current_peak_mb": round(current_mb, 3),
+        "saved_mb": round(legacy_mb - current_mb, 3),
+        "saved_pct": round(100 * (legacy_mb - current_mb) / legacy_mb, 1) if legacy_mb > 0 else 0.0
+    }
+
+def alloc_report(frames, legacy, current, warmup):
+    return dict(
+        savings(traced_peak_mb(frames, legacy, warmup), traced_peak_mb(frames, current, warmup)),
+        frames=len(frames)
+    )
+
+def legacy_detect(frame, enhance):
+    # Before: prepare_frame copied the frame and /detect drew with results.plot()
+    proc = backend.prepare_frame(frame.copy(), enhance, "CLAHE")
+    return predict(proc, verbose=False)[0].plot()
+
+def legacy_track(frame, session, enhance):
+    # Before: prepare_frame copy plus a second copy of the canvas to annotate
+    proc = backend.prepare_frame(frame.copy(), enhance, "CLAHE")
+    detections = session.update(predict(proc, verbose=False)[0])
+    return backend.annotate_detections(proc.copy(), detections)
+
+def decode_alloc(path, count, reuse):
+    """Puncak alokasi rata-rata per cap.read(), dengan atau tanpa buffer bekas"""
+    cap = cv2.VideoCapture(str(path))
+    ret, buf = cap.read()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            ret, frame = cap.read(buf) if reuse else cap.read()
+            _, peak = tracemalloc.get_traced_memory()
+            if not ret:
+                break
+            peaks.append((peak - base) / (1024 * 1024))
+            del frame
+    finally:
+        tracemalloc.stop()
+        cap.release()
+    return float(np.mean(peaks)) if peaks else 0.0
+
+def bench_alloc(inputs, sequences, videos, args):
+    reports = {}
+    for label, frames in inputs.items():
+        reports[f"alloc/detect@{label}"] = alloc_report(
+            frames,
+            lambda f: legacy_detect(f, args.enhance),
+            lambda f: backend.process_frame_detect(f, args.enhance),
+            args.warmup
+        )
+    for label, frames in sequences.items():
+        legacy_session, session = TrackerSession(args.tracker), TrackerSession(args.tracker)
+        reports[f"alloc/track@{label}"] = alloc_report(
+            frames,
+            lambda f: legacy_track(f, legacy_session, args.enhance),
+            lambda f: backend.process_frame_track(f, session, args.enhance),
+            0
+        )
+    for path in videos:
+        reports[f"alloc/decode[{path.name}]"] = savings(
+            decode_alloc(path, args.track_frames, reuse=False),
+            decode_alloc(path, args.track_frames, reuse=True)
+        )
+    return reports
+
+def bench_pool(inputs, args):
+    label, frames = next(iter(inputs.items()))
+    reports = {}
+    base_fps = None
+    for n in sorted(args.workers):
+        pool = InferencePool(workers=n, threads=args.threads)
+        try:
+            if not pool.wait_ready():
+                print(f"[skip] pool: {pool.error}")
+                return reports
+            # Later workers start once the first one is ready
+            while sum(w["state"] == "ready" for w in pool.status()["workers"]) < n:
+                time.sleep(0.1)
+            for frame in frames[:args.warmup]:
+                pool.predict(frame, verbose=False)
+
+            work = frames * args.repeat * n
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=2 * n) as clients:
+                list(clients.map(lambda f: pool.predict(f, verbose=False), work))
+            elapsed = time.perf_counter() - start
+            status = pool.status()
+        finally:
+            pool.close()
+        fps = len(work) / elapsed if elapsed > 0 else 0.0
+        base_fps = base_fps or fps / n
+        reports[f"pool/detect[{n} workers]@{label}"] = {
+            "frames": len(work),
+            "workers": n,
+            "threads_per_worker": status["threads_per_worker"],
+            "fps": round(fps, 2),
+            # 1.0 = perfectly linear scaling from the smallest worker count
+            "scaling_efficiency": round(fps / base_fps / n, 3) if base_fps else None,
+            "pickled_frames": status["pickled_frames"]
+        }
+    return reports
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def compare(current, baseline, tolerance):
+    """Benchmark yang fps-nya turun lebih dari tolerance (relatif)"""
+    regressions = []
+    for name, report in current.items():
+        old = baseline.get(name)
+        if not old or not old.get("fps") or "fps" not in report:
+            continue
+        change = (report["fps"] - old["fps"]) / old["fps"]
+        if change < -tolerance:
+            regressions.append((name, old["fps"], report["fps"], change))
+    return regressions
+
+def main():
+    global backend
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--media", default=str(BACKEND_DIR / "dummyData"))
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"],
+                        help="synthetic frame sizes WxH")
+    parser.add_argument("--frames", type=int, default=8, help="synthetic frames per resolution")
+    parser.add_argument("--track-frames", type=int, default=60, help="video frames per track/count run")
+    parser.add_argument("--video-frames", type=int, default=0, help="limit process_video frames (0 = all)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the inputs")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed frames before timing")
+    parser.add_argument("--enhance", action="store_true", help="enable CLAHE in detect/track/count/video")
+    parser.add_argument("--tracker", default="bytetrack.yaml")
+    parser.add_argument("--zones", type=int, default=1, help="polygon zones counted in the count benchmark")
+    parser.add_argument("--threads", type=int, default=0, help="pin OpenCV/torch threads (0 = library default)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2],
+                        help="inference worker counts for the pool benchmark")
+    parser.add_argument("--segments", nargs="+", type=int, default=[2, 4],
+                        help="segment counts for the segments benchmark (workers: SEGMENT_WORKERS)")
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    parser.add_argument("--compare", default=None, help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative fps drop")
+    args = parser.parse_args()
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+        try:
+            import torch
+            torch.set_num_threads(args.threads)
+        except ImportError:
+            pass
+
+    for name in ("media", "json", "compare"):
+        if getattr(args, name):
+            setattr(args, name, START_DIR / getattr(args, name))
+
+    images, videos = load_media(args.media)
+    if not images:
+        sys.exit(f"no images found in {args.media}")
+
+    resolutions = [parse_resolution(r) for r in args.resolutions]
+    frame_sets = {f"{w}x{h}": synthetic_frames(images, (w, h), args.frames) for w, h in resolutions}
+    frame_sets["samples"] = [img for _, img in images]
+    sequences = {}
+    for path in videos:
+        frames = read_frames(path, args.track_frames)
+        if frames:
+            sequences[path.name] = frames
+    if not sequences:
+        # No sample video: a static synthetic sequence still exercises the tracker
+        w, h = resolutions[0]
+        sequences[f"{w}x{h}"] = synthetic_frames(images, (w, h), args.track_frames)
+
+    results = {}
+    if set(args.only) & set(APP_BENCHMARKS):
+        import app as backend
+        registry.load()
+    if "enhance" in args.only:
+        results.update(bench_enhance(frame_sets, args))
+    if "detect" in args.only:
+        results.update(bench_detect(frame_sets, args))
+    if "track" in args.only:
+        results.update(bench_track(sequences, args))
+    if "count" in args.only:
+        results.update(bench_track(sequences, args, count=True))
+    if "video" in args.only and videos:
+        results.update(bench_video(videos, args))
+    if "alloc" in args.only:
+        results.update(bench_alloc(frame_sets, sequences, videos, args))
+    if "pool" in args.only:
+        results.update(bench_pool(frame_sets, args))
+    if "segments" in args.only and videos:
+        results.update(bench_segments(videos, args))
+
+    print(f"{'benchmark':<60}{'fps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, report in results.items():
+        if "fps" not in report:
+            continue
+        latency = report.get("latency_ms", {})
+        print(f"{name:<60}{report['fps']:>9}{latency.get('p50', ''):>10}"
+              f"{latency.get('p95', ''):>10}{latency.get('p99', ''):>10}")
+    allocs = {name: report for name, report in results.items() if "saved_mb" in report}
+    if allocs:
+        print(f"\n{'allocation per frame':<60}{'legacy MB':>11}{'now MB':>10}{'saved':>9}")
+        for name, report in allocs.items():
+            print(f"{name:<60}{report['legacy_peak_mb']:>11}{report['current_peak_mb']:>10}"
+                  f"{report['saved_pct']:>8}%")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "threads": args.threads or None
+        },
+        "model": registry.status(),
+        "config": {
+            "resolutions": args.resolutions,
+            "frames": args.frames,
+            "track_frames": args.track_frames,
+            "batch_sizes": args.batch_sizes,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "enhance": args.enhance,
+            "tracker": args.tracker,
+            "zones": args.zones,
+            "segments": args.segments
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "benchmarks": results
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("benchmarks", {}), args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"[regression] {name}: {old} -> {new} fps ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
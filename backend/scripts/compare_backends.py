@@ -0,0 +1,158 @@
+"""
+Bandingkan akurasi dan latensi backend inference CPU pada dummyData
+
+Usage (dari folder backend):
+    python scripts/compare_backends.py
+    python scripts/compare_backends.py --backends torch onnx openvino openvino-int8 --export --json out.json
+
+Deteksi backend torch (best.pt) dipakai sebagai referensi; backend lain
+dinilai dengan mencocokkan box (kelas sama, IoU >= --iou).
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from model.export import exported_path, export_model  # noqa: E402
+from model.yolo import IMGSZ, MODEL_PATH  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def load_images(folder):
+    images = []
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            img = cv2.imdecode(np.fromfile(str(path), np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append((path.name, img))
+    return images
+
+def box_iou(a, b):
+    """IoU matrix antara box xyxy a (N,4) dan b (M,4)"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def match(ref, pred, iou_threshold):
+    """Greedy matching, returns (matched, mean IoU of matches)"""
+    if len(ref["xyxy"]) == 0 or len(pred["xyxy"]) == 0:
+        return 0, []
+    iou = box_iou(ref["xyxy"], pred["xyxy"])
+    iou[ref["cls"][:, None] != pred["cls"][None, :]] = 0
+    ious = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        ious.append(float(iou[i, j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return len(ious), ious
+
+def run_backend(name, images, imgsz, runs, export):
+    from ultralytics import YOLO
+    
+    backend, _, variant = name.partition("-")
+    int8 = variant == "int8"
+    path = exported_path(MODEL_PATH, backend, int8, imgsz)
+    if path is None:
+        if not export:
+            print(f"[skip] {name}: not exported (use --export)")
+            return None
+        path = export_model(MODEL_PATH, backend, int8=int8, imgsz=imgsz)
+    
+    model = YOLO(str(path), task="detect")
+    model(np.zeros((imgsz, imgsz, 3), np.uint8), imgsz=imgsz, verbose=False)  # warm-up
+    
+    latencies = []
+    outputs = {}
+    for fname, img in images:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = model(img, imgsz=imgsz, verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+        outputs[fname] = {
+            "xyxy": result.boxes.xyxy.cpu().numpy(),
+            "cls": result.boxes.cls.cpu().numpy().astype(int)
+        }
+    latencies.sort()
+    return {
+        "model_file": str(path),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2),
+            "p50": round(latencies[len(latencies) // 2], 2),
+            "p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 2)
+        },
+        "outputs": outputs
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino", "openvino-int8"])
+    parser.add_argument("--images", default=str(BACKEND_DIR / "dummyData"))
+    parser.add_argument("--imgsz", type=int, default=IMGSZ, help="model input size (default: YOLO_IMGSZ)")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per image")
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--export", action="store_true", help="export missing backends first")
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args()
+    
+    images = load_images(args.images)
+    if not images:
+        sys.exit(f"no images found in {args.images}")
+    
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reports = {}
+    for name in backends:
+        result = run_backend(name, images, args.imgsz, args.runs, args.export)
+        if result is not None:
+            reports[name] = result
+    
+    reference = reports["torch"]["outputs"]
+    ref_latency = reports["torch"]["latency_ms"]["mean"]
+    summary = {}
+    print(f"{'backend':<16}{'mean ms':>10}{'p95 ms':>10}{'speedup':>10}{'recall':>9}{'precision':>11}{'mIoU':>8}")
+    for name, report in reports.items():
+        matched = ref_total = pred_total = 0
+        ious = []
+        for fname, ref in reference.items():
+            pred = report["outputs"][fname]
+            m, match_ious = match(ref, pred, args.iou)
+            matched += m
+            ious += match_ious
+            ref_total += len(ref["xyxy"])
+            pred_total += len(pred["xyxy"])
+        summary[name] = {
+            "model_file": report["model_file"],
+            "latency_ms": report["latency_ms"],
+            "speedup": round(ref_latency / report["latency_ms"]["mean"], 2),
+            "recall_vs_torch": round(matched / ref_total, 4) if ref_total else 1.0,
+            "precision_vs_torch": round(matched / pred_total, 4) if pred_total else 1.0,
+            "mean_iou": round(statistics.fmean(ious), 4) if ious else None
+        }
+        s = summary[name]
+        print(f"{name:<16}{s['latency_ms']['mean']:>10}{s['latency_ms']['p95']:>10}{s['speedup']:>10}"
+              f"{s['recall_vs_torch']:>9}{s['precision_vs_torch']:>11}{str(s['mean_iou']):>8}")
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "images": len(images),
+            "imgsz": args.imgsz,
+            "runs": args.runs,
+            "iou_threshold": args.iou,
+            "backends": summary
+        }, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Production entry point (dari folder backend):
+    python serve.py
+
+Menjalankan app tanpa debug/reloader di WSGI server multi-thread (waitress
+bila terpasang, selain itu server threaded Werkzeug), dengan inference di
+pool proses worker (INFERENCE_WORKERS, default setengah jumlah core, maks 8).
+Front process ini hanya menerima request, decode/encode dan tracking;
+model berjalan di worker, frame dikirim lewat shared memory.
+
+Environment:
+    HOST, PORT           alamat listen (default 0.0.0.0:5000)
+    SERVER_THREADS       thread request (default 4 per worker, minimal 8)
+    INFERENCE_WORKERS    jumlah proses worker inference (0 = model in-process)
+    INFERENCE_*          lihat app.py (inflight, shared memory, timeout)
+"""
+import os
+
+def default_workers():
+    return max(1, min(8, (os.cpu_count() or 1) // 2))
+
+def main():
+    os.environ.setdefault("INFERENCE_WORKERS", str(default_workers()))
+    # Imported here: spawned inference workers re-import this module and must not load the app
+    from app import app, INFERENCE_WORKERS
+
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", 5000))
+    threads = int(os.environ.get("SERVER_THREADS", max(8, 4 * INFERENCE_WORKERS)))
+    try:
+        from waitress import serve
+    except ImportError:
+        print(f"[serve] waitress tidak terpasang, memakai server threaded Werkzeug di {host}:{port}")
+        app.run(host=host, port=port, threaded=True, debug=False, use_reloader=False)
+        return
+    print(f"[serve] waitress di {host}:{port}, {threads} thread, {INFERENCE_WORKERS} worker inference")
+    serve(app, host=host, port=port, threads=threads)
+
+if __name__ == "__main__":
+    main()
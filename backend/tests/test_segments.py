@@ -0,0 +1,96 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from utils.segments import TrackStitcher, plan_segments, preroll_start
+
+
+def frame(boxes, ids, class_id=0):
+    """One tracked frame as run_segment returns it"""
+    n = len(ids)
+    return {
+        "xyxy": np.asarray(boxes, dtype=np.float32).reshape(n, 4),
+        "class_id": np.full(n, class_id, dtype=np.int64),
+        "confidence": np.full(n, 0.9, dtype=np.float32),
+        "tracker_id": np.asarray(ids, dtype=np.int64),
+    }
+
+
+def moving(n, local_id, x0=0, step=1):
+    """n frames of one box moving right"""
+    return [frame([[x0 + i * step, 0, x0 + i * step + 50, 50]], [local_id]) for i in range(n)]
+
+
+class TestPlanSegments:
+    def test_even_split(self):
+        assert plan_segments(1200, 4, min_frames=300) == [(0, 300), (300, 600), (600, 900), (900, 1200)]
+
+    def test_fewer_segments_than_min_frames_allow(self):
+        assert plan_segments(1000, 8, min_frames=300) == [(0, 333), (333, 667), (667, 1000)]
+
+    def test_short_video_is_one_segment(self):
+        assert plan_segments(100, 4, min_frames=300) == [(0, 100)]
+
+    def test_snaps_to_nearest_keyframe(self):
+        keyframes = list(range(0, 1200, 250))
+        assert plan_segments(1200, 4, min_frames=1, keyframes=keyframes) == [
+            (0, 250), (250, 500), (500, 1000), (1000, 1200)
+        ]
+
+    def test_merges_segments_shorter_than_min_frames_after_snapping(self):
+        # 300 -> 290 and 600 -> 310 would leave a 20 frame segment
+        segments = plan_segments(1200, 4, min_frames=300, keyframes=[0, 290, 310])
+        assert segments == [(0, 310), (310, 900), (900, 1200)]
+        assert all(end - start >= 300 for start, end in segments)
+
+    def test_merges_short_last_segment(self):
+        segments = plan_segments(1000, 3, min_frames=300, keyframes=[0, 333, 900])
+        assert segments == [(0, 333), (333, 1000)]
+
+    def test_covers_every_frame_once(self):
+        segments = plan_segments(5000, 7, min_frames=100, keyframes=list(range(0, 5000, 48)))
+        assert segments[0][0] == 0 and segments[-1][1] == 5000
+        assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+
+class TestPrerollStart:
+    def test_without_keyframes(self):
+        assert preroll_start(300, 30) == 270
+        assert preroll_start(10, 30) == 0
+
+    def test_rewinds_to_keyframe(self):
+        assert preroll_start(300, 30, keyframes=[0, 250, 300]) == 250
+
+
+class TestTrackStitcher:
+    def test_first_segment_gets_sequential_ids(self):
+        stitcher = TrackStitcher()
+        out = stitcher.add([frame([[0, 0, 10, 10], [50, 50, 60, 60]], [7, 3])], 0)
+        assert out[0]["tracker_id"].tolist() == [1, 2]
+
+    def test_matching_track_keeps_its_id_across_segments(self):
+        stitcher = TrackStitcher()
+        stitcher.add(moving(100, local_id=5), 0)
+        # Next segment re-tracks the last 10 frames with its own local ids
+        second = moving(40, local_id=1, x0=90)
+        second[-1] = frame([[129, 0, 179, 50], [500, 500, 550, 550]], [1, 2])
+        out = stitcher.add(second, 10)
+        assert len(out) == 30
+        assert all(f["tracker_id"][0] == 1 for f in out)
+        assert out[-1]["tracker_id"].tolist() == [1, 2]
+
+    def test_different_class_is_not_matched(self):
+        stitcher = TrackStitcher()
+        stitcher.add([frame([[0, 0, 50, 50]], [1], class_id=0)] * 5, 0)
+        out = stitcher.add([frame([[0, 0, 50, 50]], [1], class_id=2)] * 8, 3)
+        assert out[0]["tracker_id"].tolist() == [2]
+
+    def test_preroll_longer_than_previous_segment(self):
+        stitcher = TrackStitcher()
+        stitcher.add(moving(20, local_id=4), 0)
+        # Pre-roll of 30 frames: only its last 20 overlap the previous result
+        second = [frame(np.zeros((0, 4)), []) for _ in range(10)] + moving(20, local_id=9) + moving(15, 9, x0=20)
+        out = stitcher.add(second, 30)
+        assert len(out) == 15
+        assert all(f["tracker_id"].tolist() == [1] for f in out)
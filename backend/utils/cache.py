@@ -0,0 +1,129 @@
+# utils/cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+def make_cache_key(data, **params):
+    """Hash isi upload beserta parameter yang memengaruhi hasil"""
+    h = hashlib.sha256(data)
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Cache LRU untuk payload JSON hasil deteksi
+
+    Memori dibatasi max_bytes (ukuran JSON payload). Entri yang tergusur
+    ditulis ke disk_dir bila diset, dengan batas disk_max_bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (payload, size)
+        self._disk = OrderedDict()    # key -> size
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            for path in sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime):
+                self._disk[path.stem] = path.stat().st_size
+                self._disk_bytes += path.stat().st_size
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if key in self._disk:
+                try:
+                    encoded = (self.disk_dir / f"{key}.json").read_bytes()
+                except OSError:
+                    self._drop_disk(key)
+                else:
+                    self._drop_disk(key)
+                    payload = json.loads(encoded)
+                    self._store(key, payload, len(encoded))
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return payload
+            self.misses += 1
+            return None
+
+    def put(self, key, payload):
+        encoded = json.dumps(payload).encode("utf-8")
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            self._store(key, payload, len(encoded))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes
+            }
+
+    def _store(self, key, payload, size):
+        if size > self.max_bytes:
+            self._spill(key, payload)
+            return
+        self._memory[key] = (payload, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            old_key, (old_payload, old_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            self.evictions += 1
+            self._spill(old_key, old_payload)
+
+    def _spill(self, key, payload):
+        if self.disk_dir is None:
+            return
+        encoded = json.dumps(payload).encode("utf-8")
+        if len(encoded) > self.disk_max_bytes:
+            return
+        try:
+            (self.disk_dir / f"{key}.json").write_bytes(encoded)
+        except OSError:
+            return
+        self._disk[key] = len(encoded)
+        self._disk_bytes += len(encoded)
+        while self._disk_bytes > self.disk_max_bytes:
+            self._drop_disk(next(iter(self._disk)))
+
+    def _drop_disk(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            (self.disk_dir / f"{key}.json").unlink()
+        except OSError:
+            pass
@@ -0,0 +1,275 @@
+# utils/detlog.py
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# Column name -> dtype; box has 4 values per row (x1, y1, x2, y2)
+COLUMNS = {
+    "frame": np.int32,
+    "box": np.float32,
+    "class_id": np.int16,
+    "confidence": np.float32,
+    "tracker_id": np.int32,  # -1 = not tracked
+    "in_zone": np.int8       # -1 = no zone, 0 = outside, 1 = inside
+}
+
+META_NAME = "meta.json"
+
+def sidecar_path(video_path):
+    """Path of the detection log written next to an output video"""
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}.detections.npz")
+
+def _empty_columns():
+    return {
+        name: np.zeros((0, 4) if name == "box" else 0, dtype=dtype)
+        for name, dtype in COLUMNS.items()
+    }
+
+class DetectionLogWriter:
+    """
+    Tulis deteksi per frame ke file .npz kolumnar secara bertahap
+
+    Baris ditampung per kolom dan ditulis sebagai chunk (satu array .npy per
+    kolom, mis. c00003/frame) setiap chunk_rows baris, jadi memori tetap
+    kecil berapapun panjang videonya. Index chunk (rentang frame per chunk)
+    dan metadata ditulis ke meta.json saat close(). Hasilnya bisa dibaca
+    dengan np.load atau DetectionLog.
+
+    Args:
+        path: file .npz tujuan
+        fps: fps video, untuk konversi waktu <-> frame
+        names: dict class_id -> nama class
+        chunk_rows: jumlah baris per chunk
+        **meta: metadata tambahan (kind, tracker, ...)
+    """
+
+    def __init__(self, path, fps=0.0, names=None, chunk_rows=4096, **meta):
+        self.path = Path(path)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.meta = dict(meta, fps=float(fps or 0.0), names={int(k): v for k, v in (names or {}).items()})
+        self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._chunks = []
+        self._buffer = {name: [] for name in COLUMNS}
+        self._rows = 0
+        self._total_rows = 0
+        self._frame_count = 0
+        self._class_counts = {}
+
+    def append(self, frame_idx, detections, in_zone=None):
+        """
+        Tambahkan deteksi satu frame
+
+        detections: list of dict (box, class_id, confidence, tracker_id opsional,
+        in_zone opsional), sama seperti hasil per frame endpoint video.
+        """
+        self._frame_count = max(self._frame_count, frame_idx + 1)
+        buf = self._buffer
+        for det in detections:
+            tracker_id = det.get("tracker_id")
+            zone = det.get("in_zone", in_zone)
+            buf["frame"].append(frame_idx)
+            buf["box"].append(det["box"])
+            buf["class_id"].append(det["class_id"])
+            buf["confidence"].append(det["confidence"])
+            buf["tracker_id"].append(-1 if tracker_id is None else tracker_id)
+            buf["in_zone"].append(-1 if zone is None else int(bool(zone)))
+            self._class_counts[det["class_id"]] = self._class_counts.get(det["class_id"], 0) + 1
+        self._rows += len(detections)
+        if self._rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Tulis baris yang ditampung sebagai satu chunk"""
+        if self._rows == 0:
+            return
+        name = f"c{len(self._chunks):05d}"
+        columns = {
+            key: np.asarray(values, dtype=COLUMNS[key]).reshape((-1, 4) if key == "box" else -1)
+            for key, values in self._buffer.items()
+        }
+        for key, array in columns.items():
+            with self._zip.open(f"{name}/{key}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+        self._chunks.append({
+            "name": name,
+            "rows": self._rows,
+            "frame_min": int(columns["frame"][0]),
+            "frame_max": int(columns["frame"][-1])
+        })
+        self._total_rows += self._rows
+        self._buffer = {key: [] for key in COLUMNS}
+        self._rows = 0
+
+    def close(self):
+        """Flush sisa baris, tulis meta.json dan tutup file"""
+        if self._zip is None:
+            return
+        self.flush()
+        meta = dict(
+            self.meta,
+            version=1,
+            columns=list(COLUMNS),
+            frame_count=self._frame_count,
+            rows=self._total_rows,
+            class_counts={str(k): v for k, v in sorted(self._class_counts.items())},
+            chunks=self._chunks
+        )
+        self._zip.writestr(META_NAME, json.dumps(meta))
+        self._zip.close()
+        self._zip = None
+
+    def abort(self):
+        """Tutup dan hapus file (video gagal diproses)"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self.path.unlink(missing_ok=True)
+
+class DetectionLog:
+    """
+    Baca dan query log deteksi dari DetectionLogWriter
+
+    Hanya chunk yang rentang frame-nya beririsan dengan query yang dibaca,
+    dan filter dikerjakan per chunk dengan mask NumPy.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with zipfile.ZipFile(self.path) as zf:
+            self.meta = json.loads(zf.read(META_NAME))
+        self.fps = self.meta.get("fps") or 0.0
+        self.names = {int(k): v for k, v in self.meta.get("names", {}).items()}
+
+    def time_to_frame(self, seconds):
+        return int(seconds * self.fps) if self.fps > 0 else int(seconds)
+
+    def iter_chunks(self, frame_start=None, frame_end=None):
+        """Yield dict kolom per chunk yang beririsan dengan [frame_start, frame_end)"""
+        with zipfile.ZipFile(self.path) as zf:
+            for chunk in self.meta["chunks"]:
+                if frame_start is not None and chunk["frame_max"] < frame_start:
+                    continue
+                if frame_end is not None and chunk["frame_min"] >= frame_end:
+                    continue
+                columns = {}
+                for key in COLUMNS:
+                    with zf.open(f"{chunk['name']}/{key}.npy") as f:
+                        columns[key] = np.lib.format.read_array(f, allow_pickle=False)
+                yield columns
+
+    def _filtered(self, frame_start=None, frame_end=None, classes=None, track_ids=None):
+        for columns in self.iter_chunks(frame_start, frame_end):
+            mask = np.ones(len(columns["frame"]), dtype=bool)
+            if frame_start is not None:
+                mask &= columns["frame"] >= frame_start
+            if frame_end is not None:
+                mask &= columns["frame"] < frame_end
+            if classes:
+                mask &= np.isin(columns["class_id"], list(classes))
+            if track_ids:
+                mask &= np.isin(columns["tracker_id"], list(track_ids))
+            if mask.any():
+                yield {key: value[mask] for key, value in columns.items()}
+
+    def query(self, frame_start=None, frame_end=None, classes=None, track_ids=None, limit=None):
+        """
+        Deteksi dalam rentang frame [frame_start, frame_end), opsional
+        difilter class_id dan tracker_id
+
+        Returns:
+            tuple: (columns, truncated) - dict kolom NumPy, maksimal limit baris
+        """
+        parts = []
+        rows = 0
+        truncated = False
+        for columns in self._filtered(frame_start, frame_end, classes, track_ids):
+            n = len(columns["frame"])
+            if limit is not None and rows + n > limit:
+                columns = {key: value[:limit - rows] for key, value in columns.items()}
+                truncated = True
+            parts.append(columns)
+            rows += len(columns["frame"])
+            if truncated:
+                break
+        if not parts:
+            return _empty_columns(), False
+        return {key: np.concatenate([p[key] for p in parts]) for key in COLUMNS}, truncated
+
+    def to_rows(self, columns):
+        """Kolom -> list of dict seperti respons endpoint"""
+        rows = []
+        for frame, box, cid, conf, tid, zone in zip(
+            columns["frame"].tolist(), columns["box"].tolist(), columns["class_id"].tolist(),
+            columns["confidence"].tolist(), columns["tracker_id"].tolist(), columns["in_zone"].tolist()
+        ):
+            row = {
+                "frame": frame,
+                "time": round(frame / self.fps, 3) if self.fps > 0 else None,
+                "box": box,
+                "class_id": cid,
+                "confidence": round(conf, 4),
+                "label": self.names.get(cid, str(cid))
+            }
+            if tid >= 0:
+                row["tracker_id"] = tid
+            if zone >= 0:
+                row["in_zone"] = bool(zone)
+            rows.append(row)
+        return rows
+
+    def tracks(self, frame_start=None, frame_end=None, classes=None):
+        """
+        Ringkasan per tracker_id: frame pertama/terakhir, durasi, jumlah
+        deteksi, rata-rata confidence, class terbanyak dan frame di dalam zona
+        """
+        stats = {}
+        for columns in self._filtered(frame_start, frame_end, classes):
+            tracked = columns["tracker_id"] >= 0
+            if not tracked.any():
+                continue
+            tids = columns["tracker_id"][tracked]
+            frames = columns["frame"][tracked]
+            ids, inverse = np.unique(tids, return_inverse=True)
+            first = np.full(len(ids), np.iinfo(np.int32).max, dtype=np.int64)
+            last = np.full(len(ids), -1, dtype=np.int64)
+            np.minimum.at(first, inverse, frames)
+            np.maximum.at(last, inverse, frames)
+            count = np.bincount(inverse, minlength=len(ids))
+            conf_sum = np.bincount(inverse, weights=columns["confidence"][tracked], minlength=len(ids))
+            zone_frames = np.bincount(inverse, weights=(columns["in_zone"][tracked] == 1).astype(np.float64), minlength=len(ids))
+            pairs, pair_counts = np.unique(
+                np.stack([inverse, columns["class_id"][tracked]], axis=1), axis=0, return_counts=True
+            )
+            for i, tid in enumerate(ids.tolist()):
+                entry = stats.setdefault(tid, {
+                    "first": first[i], "last": last[i], "count": 0, "conf_sum": 0.0,
+                    "zone_frames": 0, "classes": {}
+                })
+                entry["first"] = min(entry["first"], first[i])
+                entry["last"] = max(entry["last"], last[i])
+                entry["count"] += int(count[i])
+                entry["conf_sum"] += float(conf_sum[i])
+                entry["zone_frames"] += int(zone_frames[i])
+            for (idx, cid), n in zip(pairs.tolist(), pair_counts.tolist()):
+                classes_seen = stats[int(ids[idx])]["classes"]
+                classes_seen[cid] = classes_seen.get(cid, 0) + n
+
+        summaries = []
+        for tid, entry in sorted(stats.items()):
+            class_id = max(entry["classes"], key=entry["classes"].get)
+            first, last = int(entry["first"]), int(entry["last"])
+            summaries.append({
+                "tracker_id": tid,
+                "class_id": class_id,
+                "label": self.names.get(class_id, str(class_id)),
+                "first_frame": first,
+                "last_frame": last,
+                "duration": round((last - first + 1) / self.fps, 3) if self.fps > 0 else None,
+                "detections": entry["count"],
+                "mean_confidence": round(entry["conf_sum"] / entry["count"], 4),
+                "frames_in_zone": entry["zone_frames"]
+            })
+        return summaries
@@ -1,37 +1,108 @@
 # utils/enhancement.py
+import threading
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
+# Nama kind yang dikenali apply_enhancement (tidak case-sensitive)
+ENHANCEMENT_KINDS = ("CLAHE", "HE", "HIST", "HIST_EQ", "HISTOGRAM", "BRIGHTNESS", "BC",
+                     "CS", "CONTRAST_STRETCH", "GAMMA")
+
+# Objek CLAHE per thread, dipakai ulang per (clipLimit, tileGridSize)
+_clahe_cache = threading.local()
+
+def get_clahe(clipLimit=3.0, tileGridSize=(8,8)):
+    cache = getattr(_clahe_cache, "objects", None)
+    if cache is None:
+        cache = _clahe_cache.objects = {}
+    key = (float(clipLimit), tuple(tileGridSize))
+    clahe = cache.get(key)
+    if clahe is None:
+        clahe = cache[key] = cv2.createCLAHE(clipLimit=key[0], tileGridSize=key[1])
+    return clahe
+
+@lru_cache(maxsize=256)
+def brightness_contrast_lut(brightness=0, contrast=0):
+    """LUT 256 entri untuk brightness/contrast dalam rentang -127..127"""
+    values = np.arange(256, dtype=np.float32)
+    if brightness != 0:
+        shadow = brightness if brightness > 0 else 0
+        highlight = 255 if brightness > 0 else 255 + brightness
+        values = values * ((highlight - shadow) / 255) + shadow
+    if contrast != 0:
+        f = 131 * (contrast + 127) / (127 * (131 - contrast))
+        values = values * f + 127 * (1 - f)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+@lru_cache(maxsize=64)
+def gamma_lut(gamma=1.5):
+    """LUT 256 entri untuk koreksi gamma (gamma > 1 mencerahkan)"""
+    values = (np.arange(256, dtype=np.float32) / 255.0) ** (1.0 / gamma)
+    return np.clip(values * 255.0, 0, 255).astype(np.uint8)
+
+@lru_cache(maxsize=256)
+def stretch_lut(in_min, in_max):
+    """LUT 256 entri yang memetakan [in_min, in_max] ke [0, 255]"""
+    values = (np.arange(256, dtype=np.float32) - in_min) * (255.0 / (in_max - in_min))
+    return np.clip(values, 0, 255).astype(np.uint8)
+
 def apply_clahe(image, clipLimit=3.0, tileGridSize=(8,8), **kwargs):
     # **kwargs absorbs any extra parameters like brightness/contrast
     if image is None: return None
     if len(image.shape) == 2:
         image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
     lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=clipLimit, tileGridSize=tileGridSize)
-    cl = clahe.apply(l)
-    limg = cv2.merge((cl, a, b))
-    return cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
+    lab[:, :, 0] = get_clahe(clipLimit, tileGridSize).apply(lab[:, :, 0])
+    # Convert back into the LAB buffer instead of allocating another frame
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=lab)
 
 def apply_hist_equalization(image, **kwargs):
     # Add **kwargs to ignore extra parameters
     if image is None: return None
     img_yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)
     img_yuv[:,:,0] = cv2.equalizeHist(img_yuv[:,:,0])
-    return cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR)
+    return cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR, dst=img_yuv)
+
+def apply_brightness_contrast(image, brightness=0, contrast=0, **kwargs):
+    if image is None: return None
+    brightness = int(np.clip(brightness, -127, 127))
+    contrast = int(np.clip(contrast, -127, 127))
+    if brightness == 0 and contrast == 0:
+        return image.copy()
+    return cv2.LUT(image, brightness_contrast_lut(brightness, contrast))
+
+def apply_gamma(image, gamma=1.5, **kwargs):
+    if image is None: return None
+    return cv2.LUT(image, gamma_lut(round(float(gamma), 3)))
 
 def apply_contrast_stretching(image, **kwargs):
     # Add **kwargs to ignore extra parameters
     if image is None: return None
-    in_min = image.min()
-    in_max = image.max()
+    in_min, in_max, _, _ = cv2.minMaxLoc(image.reshape(-1, 1))
     if in_max - in_min == 0:
         return image.copy()
-    out = ((image - in_min) * (255.0 / (in_max - in_min))).astype('uint8')
-    return out
+    return cv2.LUT(image, stretch_lut(int(in_min), int(in_max)))
+
+def resize_max_side(image, max_side):
+    """Perkecil image sehingga sisi terpanjang <= max_side"""
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+def apply_enhancement(image, kind="CLAHE", max_side=None, **kwargs):
+    """
+    Terapkan enhancement `kind` ke image
 
-def apply_enhancement(image, kind="CLAHE", **kwargs):
+    Dengan max_side (mis. ukuran input model) image diperkecil dulu, jadi
+    enhancement dihitung pada resolusi input model, bukan resolusi frame.
+    Selalu mengembalikan array baru; kind di luar ENHANCEMENT_KINDS
+    menghasilkan ValueError.
+    """
+    if image is not None and max_side:
+        image = resize_max_side(image, max_side)
     kind = kind.upper()
     if kind == "CLAHE":
         # Only pass CLAHE-specific parameters
@@ -40,7 +111,7 @@ def apply_enhancement(image, kind="CLAHE", **kwargs):
             if k in ['clipLimit', 'tileGridSize']
         }
         return apply_clahe(image, **clahe_params)
-    if kind in ["HE", "HIST", "HIST_EQ"]:
+    if kind in ["HE", "HIST", "HIST_EQ", "HISTOGRAM"]:
         return apply_hist_equalization(image)
     if kind in ["BRIGHTNESS", "BC"]:
         return apply_brightness_contrast(
@@ -50,4 +121,6 @@ def apply_enhancement(image, kind="CLAHE", **kwargs):
         )
     if kind in ["CS", "CONTRAST_STRETCH"]:
         return apply_contrast_stretching(image)
-    return image
+    if kind == "GAMMA":
+        return apply_gamma(image, gamma=kwargs.get("gamma", 1.5))
+    raise ValueError(f"unknown enhancement kind: {kind}")
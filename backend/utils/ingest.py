@@ -0,0 +1,94 @@
+# utils/ingest.py
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import cv2
+from flask import Request
+from werkzeug.formparser import default_stream_factory
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv')
+
+class SpooledUploadRequest(Request):
+    """
+    Request yang menulis upload video langsung ke file temp bernama
+
+    Parser form werkzeug menyalin body upload ke stream ini sambil data
+    masuk, jadi video tidak perlu disalin lagi lewat file.save(). File temp
+    otomatis terhapus saat request ditutup.
+    """
+
+    upload_dir = Path(tempfile.gettempdir())
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and filename.lower().endswith(VIDEO_EXTENSIONS):
+            self.upload_dir.mkdir(parents=True, exist_ok=True)
+            return tempfile.NamedTemporaryFile(
+                mode="w+b", dir=self.upload_dir, prefix="upload_", suffix=Path(filename).suffix.lower()
+            )
+        return default_stream_factory(total_content_length, content_type, filename, content_length)
+
+def ingest_upload(file, upload_dir):
+    """
+    Path upload video di disk tanpa menyalin isinya
+
+    Upload yang sudah di-spool oleh SpooledUploadRequest di-hard-link supaya
+    tetap ada setelah request selesai (mis. untuk job async). Stream lain
+    disimpan dengan file.save(). Pemanggil wajib menghapus path ini.
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(file.filename or "").suffix.lower() or ".mp4"
+    path = upload_dir / f"in_{uuid.uuid4().hex}{suffix}"
+    
+    stream = file.stream
+    spooled = getattr(stream, "name", None)
+    if isinstance(spooled, str) and os.path.exists(spooled):
+        stream.flush()
+        try:
+            os.link(spooled, path)
+            return path
+        except OSError:
+            pass
+    file.save(str(path))
+    return path
+
+class VideoSource:
+    """
+    VideoCapture yang dibuka sekali, beserta dimensi/fps hasil probe
+
+    Dipakai bersama oleh pembuatan polygon default dan process_video,
+    sehingga video tidak dibuka dua kali.
+    """
+
+    def __init__(self, path, owned=False):
+        self.path = Path(path)
+        self.owned = owned
+        self.cap = cv2.VideoCapture(str(self.path))
+        self.opened = self.cap.isOpened()
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) if self.opened else 0
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) if self.opened else 0
+        self.fps = (self.cap.get(cv2.CAP_PROP_FPS) if self.opened else 0) or 25.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.opened else 0
+        if self.opened and (self.width <= 0 or self.height <= 0):
+            # Container without size metadata: probe the first frame, then rewind
+            ret, frame = self.cap.read()
+            if ret:
+                self.height, self.width = frame.shape[:2]
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            else:
+                self.opened = False
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    def release(self):
+        """Tutup capture; hapus file bila milik source ini"""
+        self.cap.release()
+        if self.owned:
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,142 @@
+# utils/jobs.py
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+class Job:
+    """Satu pekerjaan pemrosesan video beserta progresnya"""
+
+    def __init__(self, kind, func, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.frames_done = 0
+        self.frames_total = 0
+        self.result = None
+        self.error = None
+
+    def update_progress(self, frames_done, frames_total=None):
+        self.frames_done = frames_done
+        if frames_total:
+            self.frames_total = frames_total
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        fps = self.frames_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and fps > 0 and self.frames_total:
+            eta = max(self.frames_total - self.frames_done, 0) / fps
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {
+                "frames_done": self.frames_done,
+                "frames_total": self.frames_total,
+                "fps": round(fps, 2),
+                "eta_seconds": round(eta, 1) if eta is not None else None
+            }
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+class JobManager:
+    """
+    Worker pool berukuran tetap dengan antrian terbatas
+
+    Args:
+        workers: jumlah thread worker
+        max_queue: jumlah job yang boleh menunggu sebelum submit ditolak
+        history: jumlah job selesai yang tetap disimpan untuk /jobs/<id>
+    """
+
+    def __init__(self, workers=2, max_queue=16, history=256):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.history = history
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, kind, func, job_id=None):
+        """
+        Antrikan func(progress) sebagai job baru
+
+        func harus mengembalikan (payload, err) dan memanggil
+        progress(frames_done, frames_total) selama berjalan.
+        """
+        job = Job(kind, func, job_id)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull(f"job queue is full ({self.max_queue} pending)")
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status == "running")
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize(),
+            "running": running
+        }
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [jid for jid, j in self._jobs.items() if j.status in ("done", "failed")]
+        for jid in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[jid]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                payload, err = job.func(job.update_progress)
+                if err:
+                    job.error = err
+                    job.status = "failed"
+                else:
+                    job.result = payload
+                    job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                job.func = None
+                self._queue.task_done()
@@ -0,0 +1,154 @@
+# utils/lines.py
+import cv2
+import numpy as np
+import supervision as sv
+
+class LineCounter:
+    """
+    Hitung objek yang melintasi banyak garis sekaligus, tervektorisasi
+
+    Per frame, sisi setiap anchor deteksi terhadap setiap garis dihitung
+    dalam satu operasi array (n_deteksi x n_garis), lalu dibandingkan dengan
+    sisi terakhir track yang sama. Sisi per track disimpan sebagai array
+    terurut per tracker_id, jadi lookup-nya juga satu searchsorted.
+
+    "in" = anchor pindah ke sisi kanan arah start -> end seperti terlihat di
+    layar (garis kiri->kanan: dari atas ke bawah), "out" = sebaliknya.
+    Anchor di luar rentang segmen garis me-reset sisi track, jadi objek yang
+    lewat di luar ujung garis tidak terhitung.
+
+    Args:
+        lines: dict line_id -> (start, end), masing-masing (x, y)
+        anchor: sv.Position titik deteksi yang dicek
+        evict_after: sisi track yang tidak terlihat selama sekian frame
+            dibuang (count in/out tetap), sehingga memori dan biaya update
+            mengikuti jumlah track aktif; 0 = simpan semua track
+    """
+
+    def __init__(self, lines, anchor=sv.Position.BOTTOM_CENTER, evict_after=0):
+        if not lines:
+            raise ValueError("at least one line is required")
+        self.ids = list(lines)
+        points = np.array([[*lines[lid][0], *lines[lid][1]] for lid in self.ids], dtype=np.float64)
+        self.starts = points[:, :2]
+        self.vectors = points[:, 2:] - points[:, :2]
+        self._length2 = (self.vectors ** 2).sum(axis=1)
+        if np.any(self._length2 == 0):
+            raise ValueError("line start and end must differ")
+        self.anchor = anchor
+        self.evict_after = int(evict_after)
+        self.reset()
+
+    def reset(self):
+        n = len(self.ids)
+        self.in_counts = np.zeros(n, dtype=np.int64)
+        self.out_counts = np.zeros(n, dtype=np.int64)
+        # per line: class_id -> [in, out]
+        self.class_counts = [dict() for _ in self.ids]
+        self._track_ids = np.zeros(0, dtype=np.int64)
+        self._sides = np.zeros((0, n), dtype=np.int8)
+        self._last_seen = np.zeros(0, dtype=np.int64)
+        self.frames = 0
+        self._evicted_at = 0
+
+    def sides(self, anchors):
+        """
+        Sisi tiap titik terhadap tiap garis: (n, n_lines) int8
+
+        +1 kanan, -1 kiri, 0 di luar rentang segmen; titik tepat di garis
+        mendapat 0 dengan in_extent True.
+        """
+        rel = anchors[:, None, :] - self.starts[None, :, :]
+        cross = self.vectors[None, :, 0] * rel[..., 1] - self.vectors[None, :, 1] * rel[..., 0]
+        t = (rel * self.vectors[None, :, :]).sum(axis=2) / self._length2[None, :]
+        in_extent = (t >= 0) & (t <= 1)
+        return np.where(in_extent, np.sign(cross), 0).astype(np.int8), in_extent
+
+    def update(self, detections):
+        """
+        Proses deteksi satu frame (butuh tracker_id)
+
+        Returns:
+            np.ndarray: (n, n_lines) int8, +1 crossing in, -1 out, 0 tidak ada
+        """
+        n_lines = len(self.ids)
+        frame_idx = self.frames
+        self.frames += 1
+        if self.evict_after and frame_idx - self._evicted_at >= max(1, self.evict_after // 2):
+            self.evict(frame_idx)
+        if len(detections) == 0 or detections.tracker_id is None:
+            return np.zeros((len(detections), n_lines), dtype=np.int8)
+
+        tids = np.asarray(detections.tracker_id, dtype=np.int64)
+        anchors = np.asarray(detections.get_anchors_coordinates(self.anchor), dtype=np.float64)
+        new, in_extent = self.sides(anchors)
+
+        idx = np.searchsorted(self._track_ids, tids)
+        known = idx < len(self._track_ids)
+        known[known] = self._track_ids[idx[known]] == tids[known]
+        prev = np.zeros_like(new)
+        prev[known] = self._sides[idx[known]]
+
+        crossed = (prev != 0) & (new != 0) & (prev != new)
+        events = np.where(crossed, new, 0).astype(np.int8)
+        self.in_counts += (events == 1).sum(axis=0)
+        self.out_counts += (events == -1).sum(axis=0)
+        if crossed.any() and detections.class_id is not None:
+            det_idx, line_idx = np.nonzero(crossed)
+            for cid, li, direction in zip(detections.class_id[det_idx].tolist(), line_idx.tolist(),
+                                          events[det_idx, line_idx].tolist()):
+                counts = self.class_counts[li].setdefault(cid, [0, 0])
+                counts[0 if direction == 1 else 1] += 1
+
+        # Exactly on the line keeps the previous side, outside the segment resets it
+        store = np.where((new == 0) & in_extent, prev, new).astype(np.int8)
+        self._sides[idx[known]] = store[known]
+        self._last_seen[idx[known]] = frame_idx
+        if not known.all():
+            track_ids = np.concatenate([self._track_ids, tids[~known]])
+            sides = np.concatenate([self._sides, store[~known]])
+            last_seen = np.concatenate([self._last_seen, np.full(int((~known).sum()), frame_idx, dtype=np.int64)])
+            order = np.argsort(track_ids, kind="stable")
+            self._track_ids, self._sides, self._last_seen = track_ids[order], sides[order], last_seen[order]
+        return events
+
+    def evict(self, frame_idx):
+        """Buang sisi track yang terakhir terlihat sebelum frame_idx - evict_after"""
+        self._evicted_at = frame_idx
+        keep = self._last_seen >= frame_idx - self.evict_after
+        if not keep.all():
+            self._track_ids, self._sides, self._last_seen = \
+                self._track_ids[keep], self._sides[keep], self._last_seen[keep]
+
+    def stats(self, names=None):
+        """Per garis: in/out total dan per class (nama class bila names diberikan)"""
+        result = {}
+        for i, lid in enumerate(self.ids):
+            by_class = {}
+            for cid, (n_in, n_out) in sorted(self.class_counts[i].items()):
+                label = names.get(cid, str(cid)) if names else str(cid)
+                by_class[label] = {"in": n_in, "out": n_out}
+            result[lid] = {
+                "in": int(self.in_counts[i]),
+                "out": int(self.out_counts[i]),
+                "by_class": by_class
+            }
+        return result
+
+    def annotate(self, scene, thickness=2, text_scale=0.6):
+        """Gambar semua garis dengan count in/out"""
+        palette = sv.ColorPalette.DEFAULT
+        for i, (start, vector) in enumerate(zip(self.starts, self.vectors)):
+            color = palette.by_idx(i).as_bgr()
+            p1 = tuple(int(v) for v in start)
+            p2 = tuple(int(v) for v in start + vector)
+            cv2.line(scene, p1, p2, color, thickness, cv2.LINE_AA)
+            cv2.circle(scene, p1, thickness + 3, color, -1)
+            cv2.circle(scene, p2, thickness + 3, color, -1)
+            text = f"in {int(self.in_counts[i])} | out {int(self.out_counts[i])}"
+            (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, text_scale, 1)
+            mx, my = (int(v) for v in start + vector / 2)
+            cv2.rectangle(scene, (mx - tw // 2 - 4, my - th - 6), (mx + tw // 2 + 4, my + baseline - 2), color, -1)
+            cv2.putText(scene, text, (mx - tw // 2, my - 4), cv2.FONT_HERSHEY_SIMPLEX,
+                        text_scale, (255, 255, 255), 1, cv2.LINE_AA)
+        return scene
@@ -0,0 +1,415 @@
+# utils/live.py
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import cv2
+
+LIVE_SCHEMES = ("rtsp", "rtsps", "rtmp", "http", "https", "udp", "tcp", "srt")
+
+class LiveSessionLimit(Exception):
+    """Raised when the maximum number of live sessions is already running"""
+
+def parse_source(spec, file_root=None):
+    """
+    Source untuk cv2.VideoCapture dari string request
+
+    Returns:
+        tuple: (source, kind) - kind "device" (index kamera), "url" (RTSP,
+        HTTP, ...) atau "file" (video lokal di bawah file_root)
+
+    Raises:
+        ValueError: source kosong, skema tidak dikenal, atau file di luar file_root
+    """
+    spec = str(spec or "").strip()
+    if not spec:
+        raise ValueError("source is required")
+    if spec.isdigit():
+        return int(spec), "device"
+    scheme = urlsplit(spec).scheme.lower()
+    if scheme in LIVE_SCHEMES:
+        return spec, "url"
+    if scheme and len(scheme) > 1:
+        raise ValueError(f"unsupported source scheme '{scheme}'")
+    if file_root is None:
+        raise ValueError("local file sources are disabled")
+    root = Path(file_root).resolve()
+    path = (root / spec).resolve()
+    if root != path and root not in path.parents:
+        raise ValueError("file source must be inside the live source directory")
+    if not path.is_file():
+        raise ValueError(f"file not found: {spec}")
+    return str(path), "file"
+
+def redact_source(source):
+    """Source untuk ditampilkan, tanpa password di URL"""
+    if not isinstance(source, str) or "@" not in source:
+        return source
+    parts = urlsplit(source)
+    if parts.password is None:
+        return source
+    netloc = f"{parts.username}:***@{parts.hostname}" + (f":{parts.port}" if parts.port else "")
+    return urlunsplit(parts._replace(netloc=netloc))
+
+class LatestFrame:
+    """
+    Slot satu frame antara reader dan pemrosesan: yang terbaru menang
+
+    put() menimpa frame yang belum diambil (dihitung sebagai dropped), jadi
+    bila inference lebih lambat dari sumber, frame lama dibuang dan latensi
+    tetap sebatas satu frame, bukan antrian yang terus memanjang.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, seq, frame):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = (seq, frame, time.time())
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """(seq, frame, captured_at) terbaru, None bila timeout atau ditutup dan kosong"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._item is not None or self._closed, timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class RateMeter:
+    """Laju kejadian per detik dalam jendela geser window detik"""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = deque()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._times.append(now)
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self):
+        self._trim(time.monotonic())
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+class LiveSession:
+    """
+    Pemrosesan kontinu satu sumber live (RTSP, kamera, atau file yang diulang)
+
+    Reader thread membaca frame secepat sumbernya (file diputar dengan
+    kecepatan fps aslinya bila realtime=True, jadi bisa dipakai sebagai
+    pengganti kamera saat offline) ke LatestFrame; worker thread mengambil
+    frame terbaru dan memanggil process(frame, frame_idx) -> (annotated,
+    result), atau None untuk melewati frame (dihitung dropped). Hasil terakhir bisa dibaca lewat status() atau ditunggu dengan
+    wait_update(). Sumber URL/kamera yang putus dibuka ulang otomatis.
+
+    Args:
+        source, kind: hasil parse_source()
+        process: fungsi pemrosesan per frame (dipanggil dari worker thread)
+        loop: file diputar ulang dari awal saat habis
+        realtime: batasi pembacaan file ke fps (default: ya untuk file)
+        fps: fps untuk realtime (default: fps sumber)
+        reconnect_delay: detik menunggu sebelum membuka ulang sumber yang putus
+        on_close: dipanggil sekali saat session berhenti
+        **meta: info tambahan di status (mode, tracker, ...)
+    """
+
+    def __init__(self, source, kind, process, loop=False, realtime=None, fps=None,
+                 reconnect_delay=2.0, on_close=None, **meta):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.kind = kind
+        self.process = process
+        self.loop = loop
+        self.realtime = (kind == "file") if realtime is None else realtime
+        self.reconnect_delay = reconnect_delay
+        self.on_close = on_close
+        self.meta = meta
+        self.state = "starting"
+        self.error = None
+        self.started_at = None
+        self.stopped_at = None
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.reconnects = 0
+        self.loops = 0
+        self.latency_ms = None
+        self.latest = None
+        self.latest_frame = None
+        self.version = 0
+
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise ValueError(f"failed to open source {redact_source(source)}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.fps = fps or self.source_fps or 25.0
+        self._first_frame = None
+        if self.width <= 0 or self.height <= 0:
+            # RTSP/camera often report no size until decoding starts: read one
+            # frame so zones and lines get real geometry, then hand it to _read
+            ret, frame = self.cap.read()
+            if not ret:
+                self.cap.release()
+                raise ValueError(f"no frames from source {redact_source(source)}")
+            self.height, self.width = frame.shape[:2]
+            self._first_frame = frame
+
+        self._slot = LatestFrame()
+        self._stop = threading.Event()
+        self._update = threading.Condition()
+        self._read_rate = RateMeter()
+        self._process_rate = RateMeter()
+        self._reader = None
+        self._worker = None
+        self._closed = False
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    @property
+    def running(self):
+        return self.state in ("starting", "running", "reconnecting")
+
+    def start(self):
+        self.started_at = time.time()
+        self.state = "running"
+        self._reader = threading.Thread(target=self._read, name=f"live-read-{self.id[:8]}", daemon=True)
+        self._worker = threading.Thread(target=self._work, name=f"live-work-{self.id[:8]}", daemon=True)
+        self._reader.start()
+        self._worker.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Hentikan kedua thread dan tutup sumber"""
+        self._stop.set()
+        self._slot.close()
+        for thread in (self._reader, self._worker):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+        if self._reader is None:
+            # Never started: the capture opened in __init__ is still ours
+            self.cap.release()
+        if self.running:
+            self.state = "stopped"
+        self._close()
+
+    def _close(self):
+        with self._update:
+            if self._closed:
+                return
+            self._closed = True
+            self.stopped_at = self.stopped_at or time.time()
+            self._update.notify_all()
+        if self.on_close is not None:
+            self.on_close()
+
+    # ------------------------------------------------------------------
+    # threads
+
+    def _read(self):
+        cap = self.cap
+        interval = 1.0 / self.fps if self.realtime and self.fps > 0 else 0.0
+        next_at = time.monotonic()
+        try:
+            if self._first_frame is not None:
+                self._slot.put(self.frames_read, self._first_frame)
+                self._first_frame = None
+                self.frames_read += 1
+                self._read_rate.tick()
+            while not self._stop.is_set():
+                if cap is None:
+                    cap = cv2.VideoCapture(self.source)
+                    if not cap.isOpened():
+                        cap.release()
+                        cap = None
+                        self._stop.wait(self.reconnect_delay)
+                        continue
+                    self.cap = cap
+                    self.state = "running"
+                ret, frame = cap.read()
+                if not ret:
+                    if self.kind == "file":
+                        if not self.loop:
+                            self.state = "finished"
+                            break
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        self.loops += 1
+                        continue
+                    # Camera or stream dropped: reopen after a pause
+                    cap.release()
+                    cap = None
+                    self.reconnects += 1
+                    self.state = "reconnecting"
+                    continue
+                self._slot.put(self.frames_read, frame)
+                self.frames_read += 1
+                self._read_rate.tick()
+                if interval:
+                    next_at = max(next_at + interval, time.monotonic() - interval)
+                    self._stop.wait(max(0.0, next_at - time.monotonic()))
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            if cap is not None:
+                cap.release()
+            # Let the worker finish the last frame, then exit
+            self._slot.close()
+
+    def _work(self):
+        try:
+            while not self._stop.is_set():
+                item = self._slot.get(timeout=0.5)
+                if item is None:
+                    if not self._reader.is_alive():
+                        break
+                    continue
+                seq, frame, captured_at = item
+                output = self.process(frame, seq)
+                if output is None:
+                    self.frames_skipped += 1
+                    continue
+                annotated, result = output
+                self.frames_processed += 1
+                self._process_rate.tick()
+                self.latency_ms = round((time.time() - captured_at) * 1000, 1)
+                with self._update:
+                    self.latest = dict(result, frame=seq, timestamp=captured_at)
+                    self.latest_frame = annotated
+                    self.version += 1
+                    self._update.notify_all()
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            self._stop.set()
+        finally:
+            self._slot.close()
+            self._close()
+
+    # ------------------------------------------------------------------
+    # results
+
+    def wait_update(self, version, timeout=None):
+        """
+        Tunggu hasil yang lebih baru dari version
+
+        Returns:
+            tuple: (version, latest, latest_frame), version tetap bila timeout;
+            pembaca yang lambat langsung mendapat hasil terbaru (yang di
+            antaranya dilewati)
+        """
+        with self._update:
+            self._update.wait_for(lambda: self.version != version or self._closed, timeout)
+            return self.version, self.latest, self.latest_frame
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def status(self):
+        dropped = self._slot.dropped + self.frames_skipped
+        uptime = (self.stopped_at or time.time()) - self.started_at if self.started_at else 0.0
+        return dict(
+            self.meta,
+            session_id=self.id,
+            source=redact_source(self.source),
+            source_kind=self.kind,
+            state=self.state,
+            error=self.error,
+            width=self.width,
+            height=self.height,
+            source_fps=round(self.source_fps, 2),
+            realtime=self.realtime,
+            loop=self.loop,
+            started_at=self.started_at,
+            stopped_at=self.stopped_at,
+            uptime_seconds=round(uptime, 1),
+            frames_read=self.frames_read,
+            frames_processed=self.frames_processed,
+            frames_dropped=dropped,
+            drop_rate=round(dropped / self.frames_read, 3) if self.frames_read else 0.0,
+            capture_fps=round(self._read_rate.rate(), 2),
+            effective_fps=round(self._process_rate.rate(), 2),
+            latency_ms=self.latency_ms,
+            reconnects=self.reconnects,
+            loops=self.loops,
+            latest=self.latest
+        )
+
+class LiveSessionManager:
+    """
+    Registry LiveSession, dibatasi max_sessions yang berjalan bersamaan
+
+    Session yang sudah berhenti (lewat stop(), file habis, error) tetap
+    bisa dilihat statusnya selama keep detik.
+    """
+
+    def __init__(self, max_sessions=4, keep=300):
+        self.max_sessions = max_sessions
+        self.keep = keep
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep
+        for sid in [sid for sid, s in self._sessions.items() if s.closed and s.stopped_at < cutoff]:
+            del self._sessions[sid]
+
+    def add(self, session):
+        """Daftarkan dan start session; LiveSessionLimit bila sudah penuh"""
+        with self._lock:
+            self._prune()
+            active = sum(s.running for s in self._sessions.values())
+            if active >= self.max_sessions:
+                raise LiveSessionLimit(f"at most {self.max_sessions} live sessions can run at once")
+            self._sessions[session.id] = session
+        return session.start()
+
+    def get(self, session_id):
+        with self._lock:
+            self._prune()
+            return self._sessions.get(session_id)
+
+    def list(self):
+        with self._lock:
+            self._prune()
+            return list(self._sessions.values())
+
+    def stop(self, session_id):
+        """Hentikan session (statusnya tetap ada selama keep detik), returns session atau None"""
+        with self._lock:
+            self._prune()
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.stop()
+        return session
+
+    def stop_all(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.stop()
@@ -0,0 +1,169 @@
+# utils/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; spans a single CLAHE call up to a full-HD inference on a slow CPU
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Counter monoton naik: inc(amount, **labels)"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(items)
+        ]
+
+class Gauge(Counter):
+    """Nilai yang bisa naik turun: set/inc/dec(**labels)"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """
+    Histogram dengan bucket tetap: observe(seconds, **labels)
+
+    Per label set hanya disimpan count per bucket, sum dan count; observe
+    cukup satu bisect dan beberapa penjumlahan di bawah lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts + overflow, sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][idx] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total) in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Kumpulan metric yang dirender ke format teks Prometheus (0.0.4)"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=STAGE_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "yolo_stage_seconds",
+    "Time spent per processing stage (per call; batched stages cover the whole batch)",
+    labels=("stage",)
+)
+
+@contextmanager
+def timed(stage):
+    """Catat durasi blok ke yolo_stage_seconds{stage=...}"""
+    if not REGISTRY.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
@@ -0,0 +1,110 @@
+# utils/mp4.py
+import os
+import struct
+from pathlib import Path
+
+# Atoms on the path from moov down to the chunk offset tables
+CONTAINER_ATOMS = (b"trak", b"mdia", b"minf", b"stbl")
+
+def _read_atoms(f, end):
+    """Top-level atoms as (type, offset, size)"""
+    atoms = []
+    pos = 0
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        atoms.append((kind, pos, size))
+        pos += size
+    return atoms
+
+def _shift_chunk_offsets(moov, delta, start, end):
+    """
+    Tambah delta ke semua offset di stco/co64 dalam moov (in place)
+
+    Returns False bila offset stco 32-bit akan overflow.
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", moov, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", moov, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return False
+        body = pos + header
+        if kind in CONTAINER_ATOMS:
+            if not _shift_chunk_offsets(moov, delta, body, pos + size):
+                return False
+        elif kind in (b"stco", b"co64"):
+            fmt = "I" if kind == b"stco" else "Q"
+            count = struct.unpack_from(">I", moov, body + 4)[0]
+            offsets = struct.unpack_from(f">{count}{fmt}", moov, body + 8)
+            if kind == b"stco" and count and max(offsets) + delta > 0xFFFFFFFF:
+                return False
+            struct.pack_into(f">{count}{fmt}", moov, body + 8, *(o + delta for o in offsets))
+        pos += size
+    return True
+
+def faststart(path):
+    """
+    Pindahkan atom moov ke depan mdat (seperti `ffmpeg -movflags +faststart`)
+
+    Browser bisa mulai memutar dan seek tanpa mengunduh seluruh file.
+    File ditulis ulang lewat file sementara lalu diganti secara atomik.
+
+    Returns:
+        bool: True bila file diubah, False bila sudah fast-start atau
+        tidak bisa diproses
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".faststart")
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        atoms = _read_atoms(f, f.tell())
+        kinds = [kind for kind, _, _ in atoms]
+        if b"moov" not in kinds or b"mdat" not in kinds:
+            return False
+        moov_idx = kinds.index(b"moov")
+        mdat_idx = kinds.index(b"mdat")
+        if moov_idx < mdat_idx:
+            return False
+        
+        _, moov_pos, moov_size = atoms[moov_idx]
+        f.seek(moov_pos)
+        moov = bytearray(f.read(moov_size))
+        header = 16 if struct.unpack_from(">I", moov, 0)[0] == 1 else 8
+        # Everything from mdat onwards moves back by the size of moov
+        if not _shift_chunk_offsets(moov, moov_size, header, len(moov)):
+            return False
+        
+        try:
+            with open(tmp, "wb") as out:
+                for i, (kind, pos, size) in enumerate(atoms):
+                    if i == moov_idx:
+                        continue
+                    if i == mdat_idx:
+                        out.write(moov)
+                    f.seek(pos)
+                    remaining = size
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        remaining -= len(chunk)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+    os.replace(tmp, path)
+    return True
@@ -0,0 +1,171 @@
+# utils/pipeline.py
+import queue
+import threading
+
+from utils.metrics import timed
+
+# Marks the end of a stage's output
+_SENTINEL = object()
+
+def _put(q, item, stop):
+    """Put item on a bounded queue, giving up once stop is set"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    """Get item from a queue, returns _SENTINEL once stop is set"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _SENTINEL
+
+class FramePool:
+    """
+    Pool buffer frame untuk cap.read(), supaya decode tidak mengalokasikan
+    frame baru setiap kali
+
+    acquire() mengambil buffer bekas (None bila kosong, cap.read() lalu
+    mengalokasikan sendiri), release() mengembalikan frame setelah selesai
+    ditulis. Jumlah buffer yang disimpan dibatasi capacity; frame yang
+    ukurannya berubah (mis. stream ganti resolusi) tetap boleh masuk karena
+    cap.read() mengalokasikan ulang bila ukurannya tidak cocok.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(0, int(capacity))
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                return self._free.pop()
+            self.allocated += 1
+            return None
+
+    def release(self, frames):
+        with self._lock:
+            for frame in frames:
+                if len(self._free) >= self.capacity:
+                    break
+                self._free.append(frame)
+
+def run_pipeline(cap, writer, process_batch, batch_size=1, queue_size=4, progress=None,
+                 on_frame=None, pool=None):
+    """
+    Jalankan decode -> inference -> encode sebagai pipeline tiga tahap
+
+    - decoder thread: cap.read() dan mengelompokkan frame per batch_size
+    - inference (thread pemanggil): process_batch(frames, start_idx)
+    - encoder thread: writer.write() dan menggabungkan hasil per frame
+
+    Frame hasil decode didaur ulang lewat FramePool: setelah encoder selesai
+    dengan satu batch, buffer-nya dipakai lagi oleh cap.read(). Karena itu
+    process_batch boleh menggambar langsung di frame yang diterimanya, tapi
+    tidak boleh menyimpan referensi ke frame (atau view-nya) melewati
+    on_frame, dan on_frame tidak boleh menyimpan processed_frame.
+
+    Antar tahap dihubungkan queue berukuran queue_size (dalam batch), jadi
+    jumlah frame di memori tetap terbatas. Urutan frame dan dict hasil sama
+    seperti loop serial. progress(frame_count) dipanggil setiap batch selesai
+    ditulis, on_frame(frame_idx, processed_frame, frame_results) setiap frame
+    (berurutan, dari encoder thread).
+
+    Returns:
+        tuple: (frame_count, results)
+    """
+    if pool is None:
+        # Frames in flight: both queues, plus one batch in each stage
+        pool = FramePool((2 * queue_size + 3) * batch_size)
+    decode_q = queue.Queue(maxsize=queue_size)
+    encode_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    results = {}
+    frame_count = 0
+
+    def decode():
+        try:
+            start_idx = 0
+            while not stop.is_set():
+                frames = []
+                while len(frames) < batch_size:
+                    buf = pool.acquire()
+                    with timed("decode"):
+                        ret, frame = cap.read() if buf is None else cap.read(buf)
+                    if not ret:
+                        if buf is not None:
+                            pool.release([buf])
+                        break
+                    frames.append(frame)
+                if not frames:
+                    break
+                if not _put(decode_q, (start_idx, frames), stop):
+                    return
+                start_idx += len(frames)
+                if len(frames) < batch_size:
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(decode_q, _SENTINEL, stop)
+
+    def encode():
+        nonlocal frame_count
+        try:
+            while True:
+                item = _get(encode_q, stop)
+                if item is _SENTINEL:
+                    break
+                frames, outputs = item
+                for processed_frame, frame_results in outputs:
+                    with timed("encode"):
+                        writer.write(processed_frame)
+                    if frame_results:
+                        for key, value in frame_results.items():
+                            results[key] = value
+                    if on_frame is not None:
+                        on_frame(frame_count, processed_frame, frame_results)
+                    frame_count += 1
+                pool.release(frames)
+                if progress is not None:
+                    progress(frame_count)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    decoder = threading.Thread(target=decode, name="video-decode", daemon=True)
+    encoder = threading.Thread(target=encode, name="video-encode", daemon=True)
+    decoder.start()
+    encoder.start()
+
+    try:
+        while True:
+            item = _get(decode_q, stop)
+            if item is _SENTINEL:
+                break
+            start_idx, frames = item
+            if not _put(encode_q, (frames, process_batch(frames, start_idx)), stop):
+                break
+    except Exception:
+        stop.set()
+        raise
+    finally:
+        _put(encode_q, _SENTINEL, stop)
+        decoder.join()
+        encoder.join()
+
+    if errors:
+        raise errors[0]
+    return frame_count, results
@@ -0,0 +1,208 @@
+# utils/segments.py
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+def ffmpeg_binary(name="ffmpeg"):
+    """Path ke ffmpeg/ffprobe (env FFMPEG_BIN / FFPROBE_BIN atau PATH), None bila tidak ada"""
+    return os.environ.get(f"{name.upper()}_BIN") or shutil.which(name)
+
+def keyframe_indices(path, fps, timeout=60):
+    """
+    Index frame keyframe video (lewat ffprobe, hanya keyframe yang didecode)
+
+    Returns None bila ffprobe tidak tersedia atau gagal; index dihitung dari
+    timestamp * fps, jadi tepat untuk video fps konstan.
+    """
+    ffprobe = ffmpeg_binary("ffprobe")
+    if ffprobe is None or not fps:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=pts_time,best_effort_timestamp_time", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True, timeout=timeout, check=True
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    frames = set()
+    for line in out.splitlines():
+        for value in line.split(","):
+            try:
+                frames.add(int(round(float(value) * fps)))
+                break
+            except ValueError:
+                continue
+    return sorted(frames) or None
+
+def plan_segments(frame_count, segments, min_frames=1, keyframes=None):
+    """
+    Bagi [0, frame_count) menjadi paling banyak `segments` rentang (start, end)
+
+    Batas dibagi rata lalu digeser ke keyframe terdekat bila keyframes
+    diberikan, sehingga worker bisa seek tepat ke awal segmennya tanpa
+    decode ulang dari keyframe sebelumnya. Setiap segmen minimal min_frames
+    frame: batas yang setelah digeser terlalu dekat dengan batas sebelumnya
+    (atau dengan akhir video) digabung.
+    """
+    min_frames = max(1, min_frames)
+    segments = max(1, min(int(segments), frame_count // min_frames))
+    bounds = [round(i * frame_count / segments) for i in range(segments + 1)]
+    if keyframes:
+        keys = np.asarray(keyframes)
+        for i in range(1, segments):
+            nearest = keys[np.abs(keys - bounds[i]).argmin()]
+            if bounds[i - 1] < nearest < frame_count:
+                bounds[i] = int(nearest)
+    starts = [0]
+    for bound in sorted(set(bounds[1:-1])):
+        if bound - starts[-1] >= min_frames:
+            starts.append(bound)
+    if len(starts) > 1 and frame_count - starts[-1] < min_frames:
+        starts.pop()
+    return list(zip(starts, starts[1:] + [frame_count]))
+
+def preroll_start(start, overlap, keyframes=None):
+    """Awal pre-roll tracking segmen: overlap frame sebelum start, mundur ke keyframe bila diketahui"""
+    begin = max(0, start - overlap)
+    if keyframes and begin > 0:
+        earlier = [k for k in keyframes if k <= begin]
+        if earlier:
+            begin = earlier[-1]
+    return begin
+
+def box_iou(a, b):
+    """IoU antara box (n, 4) dan (m, 4) xyxy, returns (n, m)"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+class TrackStitcher:
+    """
+    Gabungkan tracker_id dari segmen yang di-track terpisah menjadi ID global
+
+    Segmen k di-track mulai beberapa frame sebelum batasnya (overlap). Pada
+    frame overlap yang juga ada di hasil segmen k-1 (ekor segmen k-1, bisa
+    lebih pendek dari overlap bila pre-roll mundur melewati awal segmen
+    k-1), box segmen k dicocokkan (IoU >= iou_threshold, class sama) dengan
+    box segmen k-1 yang sudah memakai ID global; pasangan ID dengan jumlah
+    frame cocok terbanyak diambil lebih dulu. ID lokal yang tidak cocok
+    mendapat ID global baru.
+
+    Frame per segmen: dict dengan array xyxy (n, 4), class_id, confidence,
+    tracker_id.
+    """
+
+    def __init__(self, iou_threshold=0.5):
+        self.iou_threshold = iou_threshold
+        self.next_id = 1
+        self._tail = []
+
+    def _match(self, prev_frames, next_frames):
+        votes = {}
+        for prev, new in zip(prev_frames, next_frames):
+            iou = box_iou(new["xyxy"], prev["xyxy"])
+            if iou.size == 0:
+                continue
+            iou[new["class_id"][:, None] != prev["class_id"][None, :]] = 0
+            for i, j in zip(*np.nonzero(iou >= self.iou_threshold)):
+                pair = (int(new["tracker_id"][i]), int(prev["tracker_id"][j]))
+                votes[pair] = votes.get(pair, 0) + 1
+        mapping, used = {}, set()
+        for (local, global_id), _ in sorted(votes.items(), key=lambda item: -item[1]):
+            if local not in mapping and global_id not in used:
+                mapping[local] = global_id
+                used.add(global_id)
+        return mapping
+
+    def add(self, frames, overlap):
+        """
+        Stitch satu segmen (urut dari segmen pertama)
+
+        frames: semua frame yang di-track segmen ini, termasuk `overlap`
+        frame pre-roll di awal (start - begin), yang selalu dibuang.
+        Returns frame setelah pre-roll dengan tracker_id global.
+        """
+        # Only the last k pre-roll frames are also in the previous segment's result
+        k = min(overlap, len(self._tail))
+        mapping = self._match(self._tail[len(self._tail) - k:], frames[overlap - k:overlap]) if k else {}
+        stitched = []
+        for frame in frames[overlap:]:
+            ids = []
+            for tid in frame["tracker_id"].tolist():
+                if tid not in mapping:
+                    mapping[tid] = self.next_id
+                    self.next_id += 1
+                ids.append(mapping[tid])
+            stitched.append(dict(frame, tracker_id=np.asarray(ids, dtype=np.int64)))
+        self._tail = stitched
+        return stitched
+
+def concat_videos(parts, output_path, open_writer):
+    """
+    Sambung file video segmen (codec dan ukuran sama) menjadi output_path
+
+    Dengan ffmpeg: concat demuxer + stream copy, tanpa decode. Tanpa ffmpeg:
+    setiap segmen didecode dan ditulis ulang lewat open_writer() (cv2
+    VideoWriter). Returns "ffmpeg" atau "reencode".
+    """
+    ffmpeg = ffmpeg_binary("ffmpeg")
+    if ffmpeg is not None:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+            for part in parts:
+                escaped = str(Path(part).resolve()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+            list_path = f.name
+        try:
+            subprocess.run(
+                [ffmpeg, "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                 "-c", "copy", "-movflags", "+faststart", str(output_path)],
+                capture_output=True, check=True
+            )
+            return "ffmpeg"
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"ffmpeg concat failed, re-encoding segments: {e}")
+        finally:
+            os.unlink(list_path)
+    writer = open_writer()
+    try:
+        for part in parts:
+            cap = cv2.VideoCapture(str(part))
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    writer.write(frame)
+            finally:
+                cap.release()
+    finally:
+        writer.release()
+    return "reencode"
+
+def init_worker(threads):
+    """
+    Initializer proses worker segmen: batasi thread per worker
+
+    State latar app (pool, job, sweep, preload model) dilewati oleh app.py
+    sendiri di proses worker (IN_WORKER_PROCESS), karena modul utama bisa
+    sudah diimport sebelum initializer ini jalan.
+    """
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        cv2.setNumThreads(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
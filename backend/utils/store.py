@@ -0,0 +1,169 @@
+# utils/store.py
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+
+# Output kinds recognised from the file name prefix when indexing a directory
+KNOWN_KINDS = ("detect", "track", "count", "line")
+
+class Artifact:
+    """Metadata satu file output di index"""
+
+    __slots__ = ("name", "path", "size", "created_at", "job_id", "kind")
+
+    def __init__(self, path, size, created_at, job_id=None, kind=None):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.size = size
+        self.created_at = created_at
+        self.job_id = job_id
+        self.kind = kind
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "size": self.size,
+            "created_at": self.created_at,
+            "job_id": self.job_id,
+            "kind": self.kind
+        }
+
+class ArtifactStore:
+    """
+    Index in-memory untuk file di OUTPUT_DIR dengan batas ukuran dan TTL
+
+    Direktori hanya dipindai sekali saat start; setelah itu file didaftarkan
+    lewat register(), dan lookup/listing dijawab dari index tanpa stat atau
+    glob. Sweeper di background menghapus file yang melewati ttl atau
+    membuat total ukuran melebihi max_bytes (yang tertua lebih dulu).
+
+    Args:
+        root: direktori output
+        max_bytes: total ukuran maksimum, 0 = tanpa batas
+        ttl: umur maksimum file dalam detik, 0 = tanpa batas
+        sweep_interval: jeda antar sweep dalam detik, 0 = tanpa sweeper
+    """
+
+    def __init__(self, root, max_bytes=0, ttl=0, sweep_interval=60):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._index = OrderedDict()  # name -> Artifact, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self._scan()
+        if sweep_interval > 0:
+            threading.Thread(target=self._sweeper, name="artifact-sweeper", daemon=True).start()
+
+    def _scan(self):
+        entries = []
+        for path in self.root.iterdir():
+            if (not path.is_file() or path.name.startswith("tmp_in_")
+                    or path.suffix == ".faststart"):
+                continue
+            stat = path.stat()
+            prefix = path.name.split("_", 1)[0]
+            entries.append(Artifact(path, stat.st_size, stat.st_mtime,
+                                    kind=prefix if prefix in KNOWN_KINDS else None))
+        for artifact in sorted(entries, key=lambda a: a.created_at):
+            self._add(artifact)
+
+    def _add(self, artifact):
+        if artifact.name in self._index:
+            self._remove(artifact.name)
+        self._index[artifact.name] = artifact
+        self._total_bytes += artifact.size
+
+    def _remove(self, name):
+        artifact = self._index.pop(name, None)
+        if artifact is None:
+            return None
+        self._total_bytes -= artifact.size
+        return artifact
+
+    def register(self, path, kind=None, job_id=None):
+        """Daftarkan file output yang sudah selesai ditulis"""
+        path = Path(path)
+        artifact = Artifact(path, path.stat().st_size, time.time(), job_id=job_id, kind=kind)
+        with self._lock:
+            self._add(artifact)
+        self.sweep()
+        return artifact
+
+    def get(self, name):
+        with self._lock:
+            return self._index.get(name)
+
+    def forget(self, name):
+        """Hapus entri index untuk file yang hilang dari disk"""
+        with self._lock:
+            self._remove(name)
+
+    def delete(self, name):
+        with self._lock:
+            artifact = self._remove(name)
+        if artifact is not None:
+            self._unlink(artifact)
+        return artifact is not None
+
+    def list(self, page=1, per_page=50, kind=None):
+        """
+        Satu halaman artefak, terbaru lebih dulu
+
+        Tanpa filter kind biayanya O(page * per_page) berapa pun jumlah file.
+        """
+        with self._lock:
+            if kind is None:
+                total = len(self._index)
+                start = (page - 1) * per_page
+                items = list(islice(reversed(self._index.values()), start, start + per_page))
+            else:
+                matching = [a for a in reversed(self._index.values()) if a.kind == kind]
+                total = len(matching)
+                items = matching[(page - 1) * per_page:page * per_page]
+        return items, total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "evicted": self.evicted
+            }
+
+    def sweep(self):
+        """Buang artefak yang kedaluwarsa atau melebihi anggaran ukuran"""
+        cutoff = time.time() - self.ttl if self.ttl else None
+        expired = []
+        with self._lock:
+            while self._index:
+                oldest = next(iter(self._index.values()))
+                too_old = cutoff is not None and oldest.created_at < cutoff
+                too_big = self.max_bytes and self._total_bytes > self.max_bytes
+                if not (too_old or too_big):
+                    break
+                expired.append(self._remove(oldest.name))
+            self.evicted += len(expired)
+        for artifact in expired:
+            self._unlink(artifact)
+        return len(expired)
+
+    def _unlink(self, artifact):
+        try:
+            artifact.path.unlink()
+        except OSError:
+            pass
+
+    def _sweeper(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[store] sweep failed: {e}")
@@ -0,0 +1,59 @@
+# utils/streaming.py
+import json
+import queue
+import threading
+
+MJPEG_BOUNDARY = "frame"
+
+class StreamCancelled(Exception):
+    """Raised in the producer once the client has gone away"""
+
+def sse_event(event, data):
+    """Format satu Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def mjpeg_part(body, content_type="image/jpeg", boundary=MJPEG_BOUNDARY):
+    """Format satu bagian multipart/x-mixed-replace (atau multipart lain)"""
+    header = (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii")
+    return header + body + b"\r\n"
+
+def multipart_body(parts, boundary):
+    """Body multipart lengkap dari list (content_type, body), termasuk penutup"""
+    return b"".join(mjpeg_part(body, content_type, boundary) for content_type, body in parts) + \
+        f"--{boundary}--\r\n".encode("ascii")
+
+class EventChannel:
+    """
+    Antrian terbatas dari thread pemrosesan ke generator response
+
+    Bila klien lambat, send() menunggu (backpressure ke pipeline). Bila klien
+    putus, close() dipanggil dan send() berikutnya melempar StreamCancelled
+    sehingga pemrosesan berhenti.
+    """
+
+    def __init__(self, maxsize=32):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = threading.Event()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def send(self, event, data):
+        while not self._closed.is_set():
+            try:
+                self._queue.put((event, data), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise StreamCancelled()
+
+    def receive(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        self._closed.set()
@@ -0,0 +1,120 @@
+# utils/stride.py
+import copy
+
+import numpy as np
+import supervision as sv
+
+class DetectionPropagator:
+    """
+    Meneruskan deteksi keyframe terakhir ke frame di antaranya
+
+    Box dengan tracker_id diekstrapolasi memakai kecepatan konstan antara
+    dua keyframe terakhir; box tanpa tracker_id dipertahankan di tempat.
+    """
+
+    def __init__(self):
+        self.last = None
+        self.last_idx = None
+        self.velocity = None
+
+    def update(self, detections, frame_idx):
+        velocity = np.zeros((len(detections), 4), dtype=np.float32)
+        if (self.last is not None and len(detections) and len(self.last)
+                and detections.tracker_id is not None and self.last.tracker_id is not None):
+            gap = max(frame_idx - self.last_idx, 1)
+            _, i_new, i_old = np.intersect1d(
+                detections.tracker_id, self.last.tracker_id, return_indices=True
+            )
+            velocity[i_new] = (detections.xyxy[i_new] - self.last.xyxy[i_old]) / gap
+        self.last = detections
+        self.last_idx = frame_idx
+        self.velocity = velocity
+
+    def propagate(self, frame_idx):
+        if self.last is None:
+            return sv.Detections.empty()
+        detections = copy.copy(self.last)
+        detections.xyxy = self.last.xyxy + self.velocity * (frame_idx - self.last_idx)
+        return detections
+
+    def motion(self):
+        """Rata-rata perpindahan box per frame, relatif terhadap ukuran box"""
+        if self.last is None or len(self.last) == 0:
+            return 0.0
+        xyxy = self.last.xyxy
+        size = np.maximum(np.hypot(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]), 1.0)
+        shift = np.hypot(
+            (self.velocity[:, 0] + self.velocity[:, 2]) / 2,
+            (self.velocity[:, 1] + self.velocity[:, 3]) / 2
+        )
+        return float(np.mean(shift / size))
+
+class FrameStride:
+    """
+    Menjalankan model hanya pada setiap keyframe (tiap `stride` frame)
+
+    Dengan adaptive=True stride mengecil saat jumlah deteksi berubah atau
+    gerakan besar, dan membesar (sampai max_stride) saat adegan stabil.
+
+    Args:
+        stride: jarak awal antar keyframe
+        adaptive: sesuaikan stride berdasarkan jumlah deteksi dan gerakan
+        max_stride: batas atas stride adaptif
+        motion_threshold: gerakan per frame (relatif ukuran box) yang
+            dianggap cepat
+    """
+
+    def __init__(self, stride=2, adaptive=False, max_stride=8, motion_threshold=0.02):
+        self.stride = max(1, min(stride, max_stride))
+        self.adaptive = adaptive
+        self.max_stride = max_stride
+        self.motion_threshold = motion_threshold
+        self.keyframes = 0
+        self._next_key = 0
+        self._prev_count = None
+        self._propagator = DetectionPropagator()
+
+    def run(self, frames, start_idx, infer):
+        """
+        Args:
+            frames: frame berurutan, frame pertama berindeks start_idx
+            infer: infer(keyframes) -> list sv.Detections, dipanggil sekali
+                per batch hanya dengan keyframe (urut)
+
+        Returns:
+            list sv.Detections untuk setiap frame
+        """
+        positions = []
+        for i in range(len(frames)):
+            if start_idx + i >= self._next_key:
+                positions.append(i)
+                self._next_key = start_idx + i + self.stride
+        keyed = {}
+        if positions:
+            keyed = dict(zip(positions, infer([frames[i] for i in positions])))
+        
+        outputs = []
+        for i in range(len(frames)):
+            frame_idx = start_idx + i
+            if i in keyed:
+                detections = keyed[i]
+                self._propagator.update(detections, frame_idx)
+                self.keyframes += 1
+                if self.adaptive:
+                    self._adapt(len(detections))
+                outputs.append(detections)
+            else:
+                outputs.append(self._propagator.propagate(frame_idx))
+        if self.adaptive and positions:
+            # Schedule the next keyframe with the adapted stride
+            self._next_key = max(start_idx + len(frames), start_idx + positions[-1] + self.stride)
+        return outputs
+
+    def _adapt(self, count):
+        motion = self._propagator.motion()
+        changed = self._prev_count is not None and count != self._prev_count
+        self._prev_count = count
+        if changed or motion > self.motion_threshold:
+            self.stride = max(1, self.stride // 2)
+        elif motion < self.motion_threshold / 2:
+            self.stride = min(self.max_stride, self.stride + 1)
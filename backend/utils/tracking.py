@@ -1,10 +1,117 @@
 # utils/tracking.py
+import threading
+import time
+import uuid
+
 import supervision as sv
+import yaml
+
+def build_tracker(tracker_cfg="bytetrack.yaml"):
+    """
+    Membuat instance tracker (ByteTrack/BoT-SORT) baru dari file konfigurasi,
+    terpisah dari tracker yang dipasang model.track(persist=True)
+    """
+    # Imported here so the app can start before torch/ultralytics load
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    
+    with open(check_yaml(tracker_cfg), encoding="utf-8") as f:
+        cfg = IterableSimpleNamespace(**yaml.safe_load(f))
+    if cfg.tracker_type not in TRACKER_MAP:
+        raise ValueError(f"Unsupported tracker_type '{cfg.tracker_type}'")
+    return TRACKER_MAP[cfg.tracker_type](args=cfg)
+
+# Older ultralytics releases number tracks from the class-level counter
+# BaseTrack._count, which every new tracker resets. Each session keeps its
+# own counter and swaps it in around tracker.update (serialized by this
+# lock), so sessions never reset or share each other's track ids.
+_track_id_lock = threading.Lock()
 
-def run_tracking(model, frame, tracker_cfg="bytetrack.yaml", persist=True, verbose=False):
+class TrackerSession:
     """
-    Mengembalikan object detections (sv.Detections) dari hasil model.track
+    State tracker milik satu request/stream
+
+    Bobot model tidak disimpan di sini; session hanya menerima hasil deteksi
+    dari model bersama dan memberi tracker_id secara terisolasi.
     """
-    results = model.track(frame, persist=persist, tracker=tracker_cfg, verbose=verbose)
-    det = sv.Detections.from_ultralytics(results[0])
-    return det
+
+    def __init__(self, tracker_cfg="bytetrack.yaml"):
+        self.id = uuid.uuid4().hex
+        self.tracker_cfg = tracker_cfg
+        self.tracker = build_tracker(tracker_cfg)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.frames = 0
+        self._track_count = 0
+        self._lock = threading.Lock()
+
+    def update(self, result):
+        """
+        Memasukkan satu hasil deteksi (ultralytics Results) ke tracker dan
+        mengembalikan sv.Detections dengan tracker_id, sama seperti model.track
+
+        Hasil harus dimasukkan sesuai urutan frame.
+        """
+        with self._lock:
+            self.last_used = time.time()
+            self.frames += 1
+            det = result.boxes.cpu().numpy()
+            from ultralytics.trackers.basetrack import BaseTrack
+            with _track_id_lock:
+                if hasattr(BaseTrack, "_count"):
+                    BaseTrack._count = self._track_count
+                tracks = self.tracker.update(det, result.orig_img)
+                self._track_count = getattr(BaseTrack, "_count", 0)
+        if len(tracks) == 0:
+            return sv.Detections.empty()
+        import torch
+        idx = tracks[:, -1].astype(int)
+        tracked = result[idx]
+        tracked.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return sv.Detections.from_ultralytics(tracked)
+
+    def to_dict(self):
+        return {
+            "session_id": self.id,
+            "tracker": self.tracker_cfg,
+            "frames": self.frames,
+            "created_at": self.created_at,
+            "last_used": self.last_used
+        }
+
+class TrackerSessionManager:
+    """
+    Registry TrackerSession; session yang idle lebih dari ttl detik dibuang
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, tracker_cfg="bytetrack.yaml"):
+        session = TrackerSession(tracker_cfg)
+        with self._lock:
+            self._prune()
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            self._prune()
+            return self._sessions.get(session_id)
+
+    def release(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def list(self):
+        with self._lock:
+            self._prune()
+            return list(self._sessions.values())
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for sid in [sid for sid, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[sid]
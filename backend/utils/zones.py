@@ -0,0 +1,178 @@
+# utils/zones.py
+import cv2
+import numpy as np
+import supervision as sv
+
+# Bit flags per pixel, so a mask holds at most this many (overlapping) zones
+MAX_ZONES = 64
+
+def _mask_dtype(n):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"at most {MAX_ZONES} zones per engine")
+
+class ZoneEngine:
+    """
+    Hitung banyak polygon zone sekaligus dalam satu pass per frame
+
+    Semua polygon dirasterisasi sekali ke label mask seukuran frame; tiap
+    pixel menyimpan bit flag zona yang menutupinya (zona boleh overlap).
+    Per frame, anchor setiap deteksi (default bottom center, sama seperti
+    sv.PolygonZone) dipetakan ke zonanya dengan satu lookup array, lalu
+    count saat ini, jumlah track unik dan dwell time per zona diperbarui.
+
+    Args:
+        zones: dict zone_id -> points (n, 2) dalam koordinat frame
+        resolution_wh: (width, height) frame
+        fps: fps video untuk dwell time dalam detik (0 = dalam frame)
+        anchor: sv.Position titik deteksi yang dicek
+        evict_after: track yang tidak terlihat di zona selama sekian frame
+            dipindah ke agregat (count, total dan max dwell) sehingga memori
+            dan biaya stats() mengikuti kepadatan adegan, bukan umur stream;
+            0 = simpan semua track
+    """
+
+    def __init__(self, zones, resolution_wh, fps=0.0, anchor=sv.Position.BOTTOM_CENTER, evict_after=0):
+        if not zones:
+            raise ValueError("at least one zone is required")
+        self.ids = list(zones)
+        self.polygons = [np.asarray(zones[zid], dtype=np.int32).reshape(-1, 2) for zid in self.ids]
+        self.width, self.height = int(resolution_wh[0]), int(resolution_wh[1])
+        self.fps = float(fps or 0.0)
+        self.anchor = anchor
+        self.evict_after = int(evict_after)
+
+        dtype = _mask_dtype(len(self.ids))
+        self.mask = np.zeros((self.height, self.width), dtype=dtype)
+        layer = np.zeros((self.height, self.width), dtype=np.uint8)
+        for i, polygon in enumerate(self.polygons):
+            layer[:] = 0
+            cv2.fillPoly(layer, [polygon], 1)
+            self.mask[layer.astype(bool)] |= dtype(1) << dtype(i)
+        self._bits = (np.ones(1, dtype=dtype) << np.arange(len(self.ids), dtype=dtype))
+        self.reset()
+
+    def reset(self):
+        self.current_counts = np.zeros(len(self.ids), dtype=np.int64)
+        self.frames = 0
+        # zone index -> {tracker_id: [first_frame, last_frame, frames_inside]}
+        self._dwell = [dict() for _ in self.ids]
+        # zone index -> [tracks, total_frames, max_frames] of evicted tracks
+        self._finished = [[0, 0, 0] for _ in self.ids]
+        self._evicted_at = 0
+
+    def membership(self, detections):
+        """Bool matrix (n_detections, n_zones): anchor deteksi berada di zona"""
+        if len(detections) == 0:
+            return np.zeros((0, len(self.ids)), dtype=bool)
+        anchors = np.asarray(detections.get_anchors_coordinates(self.anchor))
+        xs = np.clip(np.round(anchors[:, 0]).astype(np.int64), 0, self.width - 1)
+        ys = np.clip(np.round(anchors[:, 1]).astype(np.int64), 0, self.height - 1)
+        flags = self.mask[ys, xs]
+        # Anchors outside the frame are never inside a zone
+        outside = (anchors[:, 0] < 0) | (anchors[:, 0] >= self.width) | \
+                  (anchors[:, 1] < 0) | (anchors[:, 1] >= self.height)
+        flags[outside] = 0
+        return (flags[:, None] & self._bits[None, :]) != 0
+
+    def update(self, detections, frame_idx=None):
+        """
+        Proses deteksi satu frame, returns membership matrix (n, n_zones)
+
+        Track unik dan dwell hanya dihitung untuk deteksi dengan tracker_id.
+        """
+        if frame_idx is None:
+            frame_idx = self.frames
+        self.frames = max(self.frames, frame_idx + 1)
+        inside = self.membership(detections)
+        self.current_counts = inside.sum(axis=0)
+
+        if detections.tracker_id is not None and inside.any():
+            det_idx, zone_idx = np.nonzero(inside)
+            for tid, z in zip(detections.tracker_id[det_idx].tolist(), zone_idx.tolist()):
+                entry = self._dwell[z].get(tid)
+                if entry is None:
+                    self._dwell[z][tid] = [frame_idx, frame_idx, 1]
+                elif entry[1] != frame_idx:
+                    entry[1] = frame_idx
+                    entry[2] += 1
+        if self.evict_after and frame_idx - self._evicted_at >= max(1, self.evict_after // 2):
+            self.evict(frame_idx)
+        return inside
+
+    def evict(self, frame_idx):
+        """Pindahkan track yang terakhir terlihat sebelum frame_idx - evict_after ke agregat"""
+        self._evicted_at = frame_idx
+        cutoff = frame_idx - self.evict_after
+        for dwell, finished in zip(self._dwell, self._finished):
+            stale = [tid for tid, entry in dwell.items() if entry[1] < cutoff]
+            for tid in stale:
+                frames = dwell.pop(tid)[2]
+                finished[0] += 1
+                finished[1] += frames
+                finished[2] = max(finished[2], frames)
+
+    def roi(self, margin=0.1, min_margin=16, max_area=0.8):
+        """
+        Bounding box semua zona plus margin, (x0, y0, x1, y1) dalam frame
+
+        margin adalah fraksi dari sisi terpanjang bbox (minimal min_margin
+        pixel), cukup untuk box objek yang anchor-nya di tepi zona. Returns
+        None bila ROI menutupi lebih dari max_area frame (crop tidak berguna).
+        """
+        points = np.concatenate(self.polygons)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        pad = max(int(max(x1 - x0, y1 - y0) * margin), min_margin)
+        x0, y0 = max(int(x0) - pad, 0), max(int(y0) - pad, 0)
+        x1, y1 = min(int(x1) + pad, self.width), min(int(y1) + pad, self.height)
+        if x1 <= x0 or y1 <= y0 or (x1 - x0) * (y1 - y0) > max_area * self.width * self.height:
+            return None
+        return x0, y0, x1, y1
+
+    def _seconds(self, frames):
+        return round(frames / self.fps, 3) if self.fps > 0 else frames
+
+    def stats(self):
+        """Per zona: count saat ini, track unik dan dwell (detik, atau frame bila fps=0)"""
+        result = {}
+        for i, zid in enumerate(self.ids):
+            dwell = np.array([entry[2] for entry in self._dwell[i].values()], dtype=np.int64)
+            tracks, total, longest = self._finished[i]
+            tracks += int(dwell.size)
+            total += int(dwell.sum())
+            longest = max(longest, int(dwell.max()) if dwell.size else 0)
+            result[zid] = {
+                "count": int(self.current_counts[i]),
+                "unique_tracks": tracks,
+                "dwell": {
+                    "mean": self._seconds(total / tracks) if tracks else 0,
+                    "max": self._seconds(longest),
+                    "total": self._seconds(total)
+                }
+            }
+        return result
+
+    def dwell_by_track(self, zone_id):
+        """{tracker_id: {first_frame, last_frame, dwell}} untuk satu zona (tanpa track yang sudah dievict)"""
+        entries = self._dwell[self.ids.index(zone_id)]
+        return {
+            tid: {"first_frame": first, "last_frame": last, "dwell": self._seconds(frames)}
+            for tid, (first, last, frames) in entries.items()
+        }
+
+    def annotate(self, scene, thickness=2, text_scale=0.8):
+        """Gambar semua polygon dengan count saat ini"""
+        palette = sv.ColorPalette.DEFAULT
+        for i, polygon in enumerate(self.polygons):
+            color = palette.by_idx(i).as_bgr()
+            cv2.polylines(scene, [polygon], isClosed=True, color=color, thickness=thickness)
+            cx, cy = polygon.mean(axis=0).astype(int)
+            text = str(int(self.current_counts[i]))
+            (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, text_scale, thickness)
+            cv2.rectangle(scene, (cx - tw // 2 - 4, cy - th // 2 - 4),
+                          (cx + tw // 2 + 4, cy + th // 2 + baseline), color, -1)
+            cv2.putText(scene, text, (cx - tw // 2, cy + th // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                        text_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+        return scene
@@ -195,6 +195,7 @@ function App() {
               <video
                 src={`http://localhost:5000${result.video_url}`}
                 controls
+                preload="metadata"
                 className="result-media"
               />
             )}
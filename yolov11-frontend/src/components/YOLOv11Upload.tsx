@@ -327,6 +327,7 @@ export default function YOLOv11Upload() {
                 <video
                   src={outputUrl}
                   controls
+                  preload="metadata"
                   className="max-w-full max-h-full mx-auto">
                   Your browser does not support the video tag.
                 </video>